@@ -0,0 +1,287 @@
+"""
+Benchmark reproducible del pipeline con datos sintéticos.
+
+Genera (una sola vez, en una caché) entregas ZIP sintéticas de varias escalas, ejecuta
+main.main sobre ellas y guarda los tiempos por etapa y totales en un JSON. Con
+'--comparar' se contrasta el resultado con uno anterior y se informan las regresiones.
+
+Uso:
+    python benchmark.py --escalas pequena mediana --repeticiones 3 --modo lotes
+    python benchmark.py --escalas pequena --comparar resultados_benchmark/base.json
+"""
+import os
+import sys
+import json
+import shutil
+import platform
+import argparse
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+from config_utils import parsear_opciones
+from sinteticos_utils import generar_entregas, FRECUENCIA
+
+# Escalas de datos: número de entregas ZIP, horas por entrega y horas por TDMS
+ESCALAS = {
+    "pequena": {"entregas": 1, "horas": 8, "horas_por_archivo": 2},
+    "mediana": {"entregas": 3, "horas": 24, "horas_por_archivo": 6},
+    "grande": {"entregas": 7, "horas": 24, "horas_por_archivo": 12},
+}
+
+# Configuración de main.main para cada modo de ejecución
+MODOS = {
+    "lotes": {"pipeline_directo": False},
+    "directo": {"pipeline_directo": True},
+    "flujo": {"pipeline_directo": True, "ejecucion_en_flujo": True},
+}
+
+# Variación relativa a partir de la cual un tiempo se informa como regresión
+TOLERANCIA = 0.10
+
+CARPETA_CACHE = os.path.join(tempfile.gettempdir(), "tdms2mat_benchmark")
+CARPETA_RESULTADOS = "resultados_benchmark"
+
+
+def preparar_datos(escala, carpeta_cache=CARPETA_CACHE, log=print):
+    """
+    Devuelve la carpeta con los ZIP de una escala, generándolos si no están en la caché.
+
+    La caché se identifica por los parámetros de la escala: si cambian, se regenera.
+
+    Retorna:
+        tuple: (carpeta de los ZIP, resumen de generar_entregas)
+    """
+    parametros = dict(ESCALAS[escala], frecuencia=FRECUENCIA)
+    carpeta = os.path.join(carpeta_cache, escala)
+    ruta_resumen = os.path.join(carpeta, "datos.json")
+    if os.path.exists(ruta_resumen):
+        with open(ruta_resumen, encoding="utf-8") as f:
+            resumen = json.load(f)
+        if resumen.get("parametros") == parametros and all(
+            os.path.exists(os.path.join(carpeta, z)) for z in resumen["zips"]
+        ):
+            return carpeta, resumen
+
+    shutil.rmtree(carpeta, ignore_errors=True)
+    log(f"[BENCHMARK] Generando datos sintéticos '{escala}'...")
+    resumen = generar_entregas(carpeta, log_callback=log, **parametros)
+    resumen["parametros"] = parametros
+    with open(ruta_resumen, "w", encoding="utf-8") as f:
+        json.dump(resumen, f, indent=2)
+    return carpeta, resumen
+
+
+def ejecutar_pipeline(carpeta_datos, zips, modo="lotes", opciones=None, conteo=False):
+    """
+    Ejecuta main.main una vez sobre copias de los ZIP en una carpeta de trabajo nueva.
+
+    La carpeta temp del pipeline (main.carpeta_temp) se redirige a la carpeta de trabajo
+    durante la ejecución: la carpeta 'temp' real, con los días parciales y el punto de
+    control de las conversiones de producción, no se usa ni se borra.
+
+    Retorna:
+        dict: {'exito', 'total_s', 'etapas': {etapa: segundos}, 'informe': informe de métricas}
+    """
+    import main as modulo_main
+
+    trabajo = tempfile.mkdtemp(prefix="tdms2mat_bench_")
+    carpeta_temp_original = modulo_main.carpeta_temp
+    modulo_main.carpeta_temp = lambda: os.path.join(trabajo, "temp")
+    try:
+        entrada = os.path.join(trabajo, "entrada")
+        os.makedirs(entrada)
+        for zip_file in zips:
+            shutil.copy2(os.path.join(carpeta_datos, zip_file), entrada)
+
+        config = {
+            "input_folder": entrada,
+            "output_folder": os.path.join(trabajo, "salida"),
+            "excel_output_folder": os.path.join(trabajo, "excel"),
+            "selected_files": list(zips),
+            "descomprimir": True,
+            "procesar_incompleto": True,
+            "realizar_conteo": conteo,
+            "usar_manifiesto": False,
+            "reanudar": False,
+        }
+        config.update(MODOS[modo])
+        config.update(opciones or {})
+        config.update({"metricas": True, "carpeta_metricas": os.path.join(trabajo, "metricas")})
+        # main escribe 'processing.log' en la carpeta de salida antes de crear las carpetas
+        os.makedirs(config["output_folder"], exist_ok=True)
+
+        inicio = time.perf_counter()
+        exito = modulo_main.main(config, log_callback=lambda msg: None)
+        total = time.perf_counter() - inicio
+
+        carpeta_metricas = config["carpeta_metricas"]
+        informes = sorted(os.listdir(carpeta_metricas)) if os.path.isdir(carpeta_metricas) else []
+        informe = {}
+        if informes:
+            with open(os.path.join(carpeta_metricas, informes[-1]), encoding="utf-8") as f:
+                informe = json.load(f)
+        return {
+            "exito": exito,
+            "total_s": round(total, 3),
+            "etapas": {e["etapa"]: round(e["segundos"], 3) for e in informe.get("etapas", [])},
+            "informe": informe,
+        }
+    finally:
+        modulo_main.carpeta_temp = carpeta_temp_original
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+
+def _entorno():
+    """Datos de la máquina y de las versiones, para comparar resultados equivalentes."""
+    versiones = {}
+    for modulo in ("numpy", "pandas", "scipy", "nptdms"):
+        try:
+            versiones[modulo] = __import__(modulo).__version__
+        except (ImportError, AttributeError):
+            versiones[modulo] = None
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "commit": commit,
+        "versiones": versiones,
+    }
+
+
+def ejecutar_benchmark(escalas, repeticiones=3, modo="lotes", opciones=None, conteo=False,
+                       carpeta_cache=CARPETA_CACHE, log=print):
+    """
+    Mide el pipeline en cada escala y devuelve los resultados (serializables a JSON).
+
+    Cada escala se ejecuta 'repeticiones' veces sobre los mismos datos; se guardan todas
+    las mediciones y la mediana de cada etapa y del total.
+    """
+    resultado = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "modo": modo,
+        "opciones": opciones or {},
+        "conteo": conteo,
+        "entorno": _entorno(),
+        "escalas": {},
+    }
+    for escala in escalas:
+        carpeta, datos = preparar_datos(escala, carpeta_cache, log)
+        mediciones = []
+        for i in range(repeticiones):
+            medicion = ejecutar_pipeline(carpeta, datos["zips"], modo, opciones, conteo)
+            if not medicion["exito"]:
+                log(f"[BENCHMARK] '{escala}' (repetición {i + 1}) terminó con errores.")
+            log(f"[BENCHMARK] {escala} #{i + 1}: {medicion['total_s']:.2f} s")
+            mediciones.append(medicion)
+
+        etapas = list(mediciones[0]["etapas"])
+        resultado["escalas"][escala] = {
+            "parametros": datos["parametros"],
+            "filas": datos["filas"],
+            "bytes_tdms": datos["bytes_tdms"],
+            "repeticiones": [
+                {"exito": m["exito"], "total_s": m["total_s"], "etapas": m["etapas"],
+                 "informe_etapas": m["informe"].get("etapas", [])}
+                for m in mediciones
+            ],
+            "mediana": {
+                "total_s": round(statistics.median(m["total_s"] for m in mediciones), 3),
+                "etapas": {
+                    etapa: round(statistics.median(m["etapas"].get(etapa, 0.0) for m in mediciones), 3)
+                    for etapa in etapas
+                },
+            },
+        }
+    return resultado
+
+
+def guardar_resultado(resultado, carpeta=CARPETA_RESULTADOS):
+    """Escribe el resultado en '<carpeta>/benchmark_<modo>_AAAAMMDD_HHMMSS.json' y retorna la ruta."""
+    os.makedirs(carpeta, exist_ok=True)
+    marca = datetime.fromisoformat(resultado["fecha"]).strftime("%Y%m%d_%H%M%S")
+    ruta = os.path.join(carpeta, f"benchmark_{resultado['modo']}_{marca}.json")
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    return ruta
+
+
+def comparar(actual, base, tolerancia=TOLERANCIA):
+    """
+    Compara las medianas de dos resultados por escala y etapa.
+
+    Retorna:
+        tuple: (líneas de texto con la comparación, número de regresiones)
+    """
+    lineas, regresiones = [], 0
+    if actual.get("entorno", {}).get("cpus") != base.get("entorno", {}).get("cpus"):
+        lineas.append("Advertencia: los resultados se midieron en máquinas con distinto número de CPU.")
+    if actual.get("modo") != base.get("modo"):
+        lineas.append(f"Advertencia: modos distintos ({base.get('modo')} -> {actual.get('modo')}).")
+
+    for escala, datos in actual["escalas"].items():
+        if escala not in base.get("escalas", {}):
+            continue
+        previo = base["escalas"][escala]["mediana"]
+        medianas = datos["mediana"]
+        filas = [("TOTAL", previo["total_s"], medianas["total_s"])]
+        filas += [(etapa, previo["etapas"].get(etapa), s) for etapa, s in medianas["etapas"].items()]
+        lineas.append(f"[{escala}]")
+        for etapa, antes, ahora in filas:
+            if not antes:
+                lineas.append(f"  {etapa}: {ahora:.2f} s (sin referencia)")
+                continue
+            cambio = (ahora - antes) / antes
+            marca = ""
+            if cambio > tolerancia:
+                marca = "  <-- REGRESIÓN"
+                regresiones += 1
+            lineas.append(f"  {etapa}: {antes:.2f} s -> {ahora:.2f} s ({cambio:+.1%}){marca}")
+    return lineas, regresiones
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline TDMS -> MAT con datos sintéticos.")
+    parser.add_argument("--escalas", nargs="+", choices=sorted(ESCALAS), default=["pequena"])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--modo", choices=sorted(MODOS), default="lotes")
+    parser.add_argument("--conteo", action="store_true", help="Incluir el conteo de arranques y paradas.")
+    parser.add_argument("--opcion", action="append", default=[], metavar="CLAVE=VALOR",
+                        help="Clave de configuración de main (por ejemplo num_workers_tdms=4).")
+    parser.add_argument("--cache", default=CARPETA_CACHE, help="Carpeta de los datos sintéticos.")
+    parser.add_argument("--salida", default=CARPETA_RESULTADOS, help="Carpeta de los resultados.")
+    parser.add_argument("--comparar", metavar="JSON", help="Resultado anterior con el que comparar.")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    args = parser.parse_args(argv)
+
+    opciones = parsear_opciones(args.opcion)
+
+    resultado = ejecutar_benchmark(args.escalas, args.repeticiones, args.modo, opciones, args.conteo, args.cache)
+    print(f"[BENCHMARK] Resultado guardado en {guardar_resultado(resultado, args.salida)}")
+
+    for escala, datos in resultado["escalas"].items():
+        print(f"[{escala}] {datos['filas']} filas, {datos['bytes_tdms'] / 2**20:.0f} MB de TDMS: "
+              f"{datos['mediana']['total_s']:.2f} s")
+        for etapa, segundos in datos["mediana"]["etapas"].items():
+            print(f"  {etapa}: {segundos:.2f} s")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        lineas, regresiones = comparar(resultado, base, args.tolerancia)
+        print("\n".join(lineas))
+        return 1 if regresiones else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
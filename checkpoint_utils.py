@@ -0,0 +1,191 @@
+import os
+import json
+import shutil
+import threading
+
+# Nombre del punto de control dentro de la carpeta temp
+NOMBRE_PUNTO_CONTROL = ".punto_control.json"
+
+
+def escribir_json_atomico(ruta, datos):
+    """Escribe un JSON en '<ruta>.part', lo sincroniza a disco y lo renombra sobre 'ruta'."""
+    parcial = ruta + ".part"
+    with open(parcial, "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(parcial, ruta)
+
+
+class PuntoControl:
+    """
+    Avance durable de una ejecución, para reanudarla tras un corte.
+
+    Guarda en un JSON las etapas completadas, las marcas por archivo o por día dentro de
+    cada etapa y los resultados de las etapas que se usan más adelante. Cada cambio se
+    escribe de forma atómica. Si al iniciar existe un punto de control con el mismo
+    'plan' (etapas y archivos seleccionados), la ejecución continúa desde él; si el plan
+    es otro, se descarta. Al terminar sin errores el archivo se elimina.
+
+    Los métodos 'marcar' pueden llamarse desde varios hilos.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self.reanudado = False
+        self.descartado = False
+        self.estado = {"plan": None, "etapas": [], "archivos": {}, "resultados": {}}
+
+    def iniciar(self, plan):
+        """
+        Carga el punto de control existente si corresponde al mismo 'plan' (serializable a
+        JSON); si no existe o el plan es otro, empieza uno nuevo.
+        """
+        self.estado = {"plan": plan, "etapas": [], "archivos": {}, "resultados": {}}
+        if os.path.exists(self.ruta):
+            try:
+                with open(self.ruta, encoding="utf-8") as f:
+                    previo = json.load(f)
+            except (OSError, ValueError):
+                previo = None
+            if previo is not None and previo.get("plan") == plan:
+                self.estado = previo
+                self.reanudado = True
+            else:
+                self.descartado = True
+        self.guardar()
+
+    @property
+    def resultados(self):
+        """Resultados guardados de las etapas completadas ({clave: valor})."""
+        return self.estado["resultados"]
+
+    def etapa_completada(self, nombre):
+        return nombre in self.estado["etapas"]
+
+    def completar_etapa(self, nombre, resultados=None):
+        """Registra una etapa completada junto con los resultados (serializables a JSON) a conservar."""
+        with self._lock:
+            self.estado["etapas"].append(nombre)
+            if resultados:
+                self.estado["resultados"].update(resultados)
+            self._guardar()
+
+    def marcas(self, etapa):
+        """Marcas registradas en una etapa: {clave: valor}."""
+        with self._lock:
+            return dict(self.estado["archivos"].get(etapa, {}))
+
+    def marca(self, etapa, clave, defecto=None):
+        with self._lock:
+            return self.estado["archivos"].get(etapa, {}).get(clave, defecto)
+
+    def marcar(self, etapa, clave, valor=True):
+        """Registra (y guarda en disco) el avance de un archivo o día dentro de una etapa."""
+        with self._lock:
+            self.estado["archivos"].setdefault(etapa, {})[clave] = valor
+            self._guardar()
+
+    def guardar(self):
+        with self._lock:
+            self._guardar()
+
+    def _guardar(self):
+        escribir_json_atomico(self.ruta, self.estado)
+
+    def finalizar(self):
+        """Elimina el punto de control al terminar la ejecución sin errores."""
+        with self._lock:
+            if os.path.exists(self.ruta):
+                os.remove(self.ruta)
+
+
+# Prefijos de las áreas de trabajo temporales de particionado, descompresión y lectura por bloques
+PREFIJOS_TRABAJO = (".particion_", ".staging", ".bloques_")
+
+
+def limpiar_areas_trabajo(carpeta):
+    """
+    Elimina las áreas de trabajo que dejó una ejecución interrumpida en 'carpeta'.
+
+    Retorna:
+        int: Número de áreas eliminadas.
+    """
+    if not os.path.isdir(carpeta):
+        return 0
+    restos = [n for n in os.listdir(carpeta) if n.startswith(PREFIJOS_TRABAJO)]
+    for nombre in restos:
+        _eliminar_ruta(os.path.join(carpeta, nombre))
+    return len(restos)
+
+
+# Sufijo de la copia de un día parcial mientras se reescribe
+SUFIJO_RESPALDO = ".previo"
+
+
+def _eliminar_ruta(ruta):
+    if os.path.isdir(ruta):
+        shutil.rmtree(ruta)
+    elif os.path.exists(ruta):
+        os.remove(ruta)
+
+
+def respaldar(ruta):
+    """
+    Aparta un día parcial antes de reescribirlo por completo (se renombra a '<ruta>.previo').
+
+    Retorna:
+        str: Ruta del respaldo (None si 'ruta' no existía).
+    """
+    if not os.path.exists(ruta):
+        return None
+    respaldo = ruta + SUFIJO_RESPALDO
+    _eliminar_ruta(respaldo)
+    os.replace(ruta, respaldo)
+    return respaldo
+
+
+def descartar_respaldo(ruta):
+    _eliminar_ruta(ruta + SUFIJO_RESPALDO)
+
+
+def iniciar_dia(punto, etapa, fecha, tamano):
+    """Registra que un día va a escribirse; 'tamano' es el de su parcial (None si no existe)."""
+    if punto is not None:
+        punto.marcar(etapa, fecha, {"tamano": tamano, "hecho": False})
+
+
+def terminar_dia(punto, etapa, fecha, completo):
+    """Registra que la escritura de un día terminó (antes de borrar o renombrar su parcial)."""
+    if punto is not None:
+        punto.marcar(etapa, fecha, {"hecho": True, "completo": bool(completo)})
+
+
+def reanudar_dia(punto, etapa, fecha, ruta, restaurar):
+    """
+    Deja el parcial de un día como estaba antes de una escritura interrumpida.
+
+    Parámetros:
+        punto (PuntoControl): Punto de control de la ejecución (None: no se hace nada).
+        etapa (str): Etapa del punto de control con las marcas por día.
+        fecha (str): Día.
+        ruta (str): Tabla o carpeta del parcial del día.
+        restaurar (function): Recibe el tamaño previo y recorta 'ruta' hasta él.
+
+    Retorna:
+        dict: Marca del día si ya se había escrito en la ejecución interrumpida (no debe
+        volver a escribirse), o None si debe escribirse.
+    """
+    marca = punto.marca(etapa, fecha) if punto is not None else None
+    if marca is None:
+        return None
+    if marca["hecho"]:
+        descartar_respaldo(ruta)
+        return marca
+    if os.path.exists(ruta + SUFIJO_RESPALDO):
+        _eliminar_ruta(ruta)
+        os.replace(ruta + SUFIJO_RESPALDO, ruta)
+    else:
+        restaurar(marca["tamano"])
+    return None
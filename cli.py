@@ -0,0 +1,241 @@
+"""
+Línea de comandos del procesador de archivos TDMS, sin interfaz gráfica.
+
+Uso:
+    python -m cli [opciones] <subcomando>
+
+Subcomandos:
+    todo          Ejecuta todas las etapas activadas en la configuración (como "Iniciar").
+    convertir     ZIP -> MAT diarios (según 'pipeline_directo' y 'ejecucion_en_flujo').
+    descomprimir  ZIP -> TDMS en la carpeta temp.
+    tdms          TDMS de temp -> tablas intermedias.
+    agrupar       Tablas intermedias -> tablas por día.
+    mat           Tablas por día -> MAT.
+    rainflow      MAT -> Excel de rainflow.
+    conteo        MAT -> registro de arranques y paradas.
+    vigilar       Servicio: convierte cada ZIP que llega a la carpeta de entrada.
+
+Las opciones se toman de 'config.json' (o '--config') y pueden sobrescribirse con
+'--opcion clave=valor'. Los módulos de cada etapa se importan solo al ejecutarla, de modo
+que 'conteo' o 'rainflow' no cargan nptdms ni los módulos de la conversión.
+"""
+import os
+import sys
+import signal
+import argparse
+import threading
+
+from config_utils import load_config, parsear_opciones
+
+CONFIG_FILE = "config.json"
+
+# Subcomandos que ejecutan main.main con solo algunas etapas activadas
+ETAPAS_MAIN = {
+    "todo": {},
+    "convertir": {"descomprimir": True, "rainflow": False, "realizar_conteo": False},
+    "rainflow": {"descomprimir": False, "rainflow": True, "realizar_conteo": False},
+    "conteo": {"descomprimir": False, "rainflow": False, "realizar_conteo": True},
+}
+
+# Subcomandos que ejecutan una sola etapa del pipeline con CSV intermedios
+ETAPAS_SUELTAS = ("descomprimir", "tdms", "agrupar", "mat")
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m cli", description="Procesador de archivos TDMS sin interfaz gráfica."
+    )
+    parser.add_argument("--config", default=CONFIG_FILE, help="Archivo de configuración JSON (config.json).")
+    parser.add_argument("--entrada", help="Carpeta de entrada con los ZIP (input_folder).")
+    parser.add_argument("--salida", help="Carpeta de salida de los MAT (output_folder).")
+    parser.add_argument("--excel", help="Carpeta de salida de los Excel (excel_output_folder).")
+    parser.add_argument("--archivos", nargs="+", metavar="ZIP",
+                        help="ZIP a procesar (por defecto, todos los ZIP de la carpeta de entrada).")
+    parser.add_argument("--opcion", action="append", default=[], metavar="CLAVE=VALOR",
+                        help="Sobrescribe una clave de la configuración (por ejemplo unidad=\"06\").")
+    parser.add_argument("--perfilar", action="store_true", help="Perfila las etapas (cProfile y tracemalloc).")
+    parser.add_argument("--sin-metricas", action="store_true", help="No registra ni exporta métricas.")
+
+    subparsers = parser.add_subparsers(dest="subcomando", required=True, metavar="subcomando")
+    subparsers.add_parser("todo", help="Todas las etapas activadas en la configuración.")
+    convertir = subparsers.add_parser("convertir", help="ZIP -> MAT diarios.")
+    convertir.add_argument("--directo", action="store_true", help="Pipeline columnar, sin CSV intermedios.")
+    convertir.add_argument("--flujo", action="store_true", help="Pipeline directo ZIP por ZIP, solapando etapas.")
+    subparsers.add_parser("descomprimir", help="ZIP -> TDMS en la carpeta temp.")
+    subparsers.add_parser("tdms", help="TDMS de temp -> tablas intermedias.")
+    subparsers.add_parser("agrupar", help="Tablas intermedias -> tablas por día.")
+    subparsers.add_parser("mat", help="Tablas por día -> MAT.")
+    subparsers.add_parser("rainflow", help="MAT -> Excel de rainflow.")
+    subparsers.add_parser("conteo", help="MAT -> registro de arranques y paradas.")
+    vigilar = subparsers.add_parser("vigilar", help="Convierte cada ZIP que llega a la carpeta de entrada.")
+    vigilar.add_argument("--intervalo", type=float, help="Segundos entre revisiones (intervalo_vigilancia_s).")
+    vigilar.add_argument("--estabilidad", type=float,
+                         help="Segundos sin cambios para considerar completo un ZIP (estabilidad_vigilancia_s).")
+    return parser
+
+
+def construir_config(args):
+    """Configuración del archivo con las sobrescrituras de la línea de comandos."""
+    config = load_config(args.config)
+    config.update(parsear_opciones(args.opcion))
+    for clave, valor in (("input_folder", args.entrada), ("output_folder", args.salida),
+                         ("excel_output_folder", args.excel)):
+        if valor:
+            config[clave] = valor
+    if args.perfilar:
+        config["perfilar"] = True
+    if args.sin_metricas:
+        config["metricas"] = False
+
+    if args.subcomando in ETAPAS_MAIN:
+        config.update(ETAPAS_MAIN[args.subcomando])
+    if args.subcomando == "vigilar":
+        # Cada ZIP se agrega al parcial del día y el MAT del día en curso se reescribe con él
+        config.update({"descomprimir": True, "pipeline_directo": True, "procesar_incompleto": True,
+                       "usar_manifiesto": True})
+        if args.intervalo is not None:
+            config["intervalo_vigilancia_s"] = args.intervalo
+        if args.estabilidad is not None:
+            config["estabilidad_vigilancia_s"] = args.estabilidad
+    if args.subcomando == "convertir" and (args.directo or args.flujo):
+        config["pipeline_directo"] = True
+        config["ejecucion_en_flujo"] = args.flujo
+    if args.subcomando in ("rainflow", "conteo") and not config.get("input_folder"):
+        # Estas etapas solo leen los MAT: la carpeta de entrada no se usa
+        config["input_folder"] = config.get("output_folder")
+
+    if args.archivos:
+        config["selected_files"] = args.archivos
+    elif args.subcomando in ("todo", "convertir", "descomprimir") and config.get("input_folder"):
+        carpeta = config["input_folder"]
+        config["selected_files"] = sorted(
+            f for f in os.listdir(carpeta) if f.lower().endswith(".zip")
+        ) if os.path.isdir(carpeta) else []
+    return config
+
+
+def ejecutar_etapa_suelta(subcomando, config):
+    """Ejecuta una etapa del pipeline con CSV intermedios sobre la carpeta temp."""
+    from main import (carpeta_temp, opciones_conversion, etapa_diferida, process_stage,
+                      exportar_metricas, setup_folders)
+    from metricas_utils import Telemetria
+    from perfil_utils import Perfilador
+    from datetime import datetime
+
+    temp = carpeta_temp()
+    output_folder = config.get("output_folder", "")
+    formato = config.get("formato_intermedio", "csv")
+    if not setup_folders([temp] + ([output_folder] if subcomando == "mat" else []), print):
+        return False
+
+    if subcomando == "descomprimir":
+        if not config.get("input_folder") or not config.get("selected_files"):
+            print("ERROR: No hay archivos ZIP para descomprimir (revise input_folder o --archivos).")
+            return False
+        nombre = "Descompresión de archivos ZIP"
+        func = etapa_diferida("decompress_utils", "decompress_zip_files")
+        args = (config["input_folder"], temp, config["selected_files"], config.get("motor_descompresion", "zipfile"))
+        kwargs = {"num_workers": config.get("num_workers_descompresion")}
+    elif subcomando == "tdms":
+        opciones_tdms, _ = opciones_conversion(config)
+        nombre, func, args = "Procesamiento de archivos TDMS", etapa_diferida(
+            "tdms_utils", "procesar_archivos_tdms_paralelo"), (temp,)
+        kwargs = dict(opciones_tdms, formato=formato, log_callback=print)
+    elif subcomando == "agrupar":
+        _, memoria_particion = opciones_conversion(config)
+        nombre, func, args = "Ordenamiento y agrupación de archivos CSV", etapa_diferida(
+            "csv_utils", "ordenar_y_agrupado_por_dia"), (temp,)
+        kwargs = {"memoria_max": memoria_particion, "formato": formato}
+    else:
+        nombre, func = "Conversión de CSV a MAT", etapa_diferida("mat_utils", "csv_to_mat")
+        args = (temp, output_folder, config.get("unidad", "05"), config.get("procesar_incompleto", False))
+        kwargs = {"formato": formato, "num_workers": config.get("num_workers_mat"),
+                  "backend": config.get("backend_mat", "procesos"), "log_callback": print}
+
+    telemetria = Telemetria() if config.get("metricas", True) else None
+    perfilador = None
+    if config.get("perfilar", False):
+        carpeta_perfil = config.get("carpeta_perfil") or os.path.join(output_folder or temp, "perfil")
+        perfilador = Perfilador(os.path.join(carpeta_perfil, datetime.now().strftime("%Y%m%d_%H%M%S")), print,
+                                memoria=config.get("perfilar_memoria", True))
+
+    if telemetria is not None:
+        with telemetria.activar():
+            exito = process_stage(nombre, func, args, print, kwargs=kwargs, telemetria=telemetria,
+                                  perfilador=perfilador)
+        if output_folder:
+            exportar_metricas(telemetria, config, exito, print)
+        return exito
+    return process_stage(nombre, func, args, print, kwargs=kwargs, perfilador=perfilador)
+
+
+def procesar_lote(config, zips):
+    """
+    Ejecuta main.main con un lote de ZIP y retorna los que quedaron convertidos: los que
+    figuran en el manifiesto con su contenido actual. Un ZIP con miembros TDMS ilegibles
+    no se registra, aunque main termine sin errores.
+    """
+    import zipfile
+    from main import main
+    from manifiesto_utils import Manifiesto, NOMBRE_MANIFIESTO
+
+    main(dict(config, selected_files=zips))
+    convertidos = []
+    with Manifiesto(os.path.join(config["output_folder"], NOMBRE_MANIFIESTO)) as manifiesto:
+        for zip_file in zips:
+            try:
+                if not manifiesto.cambio(os.path.join(config["input_folder"], zip_file), "zip"):
+                    convertidos.append(zip_file)
+            except (OSError, zipfile.BadZipFile) as e:
+                print(f"[VIGILANCIA] No se pudo verificar '{zip_file}': {e}")
+    return convertidos
+
+
+def vigilar(config):
+    """Ejecuta main.main con cada lote de ZIP estables hasta recibir Ctrl+C o SIGTERM."""
+    from vigilancia_utils import vigilar_carpeta, INTERVALO, ESTABILIDAD, MAX_INTENTOS
+
+    input_folder = config.get("input_folder")
+    if not input_folder or not os.path.isdir(input_folder):
+        print(f"ERROR: La carpeta de entrada '{input_folder}' no existe.")
+        return False
+
+    parar = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: parar.set())
+    try:
+        vigilar_carpeta(
+            input_folder, lambda zips: procesar_lote(config, zips),
+            intervalo=config.get("intervalo_vigilancia_s", INTERVALO),
+            estabilidad=config.get("estabilidad_vigilancia_s", ESTABILIDAD),
+            stop_event=parar, log_callback=print,
+            max_intentos=config.get("max_intentos_vigilancia", MAX_INTENTOS)
+        )
+    except KeyboardInterrupt:
+        print("[VIGILANCIA] Vigilancia interrumpida.")
+    return True
+
+
+def main_cli(argv=None):
+    args = crear_parser().parse_args(argv)
+    try:
+        config = construir_config(args)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 2
+
+    if args.subcomando in ETAPAS_SUELTAS:
+        return 0 if ejecutar_etapa_suelta(args.subcomando, config) else 1
+
+    # main escribe 'processing.log' en la carpeta de salida antes de crear las carpetas
+    if config.get("output_folder"):
+        os.makedirs(config["output_folder"], exist_ok=True)
+    if args.subcomando == "vigilar":
+        exito = vigilar(config)
+    else:
+        from main import main
+        exito = main(config)
+    return 0 if exito else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
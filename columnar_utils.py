@@ -0,0 +1,753 @@
+import os
+import shutil
+import tempfile
+import zipfile
+import numpy as np
+import pandas as pd
+from collections import defaultdict, deque
+from concurrent.futures import as_completed
+from tqdm import tqdm
+
+from tdms_utils import leer_tdms_columnas, iterar_bloques_tdms, eliminar_tdms, primer_tiempo_tdms
+from workers_utils import calcular_num_workers, crear_executor
+from csv_utils import COLUMN_ORDER, ordenar_columnas
+from partition_utils import ParticionadorDias, MEMORIA_MAX
+from mat_utils import guardar_mat, nombre_archivo_mat
+from time_utils import tiempo_a_epoch, ZONA_HORARIA
+from decompress_utils import listar_miembros_tdms, abrir_miembro_tdms
+from checkpoint_utils import respaldar, descartar_respaldo, iniciar_dia, terminar_dia, reanudar_dia
+
+
+def ordenar_nombres_columnas(nombres):
+    """Ordena los nombres de canal según COLUMN_ORDER; los desconocidos van al final."""
+    return [n for n in ordenar_columnas(nombres) if n != "Time"]
+
+
+def dia_completo(tiempo):
+    """Indica si la última muestra del día corresponde a las 23:59:59."""
+    if len(tiempo) == 0:
+        return False
+    ultimo = pd.Timestamp(tiempo[-1])
+    return ultimo.hour == 23 and ultimo.minute == 59 and ultimo.second == 59
+
+
+def dividir_por_dia(columnas):
+    """
+    Divide las columnas de un archivo TDMS en bloques diarios ordenados por tiempo.
+
+    Parámetros:
+        columnas (dict): {nombre_canal: ndarray}, con "Time" como datetime64.
+
+    Retorna:
+        dict: {fecha (str 'YYYY-MM-DD'): (tiempo, {nombre_canal: ndarray})}
+    """
+    tiempo = columnas["Time"].astype("datetime64[ns]")
+    indices = np.flatnonzero(~np.isnat(tiempo))
+    indices = indices[np.argsort(tiempo[indices], kind="stable")]
+    if len(indices) == 0:
+        return {}
+
+    dias = tiempo[indices].astype("datetime64[D]")
+    cortes = np.flatnonzero(dias[1:] != dias[:-1]) + 1
+
+    bloques = {}
+    for seleccion in np.split(indices, cortes):
+        fecha = str(tiempo[seleccion[0]].astype("datetime64[D]"))
+        bloques[fecha] = (
+            tiempo[seleccion],
+            {nombre: datos[seleccion] for nombre, datos in columnas.items() if nombre != "Time"}
+        )
+    return bloques
+
+
+def leer_tdms_por_dia(archivo_tdms, tamano_bloque=None, zona_horaria=ZONA_HORARIA, carpeta_temp=None,
+                      dias=None):
+    """
+    Lee un archivo TDMS y lo divide en bloques diarios (se ejecuta en los workers).
+
+    Con 'tamano_bloque' el archivo se lee en streaming y cada día puede quedar
+    representado por varios bloques. Si además se indica 'carpeta_temp', cada bloque se
+    vuelca a disco en cuanto se lee y se devuelve su ruta en lugar de los datos, de modo
+    que la memoria del worker y el resultado enviado al proceso principal dependen del
+    tamaño de bloque y no de la duración del archivo (ver cargar_bloques). Con 'dias'
+    (fechas 'YYYY-MM-DD') se descartan las filas de los demás días.
+
+    Retorna:
+        dict: {fecha: [(tiempo, columnas) o ruta de un bloque volcado, ...]}
+    """
+    if tamano_bloque:
+        bloques = iterar_bloques_tdms(archivo_tdms, tamano_bloque, nombre_tiempo="Time", zona_horaria=zona_horaria)
+    else:
+        bloques = [leer_tdms_columnas(archivo_tdms, zona_horaria)]
+
+    carpeta_bloques = None
+    if tamano_bloque and carpeta_temp:
+        os.makedirs(carpeta_temp, exist_ok=True)
+        carpeta_bloques = tempfile.mkdtemp(prefix=".bloques_", dir=carpeta_temp)
+
+    por_dia = defaultdict(list)
+    volcados = 0
+    try:
+        for columnas in bloques:
+            for fecha, bloque in dividir_por_dia(columnas).items():
+                if dias is not None and fecha not in dias:
+                    continue
+                if carpeta_bloques is not None:
+                    ruta = os.path.join(carpeta_bloques, f"{volcados:05d}.npz")
+                    volcar_bloque(ruta, bloque)
+                    bloque = ruta
+                    volcados += 1
+                por_dia[fecha].append(bloque)
+    except Exception:
+        if carpeta_bloques is not None:
+            shutil.rmtree(carpeta_bloques, ignore_errors=True)
+        raise
+    return por_dia
+
+
+def volcar_bloque(ruta, bloque):
+    """Escribe un bloque (tiempo, columnas) en un '.npz', conservando el tipo de cada canal."""
+    tiempo, columnas = bloque
+    nombres = list(columnas)
+    with open(ruta, "wb") as f:
+        np.savez(
+            f,
+            tiempo=tiempo.astype("datetime64[ns]").astype(np.int64),
+            nombres=np.array(nombres),
+            **{f"c{j}": columnas[nombre] for j, nombre in enumerate(nombres)}
+        )
+
+
+def cargar_bloques(bloques):
+    """
+    Genera los bloques (tiempo, columnas) leídos por un worker, cargando (y eliminando)
+    los que se volcaron a disco.
+    """
+    for bloque in bloques:
+        if not isinstance(bloque, str):
+            yield bloque
+            continue
+        with np.load(bloque) as volcado:
+            nombres = [str(n) for n in volcado["nombres"]]
+            tiempo = volcado["tiempo"].astype("datetime64[ns]")
+            columnas = {nombre: volcado[f"c{j}"] for j, nombre in enumerate(nombres)}
+        os.remove(bloque)
+        try:
+            # La carpeta del worker se elimina con su último bloque
+            os.rmdir(os.path.dirname(bloque))
+        except OSError:
+            pass
+        yield tiempo, columnas
+
+
+def leer_miembro_zip_por_dia(zip_path, miembro, tamano_bloque=None, zona_horaria=ZONA_HORARIA,
+                             carpeta_temp=None, dias=None):
+    """
+    Lee un miembro TDMS directamente desde el ZIP y lo divide en bloques diarios.
+
+    El miembro se descomprime en un buffer en memoria (o temporal en disco si es grande),
+    sin extraerlo a la carpeta de trabajo. Con 'tamano_bloque', los bloques se vuelcan en
+    'carpeta_temp' (ver leer_tdms_por_dia).
+    """
+    with abrir_miembro_tdms(zip_path, miembro, carpeta_temp=carpeta_temp) as buffer:
+        return leer_tdms_por_dia(buffer, tamano_bloque, zona_horaria, carpeta_temp, dias)
+
+
+def primer_tiempo_zip(zip_path, miembros, zona_horaria=ZONA_HORARIA):
+    """
+    Primera marca de tiempo de los miembros TDMS de un ZIP (None si no se pudo leer ninguna).
+
+    Cada miembro se lee en flujo desde el ZIP, solo hasta su primera muestra. Los miembros
+    ilegibles se ignoran: su error se informa al leerlos para la conversión.
+    """
+    primeros = []
+    try:
+        with zipfile.ZipFile(zip_path) as zf:
+            for miembro, _ in miembros:
+                try:
+                    with zf.open(miembro) as origen:
+                        primero = primer_tiempo_tdms(origen, zona_horaria)
+                except Exception:
+                    continue
+                if primero is not None:
+                    primeros.append(primero)
+    except (OSError, zipfile.BadZipFile):
+        return None
+    return min(primeros) if primeros else None
+
+
+def bloque_a_dataframe(bloque):
+    """Convierte un bloque (tiempo, columnas) en DataFrame con columna 'Time'."""
+    tiempo, columnas = bloque
+    df = pd.DataFrame(columnas)
+    df.insert(0, "Time", tiempo)
+    return df
+
+
+def dataframe_a_bloque(df):
+    """Convierte un DataFrame con columna 'Time' en un bloque (tiempo, columnas)."""
+    return (
+        df["Time"].values.astype("datetime64[ns]"),
+        {nombre: df[nombre].values for nombre in df.columns if nombre != "Time"}
+    )
+
+
+def unir_bloques(bloques, reemplazar=False):
+    """
+    Une bloques (tiempo, columnas) de un mismo día en una matriz ordenada por tiempo.
+
+    Los canales ausentes en algún bloque se completan con NaN. Con 'reemplazar', las
+    filas de un bloque cuyo tiempo también aparece en un bloque posterior se descartan:
+    al unir un parcial con datos nuevos que se solapan, gana el dato más nuevo.
+
+    Retorna:
+        tuple: (tiempo datetime64[ns], datos float64 muestras x canales, nombres de canal)
+    """
+    if reemplazar:
+        bloques = _descartar_reemplazadas(bloques)
+    nombres = ordenar_nombres_columnas(
+        list(dict.fromkeys(n for _, columnas in bloques for n in columnas))
+    )
+    tiempo = np.concatenate([t for t, _ in bloques])
+    datos = np.full((len(tiempo), len(nombres)), np.nan)
+
+    inicio = 0
+    for t, columnas in bloques:
+        fin = inicio + len(t)
+        for j, nombre in enumerate(nombres):
+            if nombre in columnas:
+                datos[inicio:fin, j] = columnas[nombre]
+        inicio = fin
+
+    orden = np.argsort(tiempo, kind="stable")
+    return tiempo[orden], datos[orden], nombres
+
+
+def _descartar_reemplazadas(bloques):
+    """Quita de cada bloque las filas cuyo tiempo vuelve a aparecer en un bloque posterior."""
+    posteriores = np.array([], dtype="datetime64[ns]")
+    conservados = []
+    for tiempo, columnas in reversed(bloques):
+        conservar = ~np.isin(tiempo, posteriores)
+        if not conservar.all():
+            tiempo, columnas = tiempo[conservar], {n: datos[conservar] for n, datos in columnas.items()}
+        conservados.append((tiempo, columnas))
+        posteriores = np.concatenate([posteriores, tiempo])
+    return conservados[::-1]
+
+
+def ruta_dia_parcial(carpeta, fecha):
+    """Carpeta con los segmentos de un día incompleto."""
+    return os.path.join(carpeta, f"{fecha}_temp")
+
+
+def _segmentos_parciales(carpeta, fecha):
+    ruta = ruta_dia_parcial(carpeta, fecha)
+    if not os.path.isdir(ruta):
+        return []
+    return sorted(os.path.join(ruta, f) for f in os.listdir(ruta) if f.endswith(".npz"))
+
+
+def anexar_dia_parcial(carpeta, fecha, tiempo, datos, nombres):
+    """
+    Agrega filas a un día incompleto como un nuevo segmento '.npz'.
+
+    Los segmentos existentes no se reescriben, por lo que el costo depende solo de las
+    filas nuevas.
+    """
+    ruta = ruta_dia_parcial(carpeta, fecha)
+    os.makedirs(ruta, exist_ok=True)
+    segmento = os.path.join(ruta, f"{len(_segmentos_parciales(carpeta, fecha)):05d}.npz")
+    with open(segmento + ".tmp", "wb") as f:
+        np.savez(
+            f,
+            tiempo=tiempo.astype("datetime64[ns]").astype(np.int64),
+            datos=datos,
+            nombres=np.array(nombres)
+        )
+    os.replace(segmento + ".tmp", segmento)
+
+
+def guardar_dia_parcial(carpeta, fecha, tiempo, datos, nombres):
+    """Reemplaza un día incompleto por un único segmento con todas sus filas."""
+    eliminar_dia_parcial(carpeta, fecha)
+    anexar_dia_parcial(carpeta, fecha, tiempo, datos, nombres)
+
+
+def eliminar_dia_parcial(carpeta, fecha):
+    shutil.rmtree(ruta_dia_parcial(carpeta, fecha), ignore_errors=True)
+
+
+def tamano_dia_parcial(carpeta, fecha):
+    """Tamaño en bytes de los segmentos de un día incompleto (None si no hay parcial)."""
+    segmentos = _segmentos_parciales(carpeta, fecha)
+    return sum(os.path.getsize(s) for s in segmentos) if segmentos else None
+
+
+def restaurar_dia_parcial(carpeta, fecha, tamano):
+    """Quita los últimos segmentos de un día incompleto hasta volver a 'tamano' bytes (None: sin parcial)."""
+    if tamano is None:
+        eliminar_dia_parcial(carpeta, fecha)
+        return
+    segmentos = _segmentos_parciales(carpeta, fecha)
+    total = sum(os.path.getsize(s) for s in segmentos)
+    while segmentos and total > tamano:
+        segmento = segmentos.pop()
+        total -= os.path.getsize(segmento)
+        os.remove(segmento)
+
+
+def ultimo_tiempo_parcial(carpeta, fecha):
+    """
+    Devuelve (último tiempo, nombres de canal) de un día incompleto leyendo solo su último segmento.
+
+    Retorna (None, None) si no hay parcial.
+    """
+    segmentos = _segmentos_parciales(carpeta, fecha)
+    if not segmentos:
+        return None, None
+    with np.load(segmentos[-1]) as segmento:
+        tiempo = segmento["tiempo"]
+        nombres = [str(n) for n in segmento["nombres"]]
+    return np.datetime64(int(tiempo[-1]), "ns"), nombres
+
+
+def cargar_dia_parcial(carpeta, fecha):
+    """
+    Carga un día incompleto guardado previamente como bloque (tiempo, columnas).
+
+    Retorna None si no existe.
+    """
+    segmentos = _segmentos_parciales(carpeta, fecha)
+    if not segmentos:
+        return None
+    bloques = []
+    for ruta in segmentos:
+        with np.load(ruta) as parcial:
+            tiempo = parcial["tiempo"].astype("datetime64[ns]")
+            datos = parcial["datos"]
+            nombres = [str(n) for n in parcial["nombres"]]
+        bloques.append(_bloque(tiempo, datos, nombres))
+    return _bloque(*unir_bloques(bloques))
+
+
+def _bloque(tiempo, datos, nombres):
+    """Convierte una matriz (tiempo, datos, nombres) en un bloque (tiempo, columnas)."""
+    return tiempo, {nombre: datos[:, j] for j, nombre in enumerate(nombres)}
+
+
+def leer_tareas_por_dia(tareas, num_workers, backend, particionador, log):
+    """
+    Ejecuta en paralelo las lecturas TDMS y entrega sus bloques al particionador por día.
+
+    Parámetros:
+        tareas (dict): {etiqueta: (función, args)}, donde la función devuelve {fecha: [bloques]}.
+        num_workers (int): Número de workers del pool.
+        backend (str): "procesos" o "hilos".
+        particionador (ParticionadorDias): Destino de los bloques leídos.
+        log (function): Función para registrar mensajes.
+
+    Retorna:
+        dict: {etiqueta: fechas con datos} de las tareas leídas correctamente.
+    """
+    leidos = {}
+
+    with crear_executor(backend, num_workers) as executor:
+        futuros = {executor.submit(func, *args): etiqueta for etiqueta, (func, args) in tareas.items()}
+        for futuro in tqdm(as_completed(futuros), total=len(futuros), desc="Leyendo archivos TDMS", unit="archivo"):
+            etiqueta = futuros[futuro]
+            try:
+                por_dia = futuro.result()
+                for bloques in por_dia.values():
+                    for bloque in cargar_bloques(bloques):
+                        particionador.agregar(bloque_a_dataframe(bloque))
+                leidos[etiqueta] = sorted(por_dia)
+            except Exception as e:
+                log(f"[TDMS2MAT] Error al leer '{etiqueta}': {e}")
+
+    return leidos
+
+
+def escribir_dias_mat(particionador, carpeta_parcial, output_folder, unidad="05",
+                      procesar_incompleto=False, exportar_csv=False, log=print, punto_control=None,
+                      etapa_control="dias_mat", conservar_completos=False):
+    """
+    Une los datos de cada día con su parcial previo y escribe los archivos MAT diarios.
+
+    Solo se mantiene en memoria un día por vez. Los días incompletos se guardan como
+    segmentos en '<fecha>_temp/' dentro de 'carpeta_parcial': si las filas nuevas son
+    posteriores al parcial, solo se agrega un segmento con ellas; si se solapan, el parcial
+    se reescribe y las filas nuevas reemplazan a las del parcial con el mismo tiempo. El
+    día completo (con la muestra de las 23:59:59) o, con 'procesar_incompleto', el parcial,
+    se escribe como MAT. El parcial de un día completo se elimina después de escribir su
+    MAT, salvo con 'conservar_completos': entonces se conserva con todas sus filas, para
+    que las que lleguen después se unan a él, y el llamador debe eliminarlo.
+
+    Con un 'punto_control', al reanudar una ejecución interrumpida los días ya escritos se
+    omiten y el parcial de un día a medio escribir vuelve a su estado previo. Las marcas por
+    día se guardan en la etapa 'etapa_control' del punto de control.
+
+    Retorna:
+        list: Fechas de los días completos.
+    """
+    completos = []
+    for fecha in tqdm(particionador.dias(), desc="Escribiendo archivos MAT", unit="día"):
+        ruta_parcial = ruta_dia_parcial(carpeta_parcial, fecha)
+        marca = reanudar_dia(punto_control, etapa_control, str(fecha), ruta_parcial,
+                             lambda tamano: restaurar_dia_parcial(carpeta_parcial, fecha, tamano))
+        if marca is not None:
+            # Día escrito antes del corte: solo falta, si estaba completo, borrar su parcial
+            if marca["completo"]:
+                if conservar_completos:
+                    completos.append(str(fecha))
+                else:
+                    eliminar_dia_parcial(carpeta_parcial, fecha)
+            continue
+        iniciar_dia(punto_control, etapa_control, str(fecha), tamano_dia_parcial(carpeta_parcial, fecha))
+
+        tiempo, datos, nombres = unir_bloques([dataframe_a_bloque(particionador.leer_dia(fecha))])
+        ultimo, nombres_parcial = ultimo_tiempo_parcial(carpeta_parcial, fecha)
+
+        if ultimo is None:
+            completo = dia_completo(tiempo)
+            if not completo or conservar_completos:
+                anexar_dia_parcial(carpeta_parcial, fecha, tiempo, datos, nombres)
+        elif nombres == nombres_parcial and tiempo[0] > ultimo:
+            # Filas nuevas posteriores al parcial: se agregan sin reescribirlo
+            completo = dia_completo(tiempo)
+            if completo and not conservar_completos:
+                tiempo, datos, nombres = unir_bloques([
+                    cargar_dia_parcial(carpeta_parcial, fecha), _bloque(tiempo, datos, nombres)
+                ])
+            else:
+                anexar_dia_parcial(carpeta_parcial, fecha, tiempo, datos, nombres)
+                if completo or procesar_incompleto or exportar_csv:
+                    tiempo, datos, nombres = unir_bloques([cargar_dia_parcial(carpeta_parcial, fecha)])
+        else:
+            # Solapamiento con el parcial: se reconstruye el día y las filas nuevas reemplazan
+            # a las del parcial con el mismo tiempo (por ejemplo, un ZIP corregido)
+            tiempo, datos, nombres = unir_bloques([
+                cargar_dia_parcial(carpeta_parcial, fecha), _bloque(tiempo, datos, nombres)
+            ], reemplazar=True)
+            completo = dia_completo(tiempo)
+            if not completo or conservar_completos:
+                if punto_control is not None:
+                    respaldar(ruta_parcial)
+                guardar_dia_parcial(carpeta_parcial, fecha, tiempo, datos, nombres)
+
+        faltantes = [c for c in COLUMN_ORDER[1:] if c not in nombres]
+        if faltantes:
+            log(f"[TDMS2MAT] Advertencia: faltan columnas en {fecha}: {faltantes}")
+
+        if exportar_csv:
+            df = pd.DataFrame(datos, columns=nombres)
+            df.insert(0, "Time", tiempo)
+            ruta_csv = os.path.join(output_folder, f"{fecha}.csv")
+            df.to_csv(ruta_csv + ".part", sep=";", decimal=",", index=False)
+            os.replace(ruta_csv + ".part", ruta_csv)
+
+        if completo or procesar_incompleto:
+            output_file = os.path.join(output_folder, nombre_archivo_mat(fecha, unidad))
+            guardar_mat(output_file, tiempo_a_epoch(tiempo), datos)
+            log(f"[TDMS2MAT] Archivo generado: {os.path.basename(output_file)}")
+        else:
+            log(f"[TDMS2MAT] Día incompleto {fecha}: se completará en la próxima ejecución.")
+
+        terminar_dia(punto_control, etapa_control, str(fecha), completo)
+        descartar_respaldo(ruta_parcial)
+        if completo:
+            if conservar_completos:
+                completos.append(str(fecha))
+            else:
+                eliminar_dia_parcial(carpeta_parcial, fecha)
+
+    return completos
+
+
+def procesar_tdms_a_mat(carpeta_tdms, output_folder, unidad="05", procesar_incompleto=False,
+                        exportar_csv=False, num_workers=None, log_callback=None, backend="procesos",
+                        tamano_bloque=None, zona_horaria=ZONA_HORARIA, memoria_max=MEMORIA_MAX,
+                        punto_control=None, dias_por_archivo=None):
+    """
+    Convierte los archivos TDMS de una carpeta directamente en archivos MAT diarios.
+
+    Los canales se mantienen como columnas NumPy desde la lectura del TDMS hasta
+    'savemat', sin escribir ni releer CSV intermedios. Los días incompletos se guardan
+    en la carpeta TDMS como una carpeta '<fecha>_temp/' de segmentos '.npz' numerados
+    (ver escribir_dias_mat) y se completan en ejecuciones posteriores.
+
+    Parámetros:
+        carpeta_tdms (str): Carpeta con los archivos TDMS descomprimidos.
+        output_folder (str): Carpeta de salida para archivos MAT.
+        unidad (str): Unidad a procesar (por defecto "05").
+        procesar_incompleto (bool): Si es True, también genera el MAT de días incompletos.
+        exportar_csv (bool): Si es True, exporta además cada día como CSV en 'output_folder'.
+        num_workers (int): Número de workers de lectura TDMS (None: cálculo automático).
+        log_callback (function): Función de callback para registrar mensajes.
+        backend (str): Pool de lectura TDMS, "procesos" o "hilos".
+        tamano_bloque (int): Filas por bloque para la lectura TDMS en streaming.
+        zona_horaria (int | str): Desplazamiento en horas o zona IANA del canal de tiempo.
+        memoria_max (int): Bytes acumulados antes de volcar corridas por día a disco.
+        punto_control (PuntoControl): Avance durable para reanudar la escritura de días (opcional).
+        dias_por_archivo (dict): {ruta TDMS: fechas} para leer solo esos días de algunos
+            archivos (ZIP relacionados, ver Manifiesto.zips_pendientes).
+
+    Retorna:
+        dict: {ruta TDMS: nombres de los MAT diarios a los que aportó datos}.
+    """
+    def log(msg):
+        if log_callback:
+            log_callback(msg)
+
+    if not os.path.exists(carpeta_tdms):
+        log(f"[TDMS2MAT] La carpeta '{carpeta_tdms}' no existe.")
+        return {}
+
+    archivos_tdms = [
+        os.path.join(carpeta_tdms, archivo)
+        for archivo in os.listdir(carpeta_tdms)
+        if archivo.endswith(".tdms")
+    ]
+
+    if not archivos_tdms:
+        log(f"[TDMS2MAT] No se encontraron archivos TDMS en '{carpeta_tdms}'.")
+        return {}
+
+    os.makedirs(output_folder, exist_ok=True)
+    num_workers = calcular_num_workers(archivos_tdms, num_workers)
+    log(f"[TDMS2MAT] Procesando {len(archivos_tdms)} archivo(s) TDMS con {num_workers} worker(s) ({backend})...")
+
+    tareas = {
+        archivo: (leer_tdms_por_dia, (archivo, tamano_bloque, zona_horaria, carpeta_tdms,
+                                      (dias_por_archivo or {}).get(archivo)))
+        for archivo in archivos_tdms
+    }
+    with ParticionadorDias(carpeta_tdms, memoria_max) as particionador:
+        leidos = leer_tareas_por_dia(tareas, num_workers, backend, particionador, log)
+        escribir_dias_mat(particionador, carpeta_tdms, output_folder, unidad, procesar_incompleto, exportar_csv, log,
+                          punto_control)
+
+    for archivo in leidos:
+        eliminar_tdms(archivo)
+    log(f"[TDMS2MAT] {len(leidos)} archivo(s) TDMS convertidos y eliminados.")
+    return {archivo: [nombre_archivo_mat(fecha, unidad) for fecha in fechas] for archivo, fechas in leidos.items()}
+
+
+def procesar_zip_a_mat(input_folder, selected_files, carpeta_temp, output_folder, unidad="05",
+                       procesar_incompleto=False, exportar_csv=False, num_workers=None, log_callback=None,
+                       backend="procesos", tamano_bloque=None, zona_horaria=ZONA_HORARIA,
+                       memoria_max=MEMORIA_MAX, punto_control=None, dias_por_zip=None):
+    """
+    Convierte los TDMS contenidos en los ZIP seleccionados en archivos MAT diarios,
+    leyendo cada miembro directamente desde el ZIP (sin extraerlo a disco ni usar 7-Zip).
+
+    Parámetros:
+        input_folder (str): Carpeta con los archivos ZIP.
+        selected_files (list): Nombres de los ZIP a procesar.
+        carpeta_temp (str): Carpeta para los días parciales y los buffers grandes.
+        dias_por_zip (dict): {ZIP: fechas} para leer solo esos días de algunos ZIP.
+        Resto de parámetros: ver procesar_tdms_a_mat.
+
+    Retorna:
+        dict: {ZIP: nombres de los MAT diarios a los que aportó datos}, solo para los ZIP
+        cuyos miembros TDMS se leyeron todos correctamente.
+    """
+    def log(msg):
+        if log_callback:
+            log_callback(msg)
+
+    os.makedirs(output_folder, exist_ok=True)
+    tareas = {}
+    miembros_por_zip = {}
+    total_bytes = 0
+
+    for zip_file in selected_files:
+        zip_path = os.path.join(input_folder, zip_file)
+        try:
+            miembros = listar_miembros_tdms(zip_path)
+        except Exception as e:
+            log(f"[TDMS2MAT] Error al abrir '{zip_file}': {e}")
+            continue
+        miembros_por_zip[zip_file] = [f"{zip_file}:{miembro}" for miembro, _ in miembros]
+        for miembro, tamano in miembros:
+            tareas[f"{zip_file}:{miembro}"] = (
+                leer_miembro_zip_por_dia,
+                (zip_path, miembro, tamano_bloque, zona_horaria, carpeta_temp, (dias_por_zip or {}).get(zip_file))
+            )
+            total_bytes += tamano
+
+    if not tareas:
+        log("[TDMS2MAT] No se encontraron archivos TDMS en los ZIP seleccionados.")
+        return {}
+
+    num_workers = calcular_num_workers(list(tareas), num_workers, total_bytes=total_bytes)
+    log(f"[TDMS2MAT] Procesando {len(tareas)} TDMS desde {len(selected_files)} ZIP con {num_workers} worker(s) ({backend})...")
+
+    with ParticionadorDias(carpeta_temp, memoria_max) as particionador:
+        leidos = leer_tareas_por_dia(tareas, num_workers, backend, particionador, log)
+        escribir_dias_mat(particionador, carpeta_temp, output_folder, unidad, procesar_incompleto, exportar_csv, log,
+                          punto_control)
+    log(f"[TDMS2MAT] {len(leidos)} archivo(s) TDMS convertidos.")
+
+    return {
+        zip_file: sorted({nombre_archivo_mat(fecha, unidad) for etiqueta in etiquetas for fecha in leidos[etiqueta]})
+        for zip_file, etiquetas in miembros_por_zip.items()
+        if all(etiqueta in leidos for etiqueta in etiquetas)
+    }
+
+
+def procesar_zip_a_mat_en_flujo(input_folder, selected_files, carpeta_temp, output_folder, unidad="05",
+                                procesar_incompleto=False, exportar_csv=False, num_workers=None, log_callback=None,
+                                backend="procesos", tamano_bloque=None, zona_horaria=ZONA_HORARIA,
+                                memoria_max=MEMORIA_MAX, punto_control=None, archivos_en_vuelo=2,
+                                dias_por_zip=None):
+    """
+    Variante en flujo de procesar_zip_a_mat: los ZIP avanzan uno por uno por lectura,
+    particionado por día y escritura de MAT, y las etapas se solapan entre ZIP.
+
+    Mientras se particionan y escriben los días de un ZIP, el pool ya lee (descomprime y
+    decodifica) los miembros TDMS de los siguientes, hasta 'archivos_en_vuelo' ZIP en curso
+    contando el que se escribe. Un ZIP nuevo solo se envía al pool cuando se terminó de
+    escribir otro, de modo que la memoria queda acotada por esos ZIP y no por todo el lote.
+    Los primeros MAT se escriben en cuanto se termina el primer ZIP.
+
+    Los ZIP se procesan en el orden de su primera marca de tiempo (leída de los metadatos
+    y la primera muestra de cada TDMS), no por nombre. Los días que siguen en un ZIP
+    posterior se guardan como parciales y se completan al llegar su resto. El parcial de
+    un día completo se conserva mientras algún ZIP pendiente empiece ese día o antes: si
+    ese ZIP trae filas del día, se unen al parcial (las nuevas reemplazan a las de igual
+    tiempo) y el MAT se reescribe. Así los MAT resultantes son los mismos que en la
+    conversión por lotes siempre que cada TDMS esté ordenado en el tiempo. Queda un
+    límite, igual que en la conversión por lotes: filas que lleguen en una ejecución
+    posterior para un día ya escrito como completo no se unen a su MAT, sino que inician
+    un parcial nuevo.
+
+    Con un 'punto_control', cada ZIP escrito se registra y al reanudar no se repite.
+
+    Parámetros:
+        archivos_en_vuelo (int): ZIP en curso como máximo, incluido el que se escribe (con 1
+            no hay solapamiento; con 2, se lee el siguiente mientras se escribe el actual).
+        Resto de parámetros: ver procesar_zip_a_mat.
+
+    Retorna:
+        dict: {ZIP: nombres de los MAT diarios a los que aportó datos}, solo para los ZIP
+        cuyos miembros TDMS se leyeron todos correctamente.
+    """
+    def log(msg):
+        if log_callback:
+            log_callback(msg)
+
+    os.makedirs(output_folder, exist_ok=True)
+    procesados = punto_control.marcas("flujo_zip") if punto_control is not None else {}
+    retenidos = set()
+    if punto_control is not None:
+        retenidos = {fecha for fecha, retenido in punto_control.marcas("flujo_retenidos").items() if retenido}
+
+    def liberar_retenidos(limite=None):
+        """Elimina los parciales de días completos anteriores a 'limite' (todos, sin límite)."""
+        for fecha in sorted(retenidos):
+            if limite is None or fecha < limite:
+                eliminar_dia_parcial(carpeta_temp, fecha)
+                retenidos.discard(fecha)
+                if punto_control is not None:
+                    punto_control.marcar("flujo_retenidos", fecha, False)
+
+    pendientes = []
+    total_bytes = 0
+
+    for zip_file in sorted(selected_files):
+        if zip_file in procesados:
+            log(f"[TDMS2MAT] '{zip_file}' ya se convirtió antes del corte.")
+            continue
+        zip_path = os.path.join(input_folder, zip_file)
+        try:
+            miembros = listar_miembros_tdms(zip_path)
+        except Exception as e:
+            log(f"[TDMS2MAT] Error al abrir '{zip_file}': {e}")
+            continue
+        pendientes.append((zip_file, zip_path, miembros))
+        total_bytes += sum(tamano for _, tamano in miembros)
+
+    if not pendientes:
+        log("[TDMS2MAT] No hay ZIP pendientes de conversión.")
+        liberar_retenidos()
+        return dict(procesados)
+
+    etiquetas = [f"{zip_file}:{miembro}" for zip_file, _, miembros in pendientes for miembro, _ in miembros]
+    num_workers = calcular_num_workers(etiquetas, num_workers, total_bytes=total_bytes)
+    archivos_en_vuelo = max(1, int(archivos_en_vuelo))
+    log(f"[TDMS2MAT] Procesando en flujo {len(pendientes)} ZIP con {num_workers} worker(s) ({backend}), "
+        f"hasta {archivos_en_vuelo} ZIP en curso...")
+
+    resultado = dict(procesados)
+    with crear_executor(backend, num_workers) as executor:
+        futuros_inicio = [executor.submit(primer_tiempo_zip, zip_path, miembros, zona_horaria)
+                          for _, zip_path, miembros in pendientes]
+        inicios = {pendiente[0]: futuro.result() for pendiente, futuro in zip(pendientes, futuros_inicio)}
+
+        # Orden cronológico; los ZIP sin marca de tiempo legible van primero
+        def clave_orden(pendiente):
+            inicio = inicios[pendiente[0]]
+            return (-1 if inicio is None else int(inicio.astype(np.int64)), pendiente[0])
+
+        pendientes.sort(key=clave_orden)
+        cola = iter(pendientes)
+        en_vuelo = deque()
+
+        def enviar_siguientes():
+            while len(en_vuelo) < archivos_en_vuelo:
+                siguiente = next(cola, None)
+                if siguiente is None:
+                    return
+                zip_file, zip_path, miembros = siguiente
+                futuros = [
+                    (miembro, executor.submit(leer_miembro_zip_por_dia, zip_path, miembro, tamano_bloque,
+                                              zona_horaria, carpeta_temp, (dias_por_zip or {}).get(zip_file)))
+                    for miembro, _ in miembros
+                ]
+                en_vuelo.append((zip_file, futuros))
+
+        enviar_siguientes()
+        while en_vuelo:
+            # El ZIP actual sigue contando en 'en_vuelo' hasta terminar de escribirse
+            zip_file, futuros = en_vuelo[0]
+
+            fechas = set()
+            completo = True
+            with ParticionadorDias(carpeta_temp, memoria_max) as particionador:
+                for miembro, futuro in futuros:
+                    try:
+                        por_dia = futuro.result()
+                    except Exception as e:
+                        log(f"[TDMS2MAT] Error al leer '{zip_file}:{miembro}': {e}")
+                        completo = False
+                        continue
+                    for bloques in por_dia.values():
+                        for bloque in cargar_bloques(bloques):
+                            particionador.agregar(bloque_a_dataframe(bloque))
+                    fechas.update(por_dia)
+                completos = escribir_dias_mat(particionador, carpeta_temp, output_folder, unidad,
+                                              procesar_incompleto, exportar_csv, log, punto_control,
+                                              etapa_control=f"dias_mat:{zip_file}", conservar_completos=True)
+
+            salidas = sorted(nombre_archivo_mat(fecha, unidad) for fecha in fechas)
+            if completo:
+                resultado[zip_file] = salidas
+                if punto_control is not None:
+                    punto_control.marcar("flujo_zip", zip_file, salidas)
+            log(f"[TDMS2MAT] '{zip_file}' convertido ({len(salidas)} día(s)).")
+            en_vuelo.popleft()
+            enviar_siguientes()
+
+            # Los días completos se liberan cuando ningún ZIP pendiente puede aportarles filas
+            for fecha in completos:
+                retenidos.add(fecha)
+                if punto_control is not None:
+                    punto_control.marcar("flujo_retenidos", fecha, True)
+            # (si el siguiente ZIP no tiene marca de tiempo legible, se conservan todos)
+            if not en_vuelo:
+                liberar_retenidos()
+            elif inicios[en_vuelo[0][0]] is not None:
+                liberar_retenidos(str(inicios[en_vuelo[0][0]].astype("datetime64[D]")))
+
+    return resultado
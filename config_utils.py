@@ -53,4 +53,21 @@ def validate_config(config):
         return False
     
     # Todos los campos son válidos
-    return True
\ No newline at end of file
+    return True
+
+def parsear_opciones(opciones):
+    """
+    Convierte opciones 'clave=valor' de la línea de comandos en un diccionario de configuración.
+    Los valores se interpretan como JSON si es posible (números, true/false, listas); si no,
+    se conservan como texto.
+    """
+    resultado = {}
+    for opcion in opciones:
+        clave, separador, valor = opcion.partition("=")
+        if not separador or not clave:
+            raise ValueError(f"Opción inválida '{opcion}': use clave=valor")
+        try:
+            resultado[clave] = json.loads(valor)
+        except ValueError:
+            resultado[clave] = valor
+    return resultado
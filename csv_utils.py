@@ -1,11 +1,13 @@
-import os
-import shutil
 import pandas as pd
 from tqdm import tqdm
-import glob
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from collections import defaultdict
-import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+
+from partition_utils import ParticionadorDias, MEMORIA_MAX
+from storage_utils import obtener_almacen
+from checkpoint_utils import respaldar, descartar_respaldo, iniciar_dia, terminar_dia, reanudar_dia
+from metricas_utils import medir_archivo, registrar_archivo
+from perfil_utils import envolver_executor
 
 COLUMN_ORDER = [
     "Time", "Potencia", "Paletas", "Alabes", "Pres_Abr_Pal", "Pres_Cerr_Pal",
@@ -14,65 +16,166 @@ COLUMN_ORDER = [
     "ModoPotCon", "FaseDiv2"
 ]
 
-# Diccionario compartido para acumular los datos por día (protegido con lock)
-datos_por_dia = defaultdict(list)
-datos_lock = threading.Lock()
+# Columna auxiliar que marca las filas del parcial previo al reconstruir un día
+COLUMNA_PREVIO = "_previo"
+
+
+def ordenar_columnas(columnas):
+    """Ordena las columnas según COLUMN_ORDER; las no previstas van al final."""
+    ordered_cols = [col for col in COLUMN_ORDER if col in columnas]
+    remaining_cols = [col for col in columnas if col not in ordered_cols]
+    return ordered_cols + remaining_cols
+
+
+def procesar_csv_individual(file, particionador, almacen=None):
+    almacen = obtener_almacen(almacen or "csv")
+    with medir_archivo("agrupar", file) as metrica:
+        try:
+            metrica["bytes_entrada"] = almacen.tamano(file)
+            metrica["filas_entrada"] = 0
+            for chunk in almacen.iterar(file, filas=10000):
+                particionador.agregar(chunk)
+                metrica["filas_entrada"] += len(chunk)
+        except Exception as e:
+            print(f"Error procesando {file}: {e}")
+    registrar_archivo(metrica)
+
+def descartar_reemplazadas(bloque):
+    """
+    Quita las filas del parcial previo (marcadas con COLUMNA_PREVIO) cuyo tiempo también
+    llegó en los datos nuevos: al reconstruir un día, gana el dato más nuevo.
+    """
+    if COLUMNA_PREVIO not in bloque:
+        return bloque
+    previo = bloque[COLUMNA_PREVIO].notna()
+    return bloque[~(previo & bloque["Time"].isin(bloque.loc[~previo, "Time"]))]
+
+
+def dia_completo(last_time):
+    """Indica si la última muestra corresponde a las 23:59:59."""
+    return pd.notnull(last_time) and last_time.hour == 23 and last_time.minute == 59 and last_time.second == 59
+
 
-def procesar_csv_individual(file):
-    try:
-        for chunk in pd.read_csv(file, delimiter=";", decimal=",", parse_dates=['Time'], chunksize=10000):
-            chunk.sort_values(by='Time', inplace=True)
-            chunk['Date'] = chunk['Time'].dt.date
+def ordenar_y_agrupado_por_dia(input_folder, num_workers=14, memoria_max=MEMORIA_MAX, formato="csv",
+                               punto_control=None):
+    """
+    Agrupa por día las filas de todas las tablas de la carpeta y escribe una tabla '<fecha>' por día.
 
-            with datos_lock:
-                for date, group in chunk.groupby('Date'):
-                    datos_por_dia[date].append(group)
-    except Exception as e:
-        print(f"Error procesando {file}: {e}")
+    Los datos se particionan con ParticionadorDias: la memoria usada queda acotada por
+    'memoria_max' (bytes) y cada archivo diario se escribe por bloques a partir de una
+    mezcla ordenada de las corridas volcadas a disco.
 
-def ordenar_y_agrupado_por_dia(input_folder, num_workers=14):
-    csv_files = glob.glob(os.path.join(input_folder, "*.csv"))
+    Los días incompletos se mantienen en '<fecha>_temp'. Si en una ejecución posterior
+    llegan filas posteriores a la última del parcial, solo esas filas se agregan al final
+    del archivo; cuando aparece la muestra de las 23:59:59, el parcial se renombra a
+    '<fecha>'. Si las filas nuevas se solapan con el parcial, el día se reconstruye y las
+    filas nuevas reemplazan a las del parcial con el mismo tiempo.
+
+    Con un 'punto_control' (checkpoint_utils.PuntoControl) cada día se registra antes y
+    después de escribirse: al reanudar una ejecución interrumpida, los días ya escritos no
+    se repiten y el parcial de un día a medio escribir vuelve a su estado previo.
+
+    Parámetros:
+        formato (str): Formato de las tablas intermedias ("csv", "npy" o "feather").
+        punto_control (PuntoControl): Avance durable de la ejecución (opcional).
+    """
+    almacen = obtener_almacen(formato)
+    csv_files = [f for f in almacen.listar(input_folder) if not almacen.nombre(f).endswith("_temp")]
+
+    if punto_control is not None:
+        # Al reanudar se usan las mismas fuentes: las tablas diarias ya escritas no son entradas
+        fuentes = punto_control.marca("ordenar", "fuentes")
+        if fuentes is None:
+            punto_control.marcar("ordenar", "fuentes", csv_files)
+        else:
+            csv_files = [f for f in fuentes if almacen.existe(f)]
 
     if not csv_files:
-        print("No se encontraron archivos CSV en la carpeta especificada.")
+        print(f"No se encontraron archivos {almacen.formato.upper()} en la carpeta especificada.")
         return
 
-    # Procesar archivos CSV en paralelo
-    with ThreadPoolExecutor(max_workers=num_workers) as executor:
-        list(tqdm(executor.map(procesar_csv_individual, csv_files), total=len(csv_files), desc="Leyendo archivos CSV", unit="archivo"))
+    with ParticionadorDias(input_folder, memoria_max) as particionador:
+        # Procesar archivos en paralelo
+        with envolver_executor(ThreadPoolExecutor(max_workers=num_workers)) as executor:
+            list(tqdm(executor.map(procesar_csv_individual, csv_files, repeat(particionador), repeat(almacen)),
+                      total=len(csv_files), desc="Leyendo archivos intermedios", unit="archivo"))
 
-    # Combinar y guardar resultados por día
-    for date, groups in tqdm(datos_por_dia.items(), desc="Concatenando archivos por día", unit="día"):
-        daily_data = pd.concat(groups, ignore_index=True)
-        daily_data.sort_values(by='Time', inplace=True)
-        daily_data.drop(columns=['Date'], inplace=True)
+        # Combinar y guardar resultados por día
+        for date in tqdm(particionador.dias(), desc="Concatenando archivos por día", unit="día"):
+            output_file = almacen.ruta(input_folder, str(date))
+            temp_file = almacen.ruta(input_folder, f"{date}_temp")
 
-        # Reordenar columnas
-        current_columns = list(daily_data.columns)
-        if current_columns != COLUMN_ORDER:
-            missing_cols = [col for col in COLUMN_ORDER if col not in current_columns]
+            marca = reanudar_dia(punto_control, "dias_intermedios", str(date), temp_file,
+                                 lambda tamano: almacen.restaurar(temp_file, tamano))
+            if marca is not None:
+                # Día escrito antes del corte: solo falta, si estaba completo, renombrarlo
+                if marca["completo"] and almacen.existe(temp_file):
+                    almacen.renombrar(temp_file, output_file)
+                continue
+            iniciar_dia(punto_control, "dias_intermedios", str(date),
+                        almacen.tamano(temp_file) if almacen.existe(temp_file) else None)
+
+            # Reordenar columnas
+            current_columns = list(particionador.columnas[date])
+            columnas = ordenar_columnas(current_columns)
+
+            anexar = reconstruir = False
+            if almacen.existe(temp_file):
+                columnas_temp, ultimo_temp = almacen.columnas_y_ultimo_tiempo(temp_file)
+                anexar = (
+                    pd.notnull(ultimo_temp)
+                    and set(current_columns) <= set(columnas_temp)
+                    and particionador.rangos[date][0] > ultimo_temp
+                )
+                if anexar:
+                    columnas = columnas_temp
+                else:
+                    # Solapamiento con el parcial: se reconstruye el día completo
+                    previo = respaldar(temp_file) if punto_control is not None else temp_file
+                    for chunk in almacen.iterar(previo, filas=10000):
+                        particionador.agregar(chunk.assign(**{COLUMNA_PREVIO: True}))
+                    reconstruir = True
+                    columnas = ordenar_columnas([c for c in particionador.columnas[date] if c != COLUMNA_PREVIO])
+
+            missing_cols = [col for col in COLUMN_ORDER if col not in columnas]
             if missing_cols:
-                print(f"Advertencia: faltan columnas en {date}.csv: {missing_cols}")
-            ordered_cols = [col for col in COLUMN_ORDER if col in current_columns]
-            remaining_cols = [col for col in current_columns if col not in ordered_cols]
-            daily_data = daily_data[ordered_cols + remaining_cols]
+                print(f"Advertencia: faltan columnas en {date}: {missing_cols}")
 
-        output_file = os.path.join(input_folder, f"{date}.csv")
-        daily_data.to_csv(output_file, sep=";", decimal=",", index=False)
+            bloques = particionador.iterar_dia(date)
+            if reconstruir:
+                # Las filas con el mismo tiempo quedan en el mismo bloque de la mezcla
+                bloques = (descartar_reemplazadas(daily_data) for daily_data in bloques)
+            bloques = (daily_data.reindex(columns=columnas) for daily_data in bloques)
+            last_time = pd.NaT
+            with medir_archivo("dias", str(date)) as metrica:
+                metrica["filas_salida"] = 0
+                if anexar:
+                    for daily_data in bloques:
+                        almacen.anexar(temp_file, daily_data)
+                        last_time = daily_data['Time'].iloc[-1]
+                        metrica["filas_salida"] += len(daily_data)
+                else:
+                    def registrar_ultimo(bloques):
+                        nonlocal last_time
+                        for daily_data in bloques:
+                            last_time = daily_data['Time'].iloc[-1]
+                            metrica["filas_salida"] += len(daily_data)
+                            yield daily_data
+                    almacen.escribir(temp_file, registrar_ultimo(bloques))
+                metrica["bytes_salida"] = almacen.tamano(temp_file)
+            registrar_archivo(metrica)
 
-        # Verificación para crear _temp.csv si el día está incompleto
-        last_time = daily_data['Time'].max()
-        temp_file = os.path.join(input_folder, f"{date}_temp.csv")
+            terminar_dia(punto_control, "dias_intermedios", str(date), dia_completo(last_time))
+            descartar_respaldo(temp_file)
 
-        if pd.notnull(last_time) and last_time.hour == 23 and last_time.minute == 59 and last_time.second == 59:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-        else:
-            shutil.copy(output_file, temp_file)
+            # El parcial pasa a ser el archivo del día cuando está completo
+            if dia_completo(last_time):
+                almacen.renombrar(temp_file, output_file)
 
-    eliminar_archivos_csv(csv_files)
+    eliminar_archivos_csv(csv_files, almacen)
 
-def eliminar_archivos_csv(csv_files):
+def eliminar_archivos_csv(csv_files, almacen=None):
+    almacen = obtener_almacen(almacen or "csv")
     for file in csv_files:
-        if os.path.exists(file) and not file.endswith("_temp.csv"):
-            os.remove(file)
+        if almacen.existe(file) and not almacen.nombre(file).endswith("_temp"):
+            almacen.eliminar(file)
@@ -1,46 +1,212 @@
 import os
 import subprocess
 import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from perfil_utils import envolver_executor
 
-def decompress_zip_files(input_folder, output_folder, selected_files):
+# Tamaño a partir del cual un miembro TDMS en memoria se vuelca a un archivo temporal
+MAX_MEMORIA_MIEMBRO = 256 * 1024 * 1024
+
+
+def es_miembro_tdms(nombre):
+    """Indica si un miembro del ZIP es un archivo TDMS de datos (se ignoran los '_index')."""
+    return nombre.lower().endswith(".tdms") and not nombre.endswith("/")
+
+
+def listar_miembros_tdms(zip_path):
+    """
+    Lista los miembros TDMS de un archivo ZIP.
+
+    Retorna:
+        list: [(nombre del miembro, tamaño descomprimido en bytes)]
+    """
+    with zipfile.ZipFile(zip_path) as zf:
+        return [(info.filename, info.file_size) for info in zf.infolist() if es_miembro_tdms(info.filename)]
+
+
+def abrir_miembro_tdms(zip_path, miembro, max_memoria=MAX_MEMORIA_MIEMBRO, carpeta_temp=None):
+    """
+    Descomprime un miembro del ZIP en un buffer binario con posicionamiento (seek).
+
+    El contenido se mantiene en memoria hasta 'max_memoria' bytes y, por encima de ese
+    tamaño, se vuelca a un archivo temporal anónimo en 'carpeta_temp' que se elimina al
+    cerrarse. El buffer devuelto puede pasarse directamente a TdmsFile.read/TdmsFile.open.
+
+    Retorna:
+        tempfile.SpooledTemporaryFile: Buffer posicionado al inicio; el llamador debe cerrarlo.
+    """
+    buffer = tempfile.SpooledTemporaryFile(max_size=max_memoria, dir=carpeta_temp)
+    try:
+        with zipfile.ZipFile(zip_path) as zf, zf.open(miembro) as origen:
+            shutil.copyfileobj(origen, buffer, 1024 * 1024)
+        buffer.seek(0)
+    except Exception:
+        buffer.close()
+        raise
+    return buffer
+
+
+def _ruta_sin_conflicto(output_folder, nombre):
+    """Devuelve una ruta libre en output_folder, agregando '_N' al nombre si ya existe."""
+    dest_path = os.path.join(output_folder, nombre)
+    if os.path.exists(dest_path):
+        base, ext = os.path.splitext(nombre)
+        counter = 1
+        while os.path.exists(dest_path):
+            dest_path = os.path.join(output_folder, f"{base}_{counter}{ext}")
+            counter += 1
+    return dest_path
+
+
+def _reservar_ruta(output_folder, nombre):
+    """
+    Reserva de forma atómica un nombre libre en output_folder (creación exclusiva).
+
+    Varias extracciones concurrentes pueden pedir el mismo nombre; solo una obtiene
+    cada ruta y las demás reciben el siguiente sufijo '_N' disponible.
+    """
+    base, ext = os.path.splitext(nombre)
+    counter = 0
+    while True:
+        candidato = nombre if counter == 0 else f"{base}_{counter}{ext}"
+        dest_path = os.path.join(output_folder, candidato)
+        try:
+            os.close(os.open(dest_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return dest_path
+        except FileExistsError:
+            counter += 1
+
+
+def _extraer_zipfile(zip_path, output_folder):
+    """Extrae todos los miembros del ZIP a output_folder, sin subcarpetas, usando zipfile."""
+    with zipfile.ZipFile(zip_path) as zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            dest_path = _ruta_sin_conflicto(output_folder, os.path.basename(info.filename))
+            with zf.open(info) as origen, open(dest_path, "wb") as destino:
+                shutil.copyfileobj(origen, destino, 1024 * 1024)
+
+
+def _extraer_7z(zip_path, output_folder):
+    """Extrae el ZIP con 7-Zip en output_folder (puede crear subcarpetas)."""
+    subprocess.run(['7z', 'x', zip_path, f'-o{output_folder}', '-y'],
+                   check=True, stdout=subprocess.DEVNULL)
+
+
+def descomprimir_archivo(zip_path, output_folder, motor="zipfile", al_reservar=None):
+    """
+    Descomprime un ZIP en un área de preparación propia y mueve sus archivos a output_folder.
+
+    La extracción ocurre en 'output_folder/.staging/<zip>_XXXX', de modo que solo se recorre
+    el contenido de este archivo (no toda la carpeta de trabajo). Cada archivo se mueve con
+    os.replace a un nombre reservado de forma exclusiva, por lo que la operación es atómica
+    y no hay conflictos entre extracciones concurrentes. 'al_reservar', si se indica, recibe
+    las rutas finales reservadas antes de mover los archivos.
+
+    Retorna:
+        list: Rutas finales de los archivos extraídos.
+    """
+    staging_root = os.path.join(output_folder, ".staging")
+    os.makedirs(staging_root, exist_ok=True)
+    base_zip = os.path.splitext(os.path.basename(zip_path))[0]
+    staging = tempfile.mkdtemp(prefix=f"{base_zip}_", dir=staging_root)
+
+    try:
+        if motor == "7z":
+            _extraer_7z(zip_path, staging)
+        else:
+            _extraer_zipfile(zip_path, staging)
+
+        origenes = [os.path.join(root, file) for root, _, files in os.walk(staging) for file in files]
+        movidos = [_reservar_ruta(output_folder, os.path.basename(origen)) for origen in origenes]
+        if al_reservar is not None:
+            al_reservar(movidos)
+        for origen, dest_path in zip(origenes, movidos):
+            try:
+                os.replace(origen, dest_path)
+            except OSError:
+                os.remove(dest_path)
+                raise
+        return movidos
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _registrar_reservas(punto_control, zip_file):
+    """Callback 'al_reservar' que guarda en el punto de control las rutas reservadas para un ZIP."""
+    if punto_control is None:
+        return None
+    return lambda rutas: punto_control.marcar("descompresion_reservas", zip_file, rutas)
+
+
+def decompress_zip_files(input_folder, output_folder, selected_files, motor="zipfile", num_workers=None,
+                         punto_control=None):
     """
     Descomprime los archivos ZIP seleccionados directamente en la carpeta de salida sin crear subcarpetas.
     Si hay conflictos de nombres, los archivos se renombran automáticamente.
+
+    Los ZIP se descomprimen en paralelo, cada uno en su propia área de preparación, de modo
+    que el costo de cada archivo no depende de cuántos se procesaron antes.
+
+    Parámetros:
+        motor (str): "zipfile" (biblioteca estándar, por defecto) o "7z" (requiere 7-Zip en el PATH).
+        num_workers (int): Número de descompresiones simultáneas (por defecto, el número de CPUs).
+        punto_control (PuntoControl): Si se indica, cada ZIP descomprimido se registra en él y,
+            al reanudar una ejecución interrumpida, los ya registrados no se vuelven a extraer.
+
+    Retorna:
+        dict: {ZIP: rutas de los archivos extraídos} de los ZIP descomprimidos correctamente.
     """
-    if shutil.which('7z') is None:
+    if motor == "7z" and shutil.which('7z') is None:
         raise EnvironmentError("El programa '7z' no está instalado o no está en el PATH.")
+    if motor not in ("zipfile", "7z"):
+        raise ValueError(f"Motor de descompresión desconocido: '{motor}'. Use 'zipfile' o '7z'.")
 
     os.makedirs(output_folder, exist_ok=True)
+    if not selected_files:
+        return {}
 
-    for zip_file in selected_files:
-        zip_path = os.path.join(input_folder, zip_file)
-        print(f"Procesando archivo: {zip_file}")
+    extraidos = {}
+    if punto_control is not None:
+        extraidos = punto_control.marcas("descompresion")
+        for zip_file in extraidos:
+            print(f"Ya descomprimido en la ejecución interrumpida: {zip_file}")
+        # ZIP cortados a mitad de la extracción: se quitan sus archivos antes de repetirla
+        for zip_file, rutas in punto_control.marcas("descompresion_reservas").items():
+            if zip_file not in extraidos:
+                for ruta in rutas:
+                    if os.path.exists(ruta):
+                        os.remove(ruta)
+    selected_files = [zip_file for zip_file in selected_files if zip_file not in extraidos]
+    if not selected_files:
+        return extraidos
 
-        try:
-            subprocess.run(['7z', 'x', zip_path, f'-o{output_folder}', '-y'], check=True)
-
-            for root, _, files in os.walk(output_folder):
-                for file in files:
-                    src_path = os.path.join(root, file)
-                    dest_path = os.path.join(output_folder, file)
-
-                    if src_path != dest_path:
-                        if os.path.exists(dest_path):
-                            base, ext = os.path.splitext(file)
-                            counter = 1
-                            while os.path.exists(dest_path):
-                                dest_path = os.path.join(output_folder, f"{base}_{counter}{ext}")
-                                counter += 1
-                        shutil.move(src_path, dest_path)
-
-            for root, dirs, _ in os.walk(output_folder):
-                for dir in dirs:
-                    dir_path = os.path.join(root, dir)
-                    if not os.listdir(dir_path):
-                        shutil.rmtree(dir_path)
-
-        except subprocess.CalledProcessError as e:
-            print(f"Error al descomprimir {zip_file}: {e}")
-        except Exception as e:
-            print(f"Error procesando {zip_file}: {e}")
\ No newline at end of file
+    num_workers = max(1, min(num_workers or os.cpu_count() or 1, len(selected_files)))
+
+    with envolver_executor(ThreadPoolExecutor(max_workers=num_workers)) as executor:
+        futuros = {
+            executor.submit(
+                descomprimir_archivo, os.path.join(input_folder, zip_file), output_folder, motor,
+                _registrar_reservas(punto_control, zip_file)
+            ): zip_file
+            for zip_file in selected_files
+        }
+        for futuro in as_completed(futuros):
+            zip_file = futuros[futuro]
+            try:
+                movidos = futuro.result()
+                extraidos[zip_file] = movidos
+                if punto_control is not None:
+                    punto_control.marcar("descompresion", zip_file, movidos)
+                print(f"Procesado archivo: {zip_file} ({len(movidos)} archivo(s))")
+            except subprocess.CalledProcessError as e:
+                print(f"Error al descomprimir {zip_file}: {e}")
+            except Exception as e:
+                print(f"Error procesando {zip_file}: {e}")
+
+    shutil.rmtree(os.path.join(output_folder, ".staging"), ignore_errors=True)
+    return extraidos
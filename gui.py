@@ -30,10 +30,14 @@ class App:
             "descomprimir": BooleanVar(value=True),
             "n_channels": IntVar(value=16),
             "unidad": StringVar(value="05"),
+            "zona_horaria": StringVar(value="-3"),
             "procesar_incompleto": BooleanVar(value=False),
             "rainflow": BooleanVar(value=False),
             "realizar_conteo": BooleanVar(value=False),
-            "graficos_matlab": BooleanVar(value=False)
+            "graficos_matlab": BooleanVar(value=False),
+            "pipeline_directo": BooleanVar(value=False),
+            "exportar_csv": BooleanVar(value=False),
+            "exportar_excel_conteo": BooleanVar(value=False)
         }
 
         self.stop_event = Event()
@@ -172,7 +176,12 @@ class App:
         self.root.update_idletasks()
 
     def save_config(self):
-        data = {k:v.get() for k,v in self.config.items()}
+        # Se conservan las claves que solo se editan en config.json
+        data = {}
+        if os.path.exists(CONFIG_FILE):
+            with open(CONFIG_FILE) as f:
+                data = json.load(f)
+        data.update({k:v.get() for k,v in self.config.items()})
         data["selected_files"] = self.selected_files
         with open(CONFIG_FILE,"w") as f:
             json.dump(data,f,indent=4)
@@ -240,11 +249,15 @@ class App:
         self.create_labeled_entry(pf2,"FS (Hz):","FS",0,0)
         self.create_labeled_entry(pf2,"Canales:","n_channels",0,1)
         self.create_labeled_entry(pf2,"Unidad:","unidad",0,2)
+        self.create_labeled_entry(pf2,"Zona horaria:","zona_horaria",0,3)
         ttk.Checkbutton(pf2,text="Descomprimir y Procesar",variable=self.config["descomprimir"],bootstyle="round-toggle").grid(row=1,column=0,sticky="w",pady=2)
         ttk.Checkbutton(pf2,text="Incompletos",variable=self.config["procesar_incompleto"],bootstyle="round-toggle").grid(row=1,column=1,sticky="w",pady=2)
         ttk.Checkbutton(pf2,text="Gráficos MATLAB",variable=self.config["graficos_matlab"],bootstyle="round-toggle").grid(row=1,column=2,sticky="w",pady=2)
         ttk.Checkbutton(pf2,text="Rainflow",variable=self.config["rainflow"],bootstyle="round-toggle").grid(row=2,column=0,sticky="w",pady=2)
         ttk.Checkbutton(pf2,text="Conteo Arranques/Paradas",variable=self.config["realizar_conteo"],bootstyle="round-toggle").grid(row=2,column=1,sticky="w",pady=2)
+        ttk.Checkbutton(pf2,text="TDMS→MAT directo",variable=self.config["pipeline_directo"],bootstyle="round-toggle").grid(row=2,column=2,sticky="w",pady=2)
+        ttk.Checkbutton(pf2,text="Exportar CSV",variable=self.config["exportar_csv"],bootstyle="round-toggle").grid(row=3,column=0,sticky="w",pady=2)
+        ttk.Checkbutton(pf2,text="Exportar Excel Conteo",variable=self.config["exportar_excel_conteo"],bootstyle="round-toggle").grid(row=3,column=1,sticky="w",pady=2)
 
         # Log
         lf = ttk.Labelframe(mf, text="Registro", padding=10)
@@ -266,7 +279,9 @@ class App:
     def open_advanced_config(self):
         messagebox.showinfo("Avanzada", "Pendiente...")
 
-# Lanzamiento
-root = ttk.Window(themename="superhero")
-App(root)
-root.mainloop()
+# Lanzamiento (protegido para que los workers de procesos no abran la ventana)
+if __name__ == "__main__":
+    root = ttk.Window(themename="superhero")
+    App(root)
+    root.mainloop()
+
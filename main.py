@@ -1,17 +1,20 @@
 import os
 import logging
+import importlib
 import traceback
+from contextlib import nullcontext, ExitStack
 from pathlib import Path
+from datetime import datetime
 from typing import Dict, Any, Callable, Optional, List
 
-# Importaciones más específicas
+# Importaciones más específicas. Los módulos de las etapas (pandas, scipy, nptdms) se
+# importan recién al ejecutar cada etapa (ver etapa_diferida)
 from config_utils import load_config, save_config, validate_config
 from decompress_utils import decompress_zip_files
-from tdms_utils import procesar_archivos_tdms_paralelo
-from csv_utils import ordenar_y_agrupado_por_dia
-from mat_utils import csv_to_mat
-from matlab_utils import process_mat_files
-from startup_shutdown_counter import process_mat_folder
+from manifiesto_utils import Manifiesto, NOMBRE_MANIFIESTO, procedencia_extraidos
+from checkpoint_utils import PuntoControl, NOMBRE_PUNTO_CONTROL, limpiar_areas_trabajo
+from metricas_utils import Telemetria
+from perfil_utils import Perfilador
 
 
 class ProcessingError(Exception):
@@ -47,7 +50,10 @@ def setup_folders(folders: List[str], log_func: Callable[[str], None]) -> bool:
 
 
 def process_stage(name: str, func: Callable, args: tuple, 
-                  log_func: Callable[[str], None], continue_on_error: bool = False) -> bool:
+                  log_func: Callable[[str], None], continue_on_error: bool = False,
+                  kwargs: Optional[Dict[str, Any]] = None,
+                  telemetria: Optional[Telemetria] = None,
+                  perfilador: Optional[Perfilador] = None) -> bool:
     """
     Ejecuta una etapa de procesamiento con manejo de errores estándar.
     
@@ -57,13 +63,38 @@ def process_stage(name: str, func: Callable, args: tuple,
         args: Argumentos para la función
         log_func: Función para registrar mensajes
         continue_on_error: Si es True, no detiene el proceso en caso de error
+        kwargs: Argumentos con nombre opcionales para la función
+        telemetria: Si se indica, registra tiempos, memoria y volumen de la etapa
+        perfilador: Si se indica, perfila la etapa y sus workers con cProfile y tracemalloc
     
     Returns:
         True si la etapa fue exitosa, False en caso contrario
     """
+    if telemetria is None and perfilador is None:
+        return _ejecutar_etapa(name, func, args, log_func, continue_on_error, kwargs)
+    with ExitStack() as contextos:
+        registro = contextos.enter_context(telemetria.etapa(name)) if telemetria is not None else None
+        if perfilador is not None:
+            contextos.enter_context(perfilador.etapa(name))
+        exito = _ejecutar_etapa(name, func, args, log_func, continue_on_error, kwargs)
+        if registro is not None and not exito:
+            registro['estado'] = 'error'
+    if registro is None:
+        return exito
+    resumen = f"{registro['segundos']:.1f} s, CPU {registro['cpu_s'] + registro['cpu_workers_s']:.1f} s"
+    if registro['archivos_por_s']:
+        resumen += f", {registro['archivos_por_s']:.2f} archivos/s"
+    if registro['pico_rss_bytes']:
+        resumen += f", pico de memoria {registro['pico_rss_bytes'] / 2**20:.0f} MB"
+    log_func(f"[METRICAS] {name}: {resumen}")
+    return exito
+
+
+def _ejecutar_etapa(name: str, func: Callable, args: tuple, log_func: Callable[[str], None],
+                    continue_on_error: bool, kwargs: Optional[Dict[str, Any]]) -> bool:
     log_func(f"Iniciando: {name}...")
     try:
-        func(*args)
+        func(*args, **(kwargs or {}))
         log_func(f"Completado: {name}.")
         return True
     except Exception as e:
@@ -76,6 +107,121 @@ def process_stage(name: str, func: Callable, args: tuple,
         return False
 
 
+def exportar_metricas(telemetria: Telemetria, config: Dict[str, Any], exito: bool,
+                      log_func: Callable[[str], None]) -> None:
+    """Escribe el informe JSON de la ejecución y, si se configuró, el archivo de Prometheus."""
+    try:
+        carpeta = config.get('carpeta_metricas') or os.path.join(config.get('output_folder', '.'), 'metricas')
+        log_func(f"[METRICAS] Informe de la ejecución: {telemetria.guardar_json(carpeta, exito)}")
+        ruta_prometheus = config.get('ruta_metricas_prometheus')
+        if ruta_prometheus:
+            telemetria.guardar_prometheus(ruta_prometheus, exito)
+    except OSError as e:
+        log_func(f"[METRICAS] No se pudieron exportar las métricas: {e}")
+
+
+def etapa_diferida(modulo: str, nombre: str) -> Callable:
+    """
+    Función de etapa que importa su módulo recién al ejecutarse, de modo que una ejecución
+    solo carga las dependencias de las etapas que realiza.
+    """
+    def ejecutar(*args, **kwargs):
+        return getattr(importlib.import_module(modulo), nombre)(*args, **kwargs)
+    ejecutar.__name__ = nombre
+    return ejecutar
+
+
+def carpeta_temp() -> str:
+    """Carpeta de trabajo del pipeline ('temp' junto a este script)."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "temp")
+
+
+def opciones_conversion(config: Dict[str, Any]) -> tuple:
+    """
+    Opciones de lectura de TDMS y memoria de particionado de las etapas de conversión.
+
+    Returns:
+        (opciones para las funciones de conversión TDMS, memoria de particionado en bytes)
+    """
+    from tdms_utils import TAMANO_BLOQUE
+    from partition_utils import MEMORIA_MAX
+    from time_utils import ZONA_HORARIA
+    opciones_tdms = {
+        'num_workers': config.get('num_workers_tdms'),
+        'backend': config.get('backend_tdms', 'procesos'),
+        'tamano_bloque': config.get('tamano_bloque_tdms', TAMANO_BLOQUE),
+        'zona_horaria': config.get('zona_horaria', ZONA_HORARIA),
+    }
+    memoria_particion = int(config.get('memoria_particion_mb', MEMORIA_MAX // 2**20)) * 2**20
+    return opciones_tdms, memoria_particion
+
+
+def guardar_resultado(resultados: Dict[str, Any], clave: str, func: Callable) -> Callable:
+    """Envuelve una etapa para conservar su valor de retorno en resultados[clave]."""
+    def ejecutar(*args, **kwargs):
+        resultados[clave] = func(*args, **kwargs)
+    return ejecutar
+
+
+def limitar_dias_extraidos(resultados: Dict[str, Any], dias_por_zip: Dict[str, List[str]],
+                           func: Callable) -> Callable:
+    """
+    Envuelve una etapa sobre los TDMS descomprimidos para pasarle 'dias_por_archivo': los
+    TDMS de cada ZIP relacionado se leen solo en los días a reconstruir.
+    """
+    def ejecutar(*args, **kwargs):
+        extraidos = resultados.get('descompresion') or {}
+        kwargs['dias_por_archivo'] = {
+            ruta: dias for zip_file, dias in dias_por_zip.items() for ruta in extraidos.get(zip_file, [])
+        }
+        return func(*args, **kwargs)
+    ejecutar.__name__ = getattr(func, '__name__', 'ejecutar')
+    return ejecutar
+
+
+def descartar_dias_parciales(carpeta: str, fechas: List[str], formato: Optional[str],
+                             log_func: Callable[[str], None]) -> None:
+    """
+    Elimina los parciales de los días que se reconstruyen a partir de sus ZIP (ver
+    Manifiesto.zips_pendientes), para que los datos reemplazados no se mezclen con los nuevos.
+
+    Args:
+        carpeta: Carpeta de trabajo con los parciales
+        fechas: Fechas 'YYYY-MM-DD' a descartar
+        formato: Formato de las tablas intermedias, o None en el pipeline directo
+        log_func: Función para registrar mensajes
+    """
+    if formato is None:
+        from columnar_utils import ruta_dia_parcial, eliminar_dia_parcial
+        existe = lambda fecha: os.path.isdir(ruta_dia_parcial(carpeta, fecha))
+        eliminar = lambda fecha: eliminar_dia_parcial(carpeta, fecha)
+    else:
+        from storage_utils import obtener_almacen
+        almacen = obtener_almacen(formato)
+        existe = lambda fecha: almacen.existe(almacen.ruta(carpeta, f"{fecha}_temp"))
+        eliminar = lambda fecha: almacen.eliminar(almacen.ruta(carpeta, f"{fecha}_temp"))
+    for fecha in fechas:
+        if existe(fecha):
+            eliminar(fecha)
+            log_func(f"[MANIFIESTO] Parcial de {fecha} descartado: se reconstruye con los ZIP actuales.")
+
+
+def registrar_zips_procesados(manifiesto: Manifiesto, input_folder: str, resultados: Dict[str, Any],
+                              unidad: str = '05', dias_por_zip: Optional[Dict[str, List[str]]] = None) -> None:
+    """Registra en el manifiesto los ZIP convertidos y los MAT diarios que produjeron."""
+    if 'zip' in resultados:
+        procedencia = resultados['zip']
+    else:
+        por_tdms = resultados.get('tdms')
+        if 'tdms_dias' in resultados:
+            # Tablas intermedias: la etapa TDMS devuelve fechas, que se registran como MAT diarios
+            from mat_utils import nombre_archivo_mat
+            por_tdms = {ruta: [nombre_archivo_mat(fecha, unidad) for fecha in fechas]
+                        for ruta, fechas in (resultados['tdms_dias'] or {}).items()}
+        procedencia = procedencia_extraidos(resultados.get('descompresion') or {}, por_tdms)
+    manifiesto.registrar_zips(input_folder, procedencia, limitados=dias_por_zip or ())
+
+
 def main(config: Dict[str, Any], log_callback: Optional[Callable[[str], None]] = None) -> bool:
     """
     Función principal de procesamiento con manejo mejorado de errores y configuración.
@@ -122,10 +268,24 @@ def main(config: Dict[str, Any], log_callback: Optional[Callable[[str], None]] =
     realizar_conteo = config.get('realizar_conteo', False)
     descomprimir = config.get('descomprimir', False)
     rainflow = config.get('rainflow', False)
+    pipeline_directo = config.get('pipeline_directo', False)
+    exportar_csv = config.get('exportar_csv', False)
+    motor_descompresion = config.get('motor_descompresion', 'zipfile')
+    opciones_tdms, memoria_particion = opciones_conversion(config) if descomprimir else ({}, None)
+    formato_intermedio = config.get('formato_intermedio', 'csv')
     selected_files = config.get("selected_files", [])
+    usar_manifiesto = config.get('usar_manifiesto', True)
+    reanudar = config.get('reanudar', True)
+    ejecucion_en_flujo = config.get('ejecucion_en_flujo', False)
+    telemetria = Telemetria() if config.get('metricas', True) else None
+    perfilador = None
+    if config.get('perfilar', False):
+        carpeta_perfil = config.get('carpeta_perfil') or os.path.join(output_folder, 'perfil')
+        perfilador = Perfilador(os.path.join(carpeta_perfil, datetime.now().strftime('%Y%m%d_%H%M%S')), log,
+                                memoria=config.get('perfilar_memoria', True))
 
     # verificar y crear carpeta temp en la ruta del script
-    temp_folder = os.path.join(os.path.dirname(__file__), "temp")
+    temp_folder = carpeta_temp()
     
     # Validar carpetas
     folders = [input_folder, output_folder, excel_output_folder, str(temp_folder)]
@@ -133,52 +293,122 @@ def main(config: Dict[str, Any], log_callback: Optional[Callable[[str], None]] =
         log("ERROR: No se pudo configurar las carpetas necesarias. Abortando.", logging.ERROR)
         return False
     
-    # Validar archivos seleccionados
-    if not selected_files:
+    # Validar archivos seleccionados (solo las etapas de conversión parten de los ZIP)
+    if descomprimir and not selected_files:
         log("ADVERTENCIA: No se han seleccionado archivos para procesar.", logging.WARNING)
         return False
     
+    # Manifiesto: solo se convierten los ZIP nuevos o modificados (y los que comparten días con ellos)
+    manifiesto = Manifiesto(os.path.join(output_folder, NOMBRE_MANIFIESTO)) if usar_manifiesto else None
+    dias_descartar, dias_por_zip = [], {}
+    if manifiesto is not None and descomprimir:
+        selected_files, dias_descartar, dias_por_zip = manifiesto.zips_pendientes(input_folder, selected_files, log)
+        if not selected_files:
+            log("[MANIFIESTO] Ningún ZIP cambió desde la última ejecución: se omite la conversión.")
+            descomprimir = False
+
     log(f"Se procesarán {len(selected_files)} archivos")
     
     # Proceso por etapas
     stages = []
+    resultados = {}
+
+    # Punto de control: una ejecución interrumpida se reanuda desde la última etapa, ZIP o día registrado
+    punto = PuntoControl(os.path.join(temp_folder, NOMBRE_PUNTO_CONTROL)) if reanudar else None
     
+    # Etapas 1-4 en modo columnar con zipfile: los TDMS se leen desde el ZIP sin extraerlos
+    zip_en_memoria = pipeline_directo and motor_descompresion == 'zipfile'
+
+    # Días de un ZIP cambiado: se reconstruyen desde cero con todos los ZIP que les aportan datos
+    if descomprimir and dias_descartar:
+        stages.append((
+            "Descarte de días a reconstruir",
+            descartar_dias_parciales,
+            (str(temp_folder), dias_descartar, None if pipeline_directo else formato_intermedio, log)
+        ))
+
+    if descomprimir and zip_en_memoria and ejecucion_en_flujo:
+        # Los ZIP avanzan uno por uno y la lectura de los siguientes se solapa con la escritura
+        stages.append((
+            "Conversión en flujo de ZIP a MAT",
+            guardar_resultado(resultados, 'zip', etapa_diferida('columnar_utils', 'procesar_zip_a_mat_en_flujo')),
+            (input_folder, selected_files, str(temp_folder), output_folder, unidad,
+             procesar_incompleto, exportar_csv),
+            dict(opciones_tdms, memoria_max=memoria_particion, punto_control=punto,
+                 archivos_en_vuelo=config.get('archivos_en_vuelo', 2), dias_por_zip=dias_por_zip)
+        ))
+
+    elif descomprimir and zip_en_memoria:
+        stages.append((
+            "Conversión directa de ZIP a MAT",
+            guardar_resultado(resultados, 'zip', etapa_diferida('columnar_utils', 'procesar_zip_a_mat')),
+            (input_folder, selected_files, str(temp_folder), output_folder, unidad,
+             procesar_incompleto, exportar_csv),
+            dict(opciones_tdms, memoria_max=memoria_particion, punto_control=punto, dias_por_zip=dias_por_zip)
+        ))
+
     # Etapa 1: Descompresión de archivos ZIP
     
-    if descomprimir:
+    elif descomprimir:
         stages.append((
             "Descompresión de archivos ZIP",
-            decompress_zip_files,
-            (input_folder, str(temp_folder), selected_files)
+            guardar_resultado(resultados, 'descompresion', decompress_zip_files),
+            (input_folder, str(temp_folder), selected_files, motor_descompresion),
+            {'num_workers': config.get('num_workers_descompresion'), 'punto_control': punto}
         ))
-    
+
+    if descomprimir and pipeline_directo and not zip_en_memoria:
+        # Etapas 2-4 en modo columnar: TDMS -> MAT sin CSV intermedios
+        stages.append((
+            "Conversión directa de TDMS a MAT",
+            guardar_resultado(resultados, 'tdms', limitar_dias_extraidos(
+                resultados, dias_por_zip, etapa_diferida('columnar_utils', 'procesar_tdms_a_mat'))),
+            (str(temp_folder), output_folder, unidad, procesar_incompleto, exportar_csv),
+            dict(opciones_tdms, memoria_max=memoria_particion, punto_control=punto)
+        ))
+
+    elif descomprimir and not pipeline_directo:
         # Etapa 2: Procesamiento TDMS
         stages.append((
             "Procesamiento de archivos TDMS",
-            procesar_archivos_tdms_paralelo,
-            (str(temp_folder),)
+            guardar_resultado(resultados, 'tdms_dias', limitar_dias_extraidos(
+                resultados, dias_por_zip, etapa_diferida('tdms_utils', 'procesar_archivos_tdms_paralelo'))),
+            (str(temp_folder),),
+            dict(opciones_tdms, formato=formato_intermedio)
         ))
         
         # Etapa 3: Ordenamiento y agrupación CSV
         stages.append((
             "Ordenamiento y agrupación de archivos CSV",
-            ordenar_y_agrupado_por_dia,
-            (str(temp_folder),)
+            etapa_diferida('csv_utils', 'ordenar_y_agrupado_por_dia'),
+            (str(temp_folder),),
+            {'memoria_max': memoria_particion, 'formato': formato_intermedio, 'punto_control': punto}
         ))
         
         # Etapa 4: Conversión CSV a MAT
         stages.append((
             "Conversión de CSV a MAT",
-            csv_to_mat,
-            (str(temp_folder), output_folder, unidad, procesar_incompleto)
+            etapa_diferida('mat_utils', 'csv_to_mat'),
+            (str(temp_folder), output_folder, unidad, procesar_incompleto),
+            {'formato': formato_intermedio,
+             'num_workers': config.get('num_workers_mat'),
+             'backend': config.get('backend_mat', 'procesos')}
         ))
     
+    if descomprimir and manifiesto is not None:
+        stages.append((
+            "Registro de ZIP en el manifiesto",
+            registrar_zips_procesados,
+            (manifiesto, input_folder, resultados, unidad, dias_por_zip)
+        ))
+
     # Etapa 5: Procesamiento MAT con MATLAB (opcional)
     if rainflow:
         stages.append((
             "Procesamiento de archivos MAT con MATLAB",
-            process_mat_files,
-            (output_folder, config)
+            etapa_diferida('matlab_utils', 'process_mat_files'),
+            (output_folder, config),
+            {'manifiesto': manifiesto}
         ))
     
     # Etapa 6: Conteo de ciclos (opcional)
@@ -186,17 +416,55 @@ def main(config: Dict[str, Any], log_callback: Optional[Callable[[str], None]] =
         excel_path = str(Path(excel_output_folder) / "arranque_paradas.xlsx")
         stages.append((
             "Conteo de ciclos de arranque y parada",
-            process_mat_folder,
-            (output_folder, excel_path, log)
+            etapa_diferida('startup_shutdown_counter', 'process_mat_folder'),
+            (output_folder, excel_path, log),
+            {'umbral_encendido': config.get('umbral_encendido', 0.0),
+             'umbral_apagado': config.get('umbral_apagado'),
+             'permanencia_minima': config.get('permanencia_minima_s', 0.0),
+             'exportar_excel': config.get('exportar_excel_conteo', False),
+             'manifiesto': manifiesto}
         ))
     
+    if punto is not None:
+        punto.iniciar({'etapas': [stage[0] for stage in stages], 'archivos': list(selected_files)})
+        if punto.reanudado:
+            resultados.update(punto.resultados)
+            log(f"[REANUDAR] Se reanuda la ejecución interrumpida "
+                f"({len(punto.estado['etapas'])} etapa(s) ya completadas).")
+        elif punto.descartado:
+            log("[REANUDAR] Se descarta el punto de control de una ejecución anterior con otras etapas o archivos.",
+                logging.WARNING)
+        if punto.reanudado or punto.descartado:
+            limpiados = limpiar_areas_trabajo(str(temp_folder))
+            if limpiados:
+                log(f"[REANUDAR] Eliminadas {limpiados} área(s) de trabajo de la ejecución interrumpida.")
+
     # Ejecutar etapas
     success = True
-    for name, func, args in stages:
-        if not process_stage(name, func, args, log):
-            success = False
-            log(f"Proceso detenido debido a un error en la etapa: {name}", logging.ERROR)
-            break
+    try:
+        with telemetria.activar() if telemetria is not None else nullcontext():
+            for name, func, args, *kwargs in stages:
+                if punto is not None and punto.etapa_completada(name):
+                    log(f"[REANUDAR] Omitida (completada antes del corte): {name}.")
+                    continue
+                if not process_stage(name, func, args, log, kwargs=kwargs[0] if kwargs else None,
+                                     telemetria=telemetria, perfilador=perfilador):
+                    success = False
+                    log(f"Proceso detenido debido a un error en la etapa: {name}", logging.ERROR)
+                    break
+                if punto is not None:
+                    punto.completar_etapa(name, resultados)
+    finally:
+        if manifiesto is not None:
+            manifiesto.cerrar()
+        if telemetria is not None:
+            exportar_metricas(telemetria, config, success, log)
+
+    if punto is not None:
+        if success:
+            punto.finalizar()
+        else:
+            log("[REANUDAR] Vuelva a ejecutar con la misma selección para continuar desde este punto.")
     
     if success:
         log("Proceso completado exitosamente.")
@@ -0,0 +1,297 @@
+import os
+import hashlib
+import sqlite3
+import threading
+import zipfile
+from datetime import datetime
+
+from decompress_utils import es_miembro_tdms
+
+# Nombre del manifiesto dentro de la carpeta de salida
+NOMBRE_MANIFIESTO = ".manifiesto.sqlite"
+
+# Bytes de la cabecera de texto de un MAT v5 (incluye la fecha de creación)
+CABECERA_MAT = 116
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS archivos (
+    etapa      TEXT NOT NULL,
+    clave      TEXT NOT NULL,
+    tamano     INTEGER,
+    mtime      REAL,
+    hash       TEXT,
+    registrado TEXT,
+    PRIMARY KEY (etapa, clave)
+);
+CREATE TABLE IF NOT EXISTS miembros (
+    zip     TEXT NOT NULL,
+    miembro TEXT NOT NULL,
+    tamano  INTEGER,
+    crc     INTEGER,
+    PRIMARY KEY (zip, miembro)
+);
+CREATE TABLE IF NOT EXISTS salidas (
+    etapa  TEXT NOT NULL,
+    clave  TEXT NOT NULL,
+    salida TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS salidas_clave ON salidas (etapa, clave);
+CREATE INDEX IF NOT EXISTS salidas_salida ON salidas (etapa, salida);
+"""
+
+
+def hash_archivo(ruta, tamano_bloque=1024 * 1024):
+    """
+    SHA-256 del contenido de un archivo.
+
+    En los MAT se omite la cabecera de texto, de modo que un día reescrito con los mismos
+    datos conserva el hash aunque cambie su fecha de creación.
+    """
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        if ruta.lower().endswith(".mat"):
+            f.seek(CABECERA_MAT)
+        for bloque in iter(lambda: f.read(tamano_bloque), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def miembros_zip(zip_path):
+    """Miembros TDMS del ZIP según su directorio central: [(nombre, tamaño, CRC-32)]."""
+    with zipfile.ZipFile(zip_path) as zf:
+        return sorted(
+            (info.filename, info.file_size, info.CRC)
+            for info in zf.infolist() if es_miembro_tdms(info.filename)
+        )
+
+
+def hash_zip(zip_path):
+    """
+    Hash del contenido TDMS de un ZIP, calculado a partir de los nombres, tamaños y CRC-32
+    de sus miembros (sin descomprimirlos). Un ZIP recomprimido con los mismos TDMS conserva
+    el hash; uno corregido lo cambia.
+    """
+    h = hashlib.sha256()
+    for nombre, tamano, crc in miembros_zip(zip_path):
+        h.update(f"{nombre}\t{tamano}\t{crc:08x}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+class Manifiesto:
+    """
+    Manifiesto de entradas procesadas por etapa, para ejecuciones idempotentes.
+
+    Para cada etapa ("zip": ZIP -> MAT diarios, "rainflow": MAT -> Excel, "conteo":
+    MAT -> registro de arranques) guarda tamaño, fecha de modificación y hash de cada
+    entrada, y las salidas que produjo. De los ZIP se guardan además sus miembros TDMS.
+    Una entrada cambió si su tamaño o fecha difieren y además su hash es distinto; si solo
+    cambió la fecha (por ejemplo, un ZIP copiado de nuevo), se actualiza sin reprocesar.
+    """
+
+    def __init__(self, ruta):
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        self.ruta = ruta
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self.conexion.executescript(_ESQUEMA)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    @staticmethod
+    def _hash(ruta, etapa):
+        return hash_zip(ruta) if etapa == "zip" else hash_archivo(ruta)
+
+    def _registro(self, etapa, clave):
+        with self._lock:
+            return self.conexion.execute(
+                "SELECT tamano, mtime, hash FROM archivos WHERE etapa = ? AND clave = ?", (etapa, clave)
+            ).fetchone()
+
+    def conocido(self, ruta, etapa):
+        """Indica si la entrada tiene registro en la etapa."""
+        return self._registro(etapa, os.path.basename(ruta)) is not None
+
+    def cambio(self, ruta, etapa):
+        """
+        Indica si la entrada es nueva o cambió desde que se registró en la etapa.
+
+        El hash solo se calcula si cambiaron el tamaño o la fecha de modificación.
+        """
+        clave = os.path.basename(ruta)
+        registro = self._registro(etapa, clave)
+        if registro is None:
+            return True
+        tamano, mtime, hash_previo = registro
+        estado = os.stat(ruta)
+        if estado.st_size == tamano and estado.st_mtime == mtime:
+            return False
+        if self._hash(ruta, etapa) != hash_previo:
+            return True
+        with self._lock, self.conexion:
+            self.conexion.execute(
+                "UPDATE archivos SET tamano = ?, mtime = ? WHERE etapa = ? AND clave = ?",
+                (estado.st_size, estado.st_mtime, etapa, clave),
+            )
+        return False
+
+    def pendiente(self, ruta, etapa, procesado, salidas=()):
+        """
+        Indica si una entrada debe procesarse en la etapa.
+
+        Parámetros:
+            ruta (str): Entrada (por ejemplo, un MAT diario).
+            etapa (str): Etapa del manifiesto.
+            procesado (bool): Si la salida de la etapa ya existe (criterio previo al manifiesto).
+            salidas (iterable): Salidas a registrar si la entrada procesada aún no figura.
+
+        Retorna:
+            bool: True si no hay salida o si la entrada cambió desde que se registró. Las
+            entradas procesadas antes de existir el manifiesto se registran como base.
+        """
+        if not procesado:
+            return True
+        if not self.conocido(ruta, etapa):
+            self.registrar(ruta, etapa, salidas)
+            return False
+        return self.cambio(ruta, etapa)
+
+    def registrar(self, ruta, etapa, salidas=()):
+        """Registra una entrada procesada con sus salidas (reemplaza el registro anterior)."""
+        clave = os.path.basename(ruta)
+        estado = os.stat(ruta)
+        valor_hash = self._hash(ruta, etapa)
+        miembros = miembros_zip(ruta) if etapa == "zip" else None
+        with self._lock, self.conexion:
+            self.conexion.execute(
+                "INSERT OR REPLACE INTO archivos VALUES (?, ?, ?, ?, ?, ?)",
+                (etapa, clave, estado.st_size, estado.st_mtime, valor_hash,
+                 datetime.now().isoformat(timespec="seconds")),
+            )
+            self.conexion.execute("DELETE FROM salidas WHERE etapa = ? AND clave = ?", (etapa, clave))
+            self.conexion.executemany(
+                "INSERT INTO salidas VALUES (?, ?, ?)", [(etapa, clave, s) for s in sorted(set(salidas))]
+            )
+            if miembros is not None:
+                self.conexion.execute("DELETE FROM miembros WHERE zip = ?", (clave,))
+                self.conexion.executemany(
+                    "INSERT INTO miembros VALUES (?, ?, ?, ?)", [(clave, *m) for m in miembros]
+                )
+
+    def salidas(self, clave, etapa):
+        """Salidas registradas para una entrada."""
+        with self._lock:
+            return [fila[0] for fila in self.conexion.execute(
+                "SELECT salida FROM salidas WHERE etapa = ? AND clave = ?", (etapa, clave))]
+
+    def entradas_de(self, salidas, etapa):
+        """Entradas que produjeron alguna de las salidas indicadas."""
+        salidas = list(salidas)
+        if not salidas:
+            return set()
+        marcas = ",".join("?" * len(salidas))
+        with self._lock:
+            return {fila[0] for fila in self.conexion.execute(
+                f"SELECT DISTINCT clave FROM salidas WHERE etapa = ? AND salida IN ({marcas})",
+                (etapa, *salidas))}
+
+    def zips_pendientes(self, input_folder, selected_files, log=print):
+        """
+        Filtra los ZIP seleccionados a los que hay que procesar.
+
+        Se procesan los ZIP nuevos o cuyo contenido TDMS cambió. Si un ZIP cambiado ya
+        había producido días, esos días se reconstruyen: sus parciales se descartan y se
+        reprocesan también los demás ZIP que les aportaron datos, limitados a esos días
+        (sus otros días no cambian). Un día con algún aporte que ya no está en la carpeta
+        de entrada no puede reconstruirse y conserva sus datos previos.
+
+        Retorna:
+            tuple: (nombres de ZIP a procesar, en el orden de selected_files;
+            fechas 'YYYY-MM-DD' cuyos parciales se descartan;
+            {ZIP relacionado: fechas a las que se limita su lectura})
+        """
+        cambiados = []
+        for zip_file in selected_files:
+            zip_path = os.path.join(input_folder, zip_file)
+            try:
+                if self.cambio(zip_path, "zip"):
+                    if self.conocido(zip_path, "zip"):
+                        log(f"[MANIFIESTO] '{zip_file}' cambió desde la última ejecución: se reprocesa.")
+                    cambiados.append(zip_file)
+                else:
+                    log(f"[MANIFIESTO] '{zip_file}' sin cambios: se omite.")
+            except (OSError, zipfile.BadZipFile) as e:
+                log(f"[MANIFIESTO] No se pudo verificar '{zip_file}': {e}")
+                cambiados.append(zip_file)
+
+        dias = {s for zip_file in cambiados for s in self.salidas(zip_file, "zip")}
+        relacionados = self.entradas_de(dias, "zip") - set(cambiados)
+        for zip_file in sorted(relacionados):
+            if not os.path.exists(os.path.join(input_folder, zip_file)):
+                perdidos = sorted(dias & set(self.salidas(zip_file, "zip")))
+                log(f"[MANIFIESTO] Advertencia: '{zip_file}' aportó datos a {', '.join(perdidos)} pero no "
+                    f"está en la carpeta de entrada: esos días no se reconstruyen.")
+                dias -= set(perdidos)
+
+        dias_por_zip = {}
+        for zip_file in sorted(relacionados):
+            compartidos = dias & set(self.salidas(zip_file, "zip"))
+            if compartidos and os.path.exists(os.path.join(input_folder, zip_file)):
+                log(f"[MANIFIESTO] '{zip_file}' comparte días con un ZIP cambiado: se reprocesa para "
+                    f"{', '.join(sorted(compartidos))}.")
+                dias_por_zip[zip_file] = sorted(fecha_mat(s) for s in compartidos)
+
+        pendientes = set(cambiados) | set(dias_por_zip)
+        pendientes = [z for z in selected_files if z in pendientes] + sorted(set(dias_por_zip) - set(selected_files))
+        return pendientes, sorted(fecha_mat(s) for s in dias), dias_por_zip
+
+    def registrar_zips(self, input_folder, procedencia, limitados=()):
+        """
+        Registra los ZIP procesados con los MAT diarios a los que aportaron datos.
+
+        Parámetros:
+            input_folder (str): Carpeta con los archivos ZIP.
+            procedencia (dict): {ZIP: nombres de MAT diarios}.
+            limitados (iterable): ZIP cuya lectura se limitó a algunos días (ver
+                zips_pendientes); conservan además los MAT registrados antes.
+        """
+        limitados = set(limitados)
+        for zip_file, salidas in procedencia.items():
+            if zip_file in limitados:
+                salidas = set(salidas) | set(self.salidas(zip_file, "zip"))
+            self.registrar(os.path.join(input_folder, zip_file), "zip", salidas)
+
+    def cerrar(self):
+        self.conexion.close()
+
+
+def fecha_mat(nombre):
+    """Fecha 'YYYY-MM-DD' de un MAT diario ('YYYY.MM.DD-uXX.mat', ver mat_utils.nombre_archivo_mat)."""
+    return nombre.split("-u")[0].replace(".", "-")
+
+
+def procedencia_extraidos(extraidos, por_tdms):
+    """
+    Combina el resultado de la descompresión con el de la conversión TDMS -> MAT.
+
+    Parámetros:
+        extraidos (dict): {ZIP: rutas extraídas} (decompress_zip_files).
+        por_tdms (dict): {ruta TDMS: MAT diarios} (procesar_tdms_a_mat, o
+            procesar_archivos_tdms_paralelo con las fechas convertidas), o None si no se
+            conoce el origen de los días.
+
+    Retorna:
+        dict: {ZIP: MAT diarios a los que aportó datos}, solo para los ZIP cuyos TDMS se
+        convirtieron todos. Sin 'por_tdms', los ZIP se registran sin salidas.
+    """
+    if por_tdms is None:
+        return {zip_file: [] for zip_file in extraidos}
+    procedencia = {}
+    for zip_file, rutas in extraidos.items():
+        tdms = [ruta for ruta in rutas if ruta.endswith(".tdms")]
+        if all(ruta in por_tdms for ruta in tdms):
+            procedencia[zip_file] = sorted({mat for ruta in tdms for mat in por_tdms[ruta]})
+    return procedencia
@@ -1,19 +1,114 @@
 import os
-import pandas as pd
 from scipy.io import savemat
 from tqdm import tqdm
+from concurrent.futures import as_completed
 
+from time_utils import tiempo_a_epoch
+from storage_utils import obtener_almacen
+from workers_utils import calcular_num_workers, crear_executor
+from metricas_utils import medir_archivo, registrar_archivo
 
-def csv_to_mat(input_folder, output_folder, unidad="05", procesar_incompleto=False, log_callback=None):
+
+def nombre_archivo_mat(nombre_dia, unidad="05"):
+    """
+    Construye el nombre del archivo MAT de un día: 'YYYY-MM-DD' -> 'YYYY.MM.DD-u{unidad}.mat'.
+    """
+    return f"{nombre_dia.replace('-', '.')}-u{unidad}.mat"
+
+
+def guardar_mat(output_file, time_epoch, data):
+    """
+    Escribe un archivo MAT con las variables 'time_epoch' y 'data'.
+
+    Parámetros:
+        output_file (str): Ruta del archivo MAT a escribir.
+        time_epoch (numpy.ndarray): Segundos desde 1970-01-01 para cada muestra.
+        data (numpy.ndarray): Matriz muestras x canales (sin la columna de tiempo).
+
+    El archivo se escribe en '<output_file>.part' y se renombra al terminar, de modo que
+    un corte nunca deja un MAT truncado.
+    """
+    parcial = output_file + ".part"
+    with open(parcial, "wb") as f:
+        savemat(f, {"time_epoch": time_epoch, "data": data})
+    os.replace(parcial, output_file)
+
+
+def convertir_tabla_a_mat(input_file, output_folder, unidad="05", formato="csv"):
+    """
+    Convierte una tabla diaria en su archivo MAT y elimina la tabla si el día está completo.
+
+    Se ejecuta dentro de un worker: los errores se capturan y se informan en los mensajes,
+    de modo que un archivo defectuoso no interrumpe la conversión de los demás.
+
+    Retorna:
+        tuple: (ruta del MAT generado o None si falló, lista de mensajes, métricas del archivo)
+    """
+    almacen = obtener_almacen(formato)
+    output_name = almacen.nombre(input_file).replace("_temp", "")
+    output_file = os.path.join(output_folder, nombre_archivo_mat(output_name, unidad))
+
+    with medir_archivo("csv2mat", input_file) as metrica:
+        output_file, mensajes = _convertir_tabla(input_file, output_file, almacen, metrica)
+    return output_file, mensajes, metrica
+
+
+def _convertir_tabla(input_file, output_file, almacen, metrica):
+    csv_file = os.path.basename(input_file)
+    mensajes = []
+    try:
+        metrica["bytes_entrada"] = almacen.tamano(input_file)
+        data = almacen.leer(input_file)
+        metrica["filas_entrada"] = len(data)
+
+        if "Time" not in data.columns:
+            mensajes.append(f"[CSV2MAT] '{csv_file}' omitido: no tiene columna 'Time'.")
+            return None, mensajes
+
+        tiempo = data["Time"]
+        if tiempo.isnull().all():
+            mensajes.append(f"[CSV2MAT] '{csv_file}' omitido: errores en la conversión de fechas.")
+            return None, mensajes
+
+        guardar_mat(
+            output_file,
+            tiempo_a_epoch(tiempo.values),
+            data.drop(columns=["Time"]).values
+        )
+        metrica["bytes_salida"] = os.path.getsize(output_file)
+        metrica["filas_salida"] = len(tiempo)
+        mensajes.append(f"[CSV2MAT] Archivo convertido: {csv_file} -> {os.path.basename(output_file)}")
+
+        if "_temp" not in almacen.nombre(input_file):
+            almacen.eliminar(input_file)
+            mensajes.append(f"[CSV2MAT] Archivo original eliminado: {csv_file}")
+        return output_file, mensajes
+
+    except Exception as e:
+        mensajes.append(f"[CSV2MAT] Error procesando '{csv_file}': {e}")
+        return None, mensajes
+
+
+def csv_to_mat(input_folder, output_folder, unidad="05", procesar_incompleto=False, log_callback=None,
+               formato="csv", num_workers=None, backend="procesos"):
     """
     Convierte archivos CSV en archivos MAT.
 
+    Cada día se convierte en un worker independiente (lectura, 'savemat' y borrado del
+    original); un error en un archivo se registra y no afecta al resto.
+
     Parámetros:
         input_folder (str): Carpeta de entrada con archivos CSV.
         output_folder (str): Carpeta de salida para archivos MAT.
         unidad (str): Unidad a procesar (por defecto "05").
         procesar_incompleto (bool): Indica si se deben procesar archivos incompletos (_temp).
         log_callback (function): Función de callback para registrar mensajes (por ejemplo, mostrar en GUI).
+        formato (str): Formato de las tablas intermedias ("csv", "npy" o "feather").
+        num_workers (int): Número de conversiones simultáneas (None: cálculo automático).
+        backend (str): "procesos" o "hilos".
+
+    Retorna:
+        list: Rutas de los archivos MAT generados.
     """
     def log(message):
         """Registra un mensaje usando log_callback si está definido."""
@@ -23,56 +118,49 @@ def csv_to_mat(input_folder, output_folder, unidad="05", procesar_incompleto=Fal
     # Verificar si la carpeta de entrada existe
     if not os.path.exists(input_folder):
         log(f"[CSV2MAT] La carpeta de entrada '{input_folder}' no existe.")
-        return
+        return []
 
     # Crear la carpeta de salida si no existe
     os.makedirs(output_folder, exist_ok=True)
 
-    # Obtener archivos CSV
+    almacen = obtener_almacen(formato)
+
+    # Obtener tablas diarias
     csv_files = [
-        f for f in os.listdir(input_folder)
-        if f.endswith('.csv') and (procesar_incompleto or "_temp" not in f)
+        f for f in almacen.listar(input_folder)
+        if procesar_incompleto or "_temp" not in almacen.nombre(f)
     ]
 
     if not csv_files:
-        log(f"[CSV2MAT] No se encontraron archivos CSV en la carpeta '{input_folder}'.")
-        return
-
-    log(f"[CSV2MAT] Procesando {len(csv_files)} archivo(s)...")
-
-    for csv_file in tqdm(csv_files, desc="Convirtiendo archivos", unit="archivo"):
-        output_name = csv_file.replace("_temp", "")
-        input_file = os.path.join(input_folder, csv_file)
-        output_file = os.path.join(
-            output_folder,
-            f"{os.path.splitext(output_name)[0].replace('-', '.')}-u{unidad}.mat"
-        )
-
-        try:
-            data = pd.read_csv(input_file, delimiter=";", decimal=".")
-
-            if "Time" not in data.columns:
-                log(f"[CSV2MAT] '{csv_file}' omitido: no tiene columna 'Time'.")
-                continue
-
-            data["Time"] = pd.to_datetime(data["Time"], errors='coerce')
-            if data["Time"].isnull().all():
-                log(f"[CSV2MAT] '{csv_file}' omitido: errores en la conversión de fechas.")
-                continue
-
-            data["Time_epoch"] = (data["Time"] - pd.Timestamp("1970-01-01")) / pd.Timedelta("1s")
-
-            mat_data = {
-                "time_epoch": data["Time_epoch"].values,
-                "data": data.drop(columns=["Time", "Time_epoch"]).values
+        log(f"[CSV2MAT] No se encontraron archivos {almacen.formato.upper()} en la carpeta '{input_folder}'.")
+        return []
+
+    # Los días más grandes primero para equilibrar la carga entre workers
+    tamanos = {f: almacen.tamano(f) for f in csv_files}
+    csv_files.sort(key=tamanos.get, reverse=True)
+    num_workers = calcular_num_workers(csv_files, num_workers, total_bytes=sum(tamanos.values()))
+    log(f"[CSV2MAT] Procesando {len(csv_files)} archivo(s) con {num_workers} worker(s) ({backend})...")
+
+    generados = []
+    with tqdm(total=len(csv_files), desc="Convirtiendo archivos", unit="archivo") as barra:
+        with crear_executor(backend, num_workers) as executor:
+            futuros = {
+                executor.submit(convertir_tabla_a_mat, f, output_folder, unidad, almacen.formato): f
+                for f in csv_files
             }
-
-            savemat(output_file, mat_data)
-            log(f"[CSV2MAT] Archivo convertido: {csv_file} -> {os.path.basename(output_file)}")
-
-            if "_temp.csv" not in csv_file:
-                os.remove(input_file)
-                log(f"[CSV2MAT] Archivo original eliminado: {csv_file}")
-
-        except Exception as e:
-            log(f"[CSV2MAT] Error procesando '{csv_file}': {e}")
+            for futuro in as_completed(futuros):
+                csv_file = os.path.basename(futuros[futuro])
+                try:
+                    output_file, mensajes, metrica = futuro.result()
+                    for mensaje in mensajes:
+                        log(mensaje)
+                    registrar_archivo(metrica)
+                    if output_file:
+                        generados.append(output_file)
+                except Exception as e:
+                    # Fallo del worker (por ejemplo, proceso terminado por falta de memoria)
+                    log(f"[CSV2MAT] Error procesando '{csv_file}': {e}")
+                finally:
+                    barra.update(1)
+
+    return sorted(generados)
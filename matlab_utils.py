@@ -2,9 +2,14 @@ import os
 import subprocess
 import logging
 import platform
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
 from typing import Dict, Any, Optional, Callable
 
+
 # Configurar logging
 logging.basicConfig(
     level=logging.INFO,
@@ -62,7 +67,8 @@ def construir_comando_matlab(
     return [matlab_path] + opts + ["-batch", batch_cmd]
 
 
-def run_matlab_script(name: str, config: Dict[str, Any], show_output: bool = False, log_callback: Optional[Callable] = None) -> None:
+def run_matlab_script(name: str, config: Dict[str, Any], show_output: bool = False, log_callback: Optional[Callable] = None,
+                      timeout: Optional[float] = None) -> None:
     matlab_path = config.get("matlab_path")
     script_path = obtener_script_path(config, log_callback)
     fs = config.get("FS", 10)
@@ -91,55 +97,381 @@ def run_matlab_script(name: str, config: Dict[str, Any], show_output: bool = Fal
 
     log(f"[MATLAB] Ejecutando '{name}'", "info", log_callback)
 
-    if show_output:
-        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
-        for line in proc.stdout:
-            log(line.rstrip(), "info", log_callback)
-        code = proc.wait()
-    else:
-        result = subprocess.run(cmd, check=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        code = result.returncode
-        if result.stdout:
-            log(result.stdout.strip(), "debug", log_callback)
-        if result.stderr:
-            log(result.stderr.strip(), "error", log_callback)
-
+    code = ejecutar_comando_matlab(cmd, show_output, log_callback, etiqueta=name, timeout=timeout)
     if code != 0:
         raise MatlabExecutionError(f"MATLAB terminó con código {code}")
 
 
-def process_mat_files(output_folder: str, config: Dict[str, Any], log_callback: Optional[Callable] = None) -> None:
+def ejecutar_comando_matlab(cmd: list, show_output: bool = False, log_callback: Optional[Callable] = None,
+                            etiqueta: Optional[str] = None, timeout: Optional[float] = None) -> int:
+    """
+    Ejecuta MATLAB, registra su salida línea a línea y devuelve el código de salida.
+
+    Cada línea se registra con el prefijo '[MATLAB:<etiqueta>]'. En los lotes, las líneas
+    '[LOTE] <ruta>' que imprime procesar_lote_matlab.m cambian la etiqueta al archivo en
+    curso. Si se supera 'timeout' (segundos), el proceso se termina y se lanza
+    subprocess.TimeoutExpired.
+    """
+    nivel_salida = "info" if show_output else "debug"
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1,
+                            errors="replace")
+    actual = {"etiqueta": etiqueta}
+
+    def registrar(linea, nivel):
+        linea = linea.rstrip()
+        if linea.startswith("[LOTE] "):
+            actual["etiqueta"] = Path(linea[len("[LOTE] "):].strip()).stem
+            return
+        if linea:
+            prefijo = f"[MATLAB:{actual['etiqueta']}] " if actual["etiqueta"] else ""
+            log(prefijo + linea, nivel, log_callback)
+
+    def leer_errores():
+        for linea in proc.stderr:
+            registrar(linea, "error")
+
+    lector_errores = threading.Thread(target=leer_errores, daemon=True)
+    lector_errores.start()
+
+    vencido = threading.Event()
+
+    def terminar():
+        vencido.set()
+        proc.kill()
+
+    temporizador = threading.Timer(timeout, terminar) if timeout else None
+    if temporizador:
+        temporizador.daemon = True
+        temporizador.start()
+    try:
+        for linea in proc.stdout:
+            registrar(linea, nivel_salida)
+        code = proc.wait()
+        lector_errores.join()
+    finally:
+        if temporizador:
+            temporizador.cancel()
+
+    if vencido.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    return code
+
+
+def _texto_matlab(texto: str) -> str:
+    """Literal de texto MATLAB entre comillas simples (duplica las comillas internas)."""
+    return "'" + texto.replace("'", "''") + "'"
+
+
+def construir_comando_lote_matlab(
+    matlab_path: str,
+    script_path: str,
+    manifest_file: str,
+    results_file: str,
+    excel_folder: str,
+    graficos: bool,
+    escritura: bool,
+    fs: int,
+    n_channels: int,
+) -> list:
+    """
+    Construye el comando que procesa todos los .mat del manifiesto en una sola sesión MATLAB.
+
+    Se agregan al path la carpeta de 'procesar_matlab.m' y la de 'procesar_lote_matlab.m'.
+    """
+    wrapper_dir = Path(os.path.dirname(os.path.abspath(__file__))).as_posix()
+
+    opts = ["-nosplash"]
+    if platform.system() != "Windows":
+        opts.append("-nodisplay")
+    opts.append("-nodesktop")
+
+    batch_cmd = (
+        f"addpath({_texto_matlab(Path(script_path).as_posix())});"
+        f"addpath({_texto_matlab(wrapper_dir)});"
+        f"try, "
+            f"procesar_lote_matlab({_texto_matlab(Path(manifest_file).as_posix())},"
+                                  f"{_texto_matlab(Path(results_file).as_posix())},"
+                                  f"{_texto_matlab(Path(excel_folder).as_posix())},"
+                                  f"{str(graficos).lower()},"
+                                  f"{str(escritura).lower()},"
+                                  f"{fs},"
+                                  f"{n_channels});"
+        f"catch e, "
+            f"disp(getReport(e,'extended')); "
+            f"exit(1);"
+        f"end; "
+        f"exit(0);"
+    )
+
+    return [matlab_path] + opts + ["-batch", batch_cmd]
+
+
+def leer_resultados_lote(results_file: str) -> Dict[str, Optional[str]]:
+    """
+    Lee el archivo de resultados de procesar_lote_matlab.
+
+    Retorna:
+        dict: {ruta .mat (posix): None si se procesó correctamente, o el mensaje de error}
+    """
+    resultados = {}
+    if not os.path.exists(results_file):
+        return resultados
+    with open(results_file, encoding="utf-8", errors="replace") as f:
+        for linea in f:
+            partes = linea.rstrip("\r\n").split("\t", 2)
+            if len(partes) < 2:
+                continue
+            estado, ruta = partes[0], partes[1]
+            resultados[ruta] = None if estado == "OK" else (partes[2] if len(partes) > 2 else "Error en MATLAB")
+    return resultados
+
+
+def _ejecutar_lote(names: list, config: Dict[str, Any], show_output: bool = False,
+                   log_callback: Optional[Callable] = None, timeout: Optional[float] = None) -> Dict[str, tuple]:
+    """
+    Ejecuta un lote en una sesión MATLAB.
+
+    Retorna:
+        dict: {nombre: (error o None, True si el fallo es transitorio y puede reintentarse)}.
+            Son transitorios los archivos sin resultado (MATLAB cerrado, tiempo agotado).
+    """
+    matlab_path = config.get("matlab_path")
+    script_path = obtener_script_path(config, log_callback)
+    mat_folder = config.get("output_folder", "")
+    excel_folder = config.get("excel_output_folder", "")
+
+    Path(excel_folder).mkdir(parents=True, exist_ok=True)
+
+    rutas = {name: (Path(mat_folder) / f"{name}.mat").as_posix() for name in names}
+    resultados = {name: (f"MATLAB .mat no encontrado: {ruta}", False) for name, ruta in rutas.items()
+                  if not os.path.exists(ruta)}
+    pendientes = {name: ruta for name, ruta in rutas.items() if name not in resultados}
+    if not pendientes:
+        return resultados
+
+    carpeta_lote = tempfile.mkdtemp(prefix=".matlab_lote_", dir=excel_folder)
+    try:
+        manifest_file = os.path.join(carpeta_lote, "manifiesto.txt")
+        results_file = os.path.join(carpeta_lote, "resultados.txt")
+        with open(manifest_file, "w", encoding="utf-8") as f:
+            f.write("\n".join(pendientes.values()) + "\n")
+
+        cmd = construir_comando_lote_matlab(
+            matlab_path=matlab_path,
+            script_path=script_path,
+            manifest_file=manifest_file,
+            results_file=results_file,
+            excel_folder=excel_folder,
+            graficos=config.get("graficos_matlab", False),
+            escritura=config.get("escritura", True),
+            fs=config.get("FS", 10),
+            n_channels=config.get("n_channels", 16),
+        )
+
+        log(f"[MATLAB] Ejecutando lote de {len(pendientes)} archivo(s) en una sesión", "info", log_callback)
+        try:
+            code = ejecutar_comando_matlab(cmd, show_output, log_callback, timeout=timeout)
+            motivo = f"MATLAB terminó con código {code}"
+        except subprocess.TimeoutExpired:
+            motivo = f"MATLAB superó el tiempo límite de {timeout} s"
+
+        por_ruta = leer_resultados_lote(results_file)
+        for name, ruta in pendientes.items():
+            if ruta in por_ruta:
+                resultados[name] = (por_ruta[ruta], False)
+            else:
+                resultados[name] = (f"Sin resultado: {motivo}", True)
+        return resultados
+    finally:
+        shutil.rmtree(carpeta_lote, ignore_errors=True)
+
+
+def run_matlab_batch(names: list, config: Dict[str, Any], show_output: bool = False,
+                     log_callback: Optional[Callable] = None, timeout: Optional[float] = None) -> Dict[str, Optional[str]]:
+    """
+    Procesa varios .mat con una única invocación de MATLAB (el arranque se paga una vez).
+
+    La lista de archivos se pasa en un manifiesto temporal y procesar_lote_matlab.m
+    informa el resultado de cada archivo. Los archivos sin resultado (por ejemplo, si
+    MATLAB se cerró a mitad del lote) se consideran fallidos.
+
+    Retorna:
+        dict: {nombre: None si se procesó correctamente, o el mensaje de error}
+    """
+    resultados = _ejecutar_lote(names, config, show_output, log_callback, timeout)
+    return {name: error for name, (error, _) in resultados.items()}
+
+
+def _ejecutar_individual(name: str, config: Dict[str, Any], show_output: bool = False,
+                         log_callback: Optional[Callable] = None, timeout: Optional[float] = None) -> Dict[str, tuple]:
+    """Ejecuta run_matlab_script; los fallos de MATLAB (código != 0 o tiempo agotado) son transitorios."""
+    try:
+        run_matlab_script(name, config, show_output, log_callback, timeout)
+        return {name: (None, False)}
+    except subprocess.TimeoutExpired:
+        return {name: (f"MATLAB superó el tiempo límite de {timeout} s", True)}
+    except MatlabExecutionError as e:
+        return {name: (str(e), True)}
+    except Exception as e:
+        return {name: (str(e), False)}
+
+
+def run_matlab_pool(names: list, config: Dict[str, Any], show_output: bool = False,
+                    log_callback: Optional[Callable] = None) -> Dict[str, Optional[str]]:
+    """
+    Procesa los .mat con un pool acotado de procesos MATLAB concurrentes.
+
+    Configuración:
+        num_workers_matlab (int): Procesos MATLAB simultáneos (por defecto 1).
+        modo_matlab (str): "lote" reparte los archivos en un lote por worker;
+            "individual" lanza un proceso por archivo.
+        timeout_matlab_s (float): Tiempo máximo por proceso MATLAB; al superarlo se termina.
+            En modo lote se aplica a la sesión completa de cada worker (todo su lote), no
+            a cada archivo: los archivos que el lote ya había informado conservan su
+            resultado y los restantes fallan por tiempo agotado.
+        reintentos_matlab (int): Reintentos de los fallos transitorios (por defecto 1):
+            tiempo agotado, MATLAB cerrado o, en modo individual, código de salida != 0.
+            En modo lote, los archivos con error informado por procesar_matlab no se reintentan.
+
+    Puede probarse sin MATLAB usando como 'matlab_path' el sustituto tests/stub_matlab.py.
+
+    Retorna:
+        dict: {nombre: None si se procesó correctamente, o el mensaje de error}
+    """
+    modo = config.get("modo_matlab", "lote")
+    if modo not in ("lote", "individual"):
+        raise ValueError(f"Modo MATLAB desconocido: '{modo}'. Use 'lote' o 'individual'.")
+    if not names:
+        return {}
+
+    num_workers = max(1, min(int(config.get("num_workers_matlab") or 1), len(names)))
+    timeout = config.get("timeout_matlab_s")
+    reintentos = int(config.get("reintentos_matlab", 1))
+
+    # El log se llama desde varios hilos: se serializa
+    bloqueo = threading.Lock()
+    callback = None
+    if log_callback:
+        def callback(msg):
+            with bloqueo:
+                log_callback(msg)
+
+    def trabajos(pendientes):
+        if modo == "lote":
+            grupos = [pendientes[i::num_workers] for i in range(num_workers)]
+            return [(_ejecutar_lote, grupo) for grupo in grupos if grupo]
+        return [(_ejecutar_individual, name) for name in pendientes]
+
+    resultados = {}
+    intentos = {name: 0 for name in names}
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        activos = {executor.submit(func, arg, config, show_output, callback, timeout)
+                   for func, arg in trabajos(list(names))}
+        while activos:
+            terminados, activos = wait(activos, return_when=FIRST_COMPLETED)
+            reintentar = []
+            for futuro in terminados:
+                for name, (error, transitorio) in futuro.result().items():
+                    intentos[name] += 1
+                    if error is not None and transitorio and intentos[name] <= reintentos:
+                        log(f"[MATLAB] Reintentando '{name}' ({intentos[name]}/{reintentos}): {error}",
+                            "warning", callback)
+                        reintentar.append(name)
+                    else:
+                        resultados[name] = error
+            activos |= {executor.submit(func, arg, config, show_output, callback, timeout)
+                        for func, arg in trabajos(reintentar)}
+    return resultados
+
+
+def process_mat_files(output_folder: str, config: Dict[str, Any], log_callback: Optional[Callable] = None,
+                      manifiesto=None) -> Dict[str, Optional[str]]:
+    """
+    Procesa con MATLAB los .mat de output_folder que aún no tienen su Excel.
+
+    Con 'motor_rainflow' = "numpy" el conteo se hace en Python (rainflow_utils), en paralelo
+    y sin MATLAB. Con el motor "matlab" (por defecto) los archivos se reparten en un pool
+    de procesos MATLAB (ver run_matlab_pool); con 'modo_matlab' = "lote" y un solo worker,
+    todos los archivos pendientes se procesan en una sola sesión.
+
+    Con un 'manifiesto' (manifiesto_utils.Manifiesto) también se reprocesan los .mat cuyo
+    contenido cambió desde que se generó su Excel, y los procesados se registran en él.
+
+    Retorna:
+        dict: {nombre: None si se procesó correctamente, o el mensaje de error}
+    """
     if not os.path.isdir(output_folder):
         raise FileNotFoundError(f"Carpeta de salida no existe: {output_folder}")
 
-    files = [f for f in os.listdir(output_folder) if f.lower().endswith(".mat")]
+    files = sorted(f for f in os.listdir(output_folder) if f.lower().endswith(".mat"))
     if not files:
         log(f"No se encontraron archivos .mat en {output_folder}", "warning", log_callback)
-        return
+        return {}
+
+    motor = config.get("motor_rainflow", "matlab")
+    if motor not in ("matlab", "numpy"):
+        raise ValueError(f"Motor rainflow desconocido: '{motor}'. Use 'matlab' o 'numpy'.")
 
-    log(f"Procesando {len(files)} archivos MAT con MATLAB...", "info", log_callback)
-    failed = []
+    log(f"Procesando {len(files)} archivos MAT con {'MATLAB' if motor == 'matlab' else 'NumPy'}...", "info", log_callback)
     show_output = config.get("mostrar_salida_matlab", False)
 
+    pending = []
     for mat_file in files:
         name = Path(mat_file).stem
         expected_excel = Path(config["excel_output_folder"]) / f"{name}.xlsx"
 
-        if expected_excel.exists():
+        if manifiesto is None:
+            procesar = not expected_excel.exists()
+        else:
+            procesar = manifiesto.pendiente(os.path.join(output_folder, mat_file), "rainflow",
+                                            expected_excel.exists(), [expected_excel.name])
+            if procesar and expected_excel.exists():
+                log(f"[MANIFIESTO] '{name}' cambió desde que se generó su Excel: se reprocesa.", "info", log_callback)
+                expected_excel.unlink()
+
+        if not procesar:
             log(f"[MATLAB] Saltando '{name}': Excel ya existe.", "info", log_callback)
             continue
+        pending.append(name)
 
-        log(f"[MATLAB] Procesando '{name}'...", "info", log_callback)
-        try:
-            run_matlab_script(name, config, show_output, log_callback)
-        except Exception as e:
-            log(f"Error en '{name}': {e}", "error", log_callback)
-            failed.append(name)
+    resultados = {}
+    if motor == "numpy":
+        # NumPy, pandas y scipy solo se cargan con este motor. Con conteo incremental, los
+        # días posteriores a uno pendiente se agregan aunque tengan Excel (ver encolar_dias_posteriores)
+        from rainflow_utils import procesar_rainflow_archivos
+        if config.get("graficos_matlab", False):
+            log("[RAINFLOW] El motor NumPy no genera gráficos; se omiten.", "warning", log_callback)
+        resultados = procesar_rainflow_archivos(
+            [os.path.join(output_folder, f"{name}.mat") for name in pending],
+            config.get("excel_output_folder", ""),
+            fs=config.get("FS", 10),
+            escritura=config.get("escritura", True),
+            num_workers=config.get("num_workers_rainflow"),
+            backend=config.get("backend_rainflow", "procesos"),
+            log_callback=lambda msg: log(msg, "info", log_callback),
+            incremental=config.get("rainflow_incremental", False),
+            salida=config.get("salida_rainflow", "ciclos"),
+            bordes_rango=config.get("bordes_rango"),
+            bordes_media=config.get("bordes_media"),
+            matriz_acumulada=config.get("matriz_acumulada", True),
+        )
+    elif pending:
+        resultados = run_matlab_pool(pending, config, show_output, log_callback)
+
+    if manifiesto is not None:
+        for name, error in resultados.items():
+            if error is None:
+                manifiesto.registrar(os.path.join(output_folder, f"{name}.mat"), "rainflow", [f"{name}.xlsx"])
+
+    failed = [name for name, error in resultados.items() if error is not None]
+    for name in failed:
+        log(f"Error en '{name}': {resultados[name]}", "error", log_callback)
 
     if failed:
         log(f"{len(failed)} archivo(s) fallaron al procesar: {failed}", "warning", log_callback)
     else:
         log("Todos los archivos .mat fueron procesados correctamente.", "info", log_callback)
+    return resultados
 
 
 def obtener_script_path(config: Dict[str, Any], log_callback: Optional[Callable] = None) -> str:
@@ -0,0 +1,301 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+# Segundos entre muestras de memoria durante una etapa
+INTERVALO_MUESTREO = 0.25
+
+# Prefijo de las métricas exportadas a Prometheus
+PREFIJO_PROMETHEUS = "tdms2mat"
+
+# Telemetría de la ejecución en curso (ver Telemetria.activar)
+_activa = None
+
+
+def _rss_proc(pid):
+    """RSS en bytes de un proceso leyendo /proc (Linux); None si no está disponible."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _hijos_proc(pid):
+    """PID de los procesos hijos directos (Linux)."""
+    hijos = []
+    try:
+        entradas = [e for e in os.listdir("/proc") if e.isdigit()]
+    except OSError:
+        return hijos
+    for entrada in entradas:
+        try:
+            with open(f"/proc/{entrada}/stat") as f:
+                campos = f.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if campos and int(campos[1]) == pid:
+            hijos.append(int(entrada))
+    return hijos
+
+
+def memoria_rss():
+    """
+    Memoria residente (bytes) del proceso y de sus procesos hijos (workers de los pools).
+
+    Usa psutil si está instalado; si no, /proc en Linux. Retorna None si no puede medirse.
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+    if psutil is not None:
+        proceso = psutil.Process()
+        total = proceso.memory_info().rss
+        for hijo in proceso.children(recursive=True):
+            try:
+                total += hijo.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    pid = os.getpid()
+    total = _rss_proc(pid)
+    if total is None:
+        return None
+    for hijo in _hijos_proc(pid):
+        total += _rss_proc(hijo) or 0
+    return total
+
+
+class _MuestreoMemoria:
+    """Hilo que registra el pico de memoria residente mientras dura una etapa."""
+
+    def __init__(self, intervalo=INTERVALO_MUESTREO):
+        self.intervalo = intervalo
+        self.pico = memoria_rss()
+        self._fin = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+
+    def _muestrear(self):
+        while not self._fin.wait(self.intervalo):
+            self._actualizar()
+
+    def _actualizar(self):
+        rss = memoria_rss()
+        if rss is not None and (self.pico is None or rss > self.pico):
+            self.pico = rss
+
+    def __enter__(self):
+        if self.pico is not None:
+            self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._fin.set()
+        if self._hilo.is_alive():
+            self._hilo.join()
+        if self.pico is not None:
+            self._actualizar()
+
+
+@contextmanager
+def medir_archivo(etapa, archivo):
+    """
+    Mide el procesamiento de un archivo dentro de un worker.
+
+    Entrega un diccionario en el que el código medido completa 'bytes_entrada',
+    'bytes_salida', 'filas_entrada' y 'filas_salida'; al salir se agregan 'segundos' (tiempo real) y 'cpu_s'
+    (CPU del hilo). El diccionario se devuelve al proceso principal junto con el
+    resultado del worker y se registra con registrar_archivo.
+    """
+    metrica = {"etapa": etapa, "archivo": os.path.basename(str(archivo)),
+               "bytes_entrada": None, "bytes_salida": None, "filas_entrada": None, "filas_salida": None}
+    inicio, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield metrica
+    finally:
+        metrica["segundos"] = round(time.perf_counter() - inicio, 6)
+        metrica["cpu_s"] = round(time.thread_time() - cpu, 6)
+
+
+def registrar_archivo(metrica):
+    """Agrega la medición de un archivo a la telemetría activa (si hay una)."""
+    if _activa is not None and metrica:
+        _activa.agregar_archivo(metrica)
+
+
+class Telemetria:
+    """
+    Métricas de rendimiento de una ejecución del pipeline.
+
+    Por cada etapa registra tiempo real, tiempo de CPU (del proceso y de sus workers),
+    archivos procesados por segundo, pico de memoria residente y la suma de bytes y
+    filas de entrada y salida de los archivos medidos por los workers. El resultado se
+    exporta como informe JSON y como archivo de texto para el colector 'textfile' de
+    node_exporter (Prometheus).
+    """
+
+    def __init__(self):
+        self.inicio = datetime.now()
+        self.etapas = []
+        self.archivos = []
+        self._etapa_actual = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def activar(self):
+        """Hace que registrar_archivo agregue a esta telemetría mientras dure el bloque."""
+        global _activa
+        previa, _activa = _activa, self
+        try:
+            yield self
+        finally:
+            _activa = previa
+
+    def agregar_archivo(self, metrica):
+        with self._lock:
+            self.archivos.append(dict(metrica, etapa_pipeline=self._etapa_actual))
+
+    @contextmanager
+    def etapa(self, nombre):
+        """
+        Mide una etapa. Entrega el registro de la etapa; quien la ejecuta puede marcar
+        'estado' = "error". Las mediciones de archivos registradas mientras tanto se
+        asocian a la etapa.
+        """
+        registro = {"etapa": nombre, "estado": "ok"}
+        with self._lock:
+            self._etapa_actual = nombre
+            primero = len(self.archivos)
+        tiempos = os.times()
+        inicio = time.perf_counter()
+        with _MuestreoMemoria() as memoria:
+            try:
+                yield registro
+            finally:
+                segundos = time.perf_counter() - inicio
+                fin = os.times()
+                with self._lock:
+                    self._etapa_actual = None
+                    archivos = self.archivos[primero:]
+                registro.update(self._resumen(segundos, tiempos, fin, archivos))
+                registro["pico_rss_bytes"] = memoria.pico
+                with self._lock:
+                    self.etapas.append(registro)
+
+    @staticmethod
+    def _resumen(segundos, tiempos, fin, archivos):
+        def suma(clave):
+            valores = [a[clave] for a in archivos if a.get(clave) is not None]
+            return sum(valores) if valores else None
+
+        # Los archivos de la etapa son las entradas medidas; las escrituras (por ejemplo, los
+        # días agrupados) aportan bytes y filas de salida pero no cuentan como archivos
+        entradas = sum(1 for a in archivos if a.get("bytes_entrada") is not None)
+        return {
+            "segundos": round(segundos, 6),
+            "cpu_s": round((fin.user - tiempos.user) + (fin.system - tiempos.system), 6),
+            "cpu_workers_s": round(
+                (fin.children_user - tiempos.children_user) + (fin.children_system - tiempos.children_system), 6
+            ),
+            "archivos": entradas,
+            "archivos_por_s": round(entradas / segundos, 6) if entradas and segundos > 0 else None,
+            "bytes_entrada": suma("bytes_entrada"),
+            "bytes_salida": suma("bytes_salida"),
+            "filas_entrada": suma("filas_entrada"),
+            "filas_salida": suma("filas_salida"),
+        }
+
+    def informe(self, exito=None):
+        """Informe de la ejecución como diccionario serializable a JSON."""
+        with self._lock:
+            return {
+                "inicio": self.inicio.isoformat(timespec="seconds"),
+                "segundos": round(sum(e["segundos"] for e in self.etapas), 6),
+                "exito": exito,
+                "etapas": list(self.etapas),
+                "archivos": list(self.archivos),
+            }
+
+    def guardar_json(self, carpeta, exito=None):
+        """
+        Escribe el informe en '<carpeta>/ejecucion_AAAAMMDD_HHMMSS.json'.
+
+        Retorna:
+            str: Ruta del informe.
+        """
+        os.makedirs(carpeta, exist_ok=True)
+        ruta = os.path.join(carpeta, f"ejecucion_{self.inicio:%Y%m%d_%H%M%S}.json")
+        _escribir_atomico(ruta, json.dumps(self.informe(exito), ensure_ascii=False, indent=2))
+        return ruta
+
+    def texto_prometheus(self, exito=None):
+        """Métricas por etapa en el formato de exposición de texto de Prometheus."""
+        series = [
+            ("etapa_segundos", "segundos", "Tiempo real de la etapa en segundos."),
+            ("etapa_cpu_segundos", "cpu_s", "Tiempo de CPU del proceso principal en la etapa."),
+            ("etapa_cpu_workers_segundos", "cpu_workers_s", "Tiempo de CPU de los procesos worker en la etapa."),
+            ("etapa_archivos", "archivos", "Archivos de entrada medidos en la etapa."),
+            ("etapa_archivos_por_segundo", "archivos_por_s", "Archivos procesados por segundo."),
+            ("etapa_bytes_entrada", "bytes_entrada", "Bytes leídos por los archivos medidos."),
+            ("etapa_bytes_salida", "bytes_salida", "Bytes escritos por los archivos medidos."),
+            ("etapa_filas_entrada", "filas_entrada", "Filas leídas por los archivos medidos."),
+            ("etapa_filas_salida", "filas_salida", "Filas escritas por los archivos medidos."),
+            ("etapa_pico_rss_bytes", "pico_rss_bytes", "Pico de memoria residente (proceso y workers)."),
+        ]
+        with self._lock:
+            etapas = list(self.etapas)
+
+        lineas = []
+        for nombre, clave, ayuda in series:
+            metrica = f"{PREFIJO_PROMETHEUS}_{nombre}"
+            lineas += [f"# HELP {metrica} {ayuda}", f"# TYPE {metrica} gauge"]
+            for etapa in etapas:
+                if etapa.get(clave) is not None:
+                    lineas.append(f'{metrica}{{etapa="{_etiqueta(etapa["etapa"])}"}} {etapa[clave]}')
+        lineas += [
+            f"# HELP {PREFIJO_PROMETHEUS}_etapa_exito 1 si la etapa terminó sin errores.",
+            f"# TYPE {PREFIJO_PROMETHEUS}_etapa_exito gauge",
+        ]
+        lineas += [
+            f'{PREFIJO_PROMETHEUS}_etapa_exito{{etapa="{_etiqueta(e["etapa"])}"}} {int(e["estado"] == "ok")}'
+            for e in etapas
+        ]
+        if exito is not None:
+            lineas += [
+                f"# HELP {PREFIJO_PROMETHEUS}_ejecucion_exito 1 si la última ejecución terminó sin errores.",
+                f"# TYPE {PREFIJO_PROMETHEUS}_ejecucion_exito gauge",
+                f"{PREFIJO_PROMETHEUS}_ejecucion_exito {int(bool(exito))}",
+            ]
+        lineas += [
+            f"# HELP {PREFIJO_PROMETHEUS}_ejecucion_inicio_segundos Inicio de la última ejecución (epoch).",
+            f"# TYPE {PREFIJO_PROMETHEUS}_ejecucion_inicio_segundos gauge",
+            f"{PREFIJO_PROMETHEUS}_ejecucion_inicio_segundos {self.inicio.timestamp():.0f}",
+        ]
+        return "\n".join(lineas) + "\n"
+
+    def guardar_prometheus(self, ruta, exito=None):
+        """
+        Escribe las métricas para el colector 'textfile' de node_exporter. El archivo se
+        reemplaza de forma atómica, como requiere el colector.
+        """
+        carpeta = os.path.dirname(os.path.abspath(ruta))
+        os.makedirs(carpeta, exist_ok=True)
+        _escribir_atomico(ruta, self.texto_prometheus(exito))
+
+
+def _etiqueta(valor):
+    """Escapa un valor de etiqueta de Prometheus."""
+    return str(valor).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _escribir_atomico(ruta, texto):
+    parcial = ruta + ".tmp"
+    with open(parcial, "w", encoding="utf-8") as f:
+        f.write(texto)
+    os.replace(parcial, ruta)
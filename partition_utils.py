@@ -0,0 +1,173 @@
+import os
+import shutil
+import tempfile
+import threading
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# Memoria máxima de datos acumulados antes de volcar corridas a disco
+MEMORIA_MAX = 512 * 1024 * 1024
+
+# Filas por bloque en las corridas volcadas y en la mezcla
+FILAS_BLOQUE = 200_000
+
+
+class ParticionadorDias:
+    """
+    Agrupa datos por día con memoria acotada, volcando corridas ordenadas a disco.
+
+    Los bloques recibidos (DataFrame con columna 'Time') se acumulan en memoria hasta
+    'memoria_max' bytes; al superarlo, cada día se ordena y se escribe como una corrida
+    en la carpeta de trabajo. Cada día se reconstruye luego con una mezcla k-way de sus
+    corridas, leyendo un bloque por corrida. Como los TDMS ya están ordenados en el tiempo,
+    las corridas casi no se solapan y la mezcla se reduce a concatenarlas.
+
+    Cada instancia tiene su propia carpeta de trabajo y su propio estado, por lo que no se
+    comparten datos entre ejecuciones. Es seguro llamar a 'agregar' desde varios hilos.
+    """
+
+    def __init__(self, carpeta_trabajo, memoria_max=MEMORIA_MAX, filas_bloque=FILAS_BLOQUE):
+        os.makedirs(carpeta_trabajo, exist_ok=True)
+        self.carpeta = tempfile.mkdtemp(prefix=".particion_", dir=carpeta_trabajo)
+        self.memoria_max = memoria_max
+        self.filas_bloque = filas_bloque
+        self.corridas = defaultdict(list)
+        self.columnas = defaultdict(dict)
+        self.rangos = {}
+        self._buffer = defaultdict(list)
+        self._bytes_buffer = 0
+        self._num_corridas = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def agregar(self, df):
+        """Agrega un bloque de filas (DataFrame con columna 'Time' datetime64)."""
+        df = df[df["Time"].notna()]
+        if df.empty:
+            return
+        fechas = df["Time"].dt.date
+        with self._lock:
+            for fecha, grupo in df.groupby(fechas, sort=False):
+                fecha = str(fecha)
+                self._buffer[fecha].append(grupo)
+                self.columnas[fecha].update(dict.fromkeys(grupo.columns))
+                minimo, maximo = grupo["Time"].min(), grupo["Time"].max()
+                if fecha in self.rangos:
+                    minimo = min(minimo, self.rangos[fecha][0])
+                    maximo = max(maximo, self.rangos[fecha][1])
+                self.rangos[fecha] = (minimo, maximo)
+            self._bytes_buffer += int(df.memory_usage(deep=False).sum())
+            if self._bytes_buffer >= self.memoria_max:
+                self._volcar()
+
+    def _volcar(self):
+        """Escribe el contenido del buffer como una corrida ordenada por día (requiere el lock)."""
+        for fecha, grupos in self._buffer.items():
+            self._escribir_corrida(fecha, grupos)
+        self._buffer.clear()
+        self._bytes_buffer = 0
+
+    def _escribir_corrida(self, fecha, grupos):
+        """Ordena los grupos de un día y los escribe como corrida en bloques (requiere el lock)."""
+        corrida = _concatenar_ordenado(grupos)
+        ruta = os.path.join(self.carpeta, f"{fecha}_{self._num_corridas:05d}")
+        os.makedirs(ruta)
+        for i, inicio in enumerate(range(0, len(corrida), self.filas_bloque)):
+            corrida.iloc[inicio:inicio + self.filas_bloque].to_pickle(os.path.join(ruta, f"{i:05d}.pkl"))
+        self.corridas[fecha].append(ruta)
+        self._num_corridas += 1
+
+    def dias(self):
+        """Devuelve las fechas ('YYYY-MM-DD') con datos, en orden."""
+        with self._lock:
+            return sorted(set(self.corridas) | set(self._buffer))
+
+    def iterar_dia(self, fecha):
+        """
+        Genera los datos de un día en bloques ordenados por tiempo (mezcla k-way de corridas).
+
+        Genera:
+            pandas.DataFrame: Bloques consecutivos del día; el tiempo no decrece entre bloques.
+        """
+        with self._lock:
+            grupos = self._buffer.pop(fecha, [])
+            self._bytes_buffer -= sum(int(g.memory_usage(deep=False).sum()) for g in grupos)
+            if grupos and self.corridas.get(fecha):
+                self._escribir_corrida(fecha, grupos)
+                grupos = []
+            rutas = list(self.corridas.get(fecha, []))
+
+        # Día que nunca se volcó a disco: se ordena directamente en memoria
+        if grupos:
+            yield _concatenar_ordenado(grupos)
+            return
+
+        cursores = [c for c in (_CursorCorrida(ruta) for ruta in rutas) if not c.agotado]
+        while cursores:
+            # Todas las filas <= frontera pueden emitirse: el resto de cada corrida es mayor
+            frontera = min(c.ultimo_tiempo() for c in cursores)
+            partes = [p for p in (c.tomar_hasta(frontera) for c in cursores) if not p.empty]
+            bloque = pd.concat(partes, ignore_index=True)
+            if len(partes) > 1:
+                bloque.sort_values(by="Time", kind="mergesort", inplace=True, ignore_index=True)
+            yield bloque
+            cursores = [c for c in cursores if not c.agotado]
+
+    def leer_dia(self, fecha):
+        """Devuelve todos los datos de un día como un único DataFrame ordenado por tiempo."""
+        bloques = list(self.iterar_dia(fecha))
+        if not bloques:
+            return pd.DataFrame(columns=list(self.columnas.get(fecha, {})))
+        return pd.concat(bloques, ignore_index=True)
+
+    def cerrar(self):
+        """Elimina las corridas volcadas y libera la memoria del buffer."""
+        with self._lock:
+            self._buffer.clear()
+            self.corridas.clear()
+            self._bytes_buffer = 0
+        shutil.rmtree(self.carpeta, ignore_errors=True)
+
+
+def _concatenar_ordenado(grupos):
+    df = pd.concat(grupos, ignore_index=True)
+    df.sort_values(by="Time", kind="mergesort", inplace=True, ignore_index=True)
+    return df
+
+
+class _CursorCorrida:
+    """Recorre una corrida volcada manteniendo en memoria un solo bloque."""
+
+    def __init__(self, ruta):
+        self.archivos = sorted(os.path.join(ruta, f) for f in os.listdir(ruta))
+        self.bloque = None
+        self.posicion = 0
+        self._cargar_siguiente()
+
+    @property
+    def agotado(self):
+        return self.bloque is None
+
+    def _cargar_siguiente(self):
+        self.bloque = pd.read_pickle(self.archivos.pop(0)) if self.archivos else None
+        self.posicion = 0
+
+    def ultimo_tiempo(self):
+        return self.bloque["Time"].iloc[-1]
+
+    def tomar_hasta(self, frontera):
+        """Devuelve las filas del bloque actual con Time <= frontera y avanza el cursor."""
+        tiempos = self.bloque["Time"].values
+        fin = int(np.searchsorted(tiempos, np.datetime64(frontera), side="right"))
+        parte = self.bloque.iloc[self.posicion:fin]
+        self.posicion = fin
+        if self.posicion >= len(self.bloque):
+            self._cargar_siguiente()
+        return parte
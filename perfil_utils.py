@@ -0,0 +1,326 @@
+import os
+import re
+import json
+import uuid
+import unicodedata
+import threading
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# Sitios de asignación de memoria incluidos en los informes
+TOP_ASIGNACIONES = 25
+
+# Marcos de pila guardados por asignación en tracemalloc (los informes agrupan por línea)
+MARCOS_TRACEMALLOC = 1
+
+# Segundos entre consultas de la memoria trazada para capturar el pico
+INTERVALO_MEMORIA = 0.5
+
+# Profundidad máxima de las pilas colapsadas
+PROFUNDIDAD_MAXIMA = 64
+
+# Etapa en curso: (carpeta de perfiles de los workers, trazar memoria) (ver Perfilador.etapa)
+_etapa_activa = None
+
+
+class _PicoMemoria:
+    """
+    Captura una instantánea de tracemalloc cerca del pico de memoria trazada.
+
+    Un hilo consulta la memoria trazada cada INTERVALO_MEMORIA segundos y toma una
+    instantánea cada vez que supera en un 10 % a la anterior. Inicia tracemalloc si no
+    estaba activo y lo detiene al terminar.
+    """
+
+    def __init__(self):
+        import tracemalloc
+        self.tracemalloc = tracemalloc
+        self.propio = not tracemalloc.is_tracing()
+        self.instantanea = None
+        self.pico = 0
+        self._capturado = 0
+        self._fin = threading.Event()
+        self._hilo = threading.Thread(target=self._vigilar, daemon=True)
+
+    def _vigilar(self):
+        while not self._fin.wait(INTERVALO_MEMORIA):
+            self._capturar()
+
+    def _capturar(self):
+        actual, _ = self.tracemalloc.get_traced_memory()
+        if actual > self._capturado * 1.1:
+            self._capturado = actual
+            self.instantanea = self.tracemalloc.take_snapshot()
+
+    def __enter__(self):
+        if self.propio:
+            self.tracemalloc.start(MARCOS_TRACEMALLOC)
+        else:
+            self.tracemalloc.reset_peak()
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._fin.set()
+        self._hilo.join()
+        self._capturar()
+        self.pico = self.tracemalloc.get_traced_memory()[1]
+        if self.propio:
+            self.tracemalloc.stop()
+
+    def top(self, limite=TOP_ASIGNACIONES):
+        """Sitios con más memoria asignada en la instantánea: [(sitio, bytes, bloques)]."""
+        if self.instantanea is None:
+            return []
+        tm = self.tracemalloc
+        instantanea = self.instantanea.filter_traces((
+            tm.Filter(False, tm.__file__),
+            tm.Filter(False, "<frozen importlib._bootstrap>"),
+            tm.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tm.Filter(False, __file__),
+        ))
+        return [
+            (f"{e.traceback[0].filename}:{e.traceback[0].lineno}", e.size, e.count)
+            for e in instantanea.statistics("lineno")[:limite]
+        ]
+
+
+class _TareaPerfilada:
+    """
+    Tarea de un pool ejecutada con cProfile (y, en procesos worker, con tracemalloc).
+
+    El perfil se escribe en la carpeta de workers de la etapa; el proceso principal los
+    combina al terminar la etapa. Es serializable para ProcessPoolExecutor si 'func' lo es.
+    """
+
+    def __init__(self, func, carpeta, memoria=True):
+        self.func = func
+        self.carpeta = carpeta
+        self.memoria = memoria
+
+    def __call__(self, *args, **kwargs):
+        import cProfile
+
+        nombre = os.path.join(self.carpeta, f"{os.getpid()}_{uuid.uuid4().hex[:12]}")
+        # En hilos la memoria la traza la etapa (tracemalloc es global al proceso)
+        en_hilo = threading.current_thread() is not threading.main_thread()
+        memoria = _PicoMemoria() if self.memoria and not en_hilo else None
+        perfil = cProfile.Profile()
+        try:
+            if memoria is not None:
+                with memoria:
+                    return perfil.runcall(self.func, *args, **kwargs)
+            return perfil.runcall(self.func, *args, **kwargs)
+        finally:
+            try:
+                perfil.dump_stats(nombre + ".pstats")
+                if memoria is not None:
+                    with open(nombre + ".memoria.json", "w", encoding="utf-8") as f:
+                        json.dump({"pico": memoria.pico, "top": memoria.top()}, f)
+            except OSError:
+                pass
+
+
+class _EjecutorPerfilado:
+    """Envuelve un executor para que cada tarea enviada se ejecute con _TareaPerfilada."""
+
+    def __init__(self, executor, carpeta, memoria=True):
+        self._executor = executor
+        self._carpeta = carpeta
+        self._memoria = memoria
+
+    def submit(self, fn, *args, **kwargs):
+        return self._executor.submit(_TareaPerfilada(fn, self._carpeta, self._memoria), *args, **kwargs)
+
+    def map(self, fn, *iterables, **kwargs):
+        return self._executor.map(_TareaPerfilada(fn, self._carpeta, self._memoria), *iterables, **kwargs)
+
+    def __enter__(self):
+        self._executor.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._executor.__exit__(*exc)
+
+    def __getattr__(self, nombre):
+        return getattr(self._executor, nombre)
+
+
+def envolver_executor(executor):
+    """
+    Devuelve el executor tal cual o, si hay una etapa perfilándose, envuelto para que
+    cada tarea se perfile en el worker. Sin perfilado el costo es una comparación.
+    """
+    if _etapa_activa is None:
+        return executor
+    return _EjecutorPerfilado(executor, *_etapa_activa)
+
+
+def _etiqueta_funcion(funcion):
+    archivo, linea, nombre = funcion
+    if archivo == "~":
+        return nombre
+    return f"{nombre} ({os.path.basename(archivo)}:{linea})"
+
+
+def pilas_colapsadas(stats):
+    """
+    Pilas colapsadas ('marco;marco;... microsegundos') de un pstats.Stats, para flamegraph.pl
+    o speedscope.
+
+    cProfile no guarda pilas completas: se reconstruyen desde las funciones raíz siguiendo
+    el grafo de llamadas y repartiendo el tiempo de cada función entre sus llamadores en
+    proporción al tiempo de cada llamada, por lo que son una aproximación.
+    """
+    datos = stats.stats
+    llamados = defaultdict(dict)
+    for funcion, (_, _, _, _, llamadores) in datos.items():
+        for llamador, arista in llamadores.items():
+            llamados[llamador][funcion] = arista
+
+    pilas = defaultdict(float)
+
+    def recorrer(funcion, camino, fraccion):
+        _, _, propio, acumulado, _ = datos[funcion]
+        if propio * fraccion > 0:
+            pilas[";".join(camino)] += propio * fraccion
+        if len(camino) >= PROFUNDIDAD_MAXIMA:
+            return
+        for llamado, (_, _, _, acumulado_arista) in llamados.get(funcion, {}).items():
+            total = datos[llamado][3]
+            if llamado in visitados or total <= 0:
+                continue
+            parte = fraccion * acumulado_arista / total
+            if parte * total < 1e-6:
+                continue
+            visitados.add(llamado)
+            recorrer(llamado, camino + [_etiqueta_funcion(llamado)], parte)
+            visitados.discard(llamado)
+
+    for funcion, (_, _, _, _, llamadores) in datos.items():
+        if not llamadores:
+            visitados = {funcion}
+            recorrer(funcion, [_etiqueta_funcion(funcion)], 1.0)
+
+    return [f"{pila} {round(segundos * 1e6)}" for pila, segundos in sorted(pilas.items())
+            if round(segundos * 1e6) > 0]
+
+
+def _nombre_archivo(indice, nombre):
+    ascii_ = unicodedata.normalize("NFKD", nombre.lower()).encode("ascii", "ignore").decode()
+    limpio = re.sub(r"[^0-9a-z]+", "_", ascii_).strip("_")
+    return f"{indice:02d}_{limpio or 'etapa'}"
+
+
+class Perfilador:
+    """
+    Perfilado de las etapas del pipeline con cProfile y tracemalloc.
+
+    Por cada etapa escribe en 'carpeta':
+        NN_etapa.pstats / .collapsed: perfil del proceso principal (pstats y pilas colapsadas).
+        NN_etapa.workers.pstats / .collapsed: perfiles combinados de las tareas de los pools.
+        NN_etapa.memoria.txt: pico de memoria trazada y sitios con más memoria asignada.
+
+    tracemalloc multiplica varias veces el tiempo de las etapas con muchas asignaciones
+    pequeñas (por ejemplo, la lectura de CSV); con memoria=False solo se usa cProfile.
+    """
+
+    def __init__(self, carpeta, log_callback=None, memoria=True):
+        self.carpeta = carpeta
+        self.log_callback = log_callback
+        self.memoria = memoria
+        self._indice = 0
+
+    def log(self, msg):
+        if self.log_callback:
+            self.log_callback(msg)
+
+    @contextmanager
+    def etapa(self, nombre):
+        """Perfila el bloque y las tareas de los pools creados en él (ver envolver_executor)."""
+        import cProfile
+        import tempfile
+        import shutil
+        global _etapa_activa
+
+        self._indice += 1
+        base = os.path.join(self.carpeta, _nombre_archivo(self._indice, nombre))
+        os.makedirs(self.carpeta, exist_ok=True)
+        carpeta_workers = tempfile.mkdtemp(prefix=".perfil_", dir=self.carpeta)
+
+        perfil = cProfile.Profile()
+        memoria = _PicoMemoria() if self.memoria else None
+        previa, _etapa_activa = _etapa_activa, (carpeta_workers, self.memoria)
+        try:
+            with memoria if memoria is not None else nullcontext():
+                perfil.enable()
+                try:
+                    yield
+                finally:
+                    perfil.disable()
+        finally:
+            _etapa_activa = previa
+            try:
+                self._escribir(base, perfil, memoria, carpeta_workers)
+                self.log(f"[PERFIL] {nombre}: {os.path.basename(base)}.* en '{self.carpeta}'")
+            except Exception as e:
+                self.log(f"[PERFIL] No se pudo escribir el perfil de '{nombre}': {e}")
+            finally:
+                shutil.rmtree(carpeta_workers, ignore_errors=True)
+
+    def _escribir(self, base, perfil, memoria, carpeta_workers):
+        import pstats
+
+        perfil.create_stats()
+        if perfil.stats:
+            _guardar_perfil(base, pstats.Stats(perfil))
+
+        archivos = sorted(os.listdir(carpeta_workers))
+        perfiles = [os.path.join(carpeta_workers, a) for a in archivos if a.endswith(".pstats")]
+        if perfiles:
+            _guardar_perfil(base + ".workers", pstats.Stats(*perfiles))
+
+        if memoria is not None:
+            tareas = []
+            for a in archivos:
+                if a.endswith(".memoria.json"):
+                    with open(os.path.join(carpeta_workers, a), encoding="utf-8") as f:
+                        tareas.append(json.load(f))
+            _guardar_memoria(base + ".memoria.txt", memoria, tareas, len(perfiles))
+
+
+def _guardar_perfil(base, stats):
+    stats.dump_stats(base + ".pstats")
+    with open(base + ".collapsed", "w", encoding="utf-8") as f:
+        f.writelines(linea + "\n" for linea in pilas_colapsadas(stats))
+
+
+def _guardar_memoria(ruta, memoria, tareas, num_tareas):
+    lineas = [
+        f"Generado: {datetime.now().isoformat(timespec='seconds')}",
+        f"Pico de memoria trazada (proceso principal): {memoria.pico / 2**20:.1f} MB",
+        "",
+        "Sitios con más memoria asignada cerca del pico (proceso principal):",
+    ]
+    lineas += [f"  {tamano / 2**20:10.2f} MB {bloques:9d} bloques  {sitio}" for sitio, tamano, bloques in memoria.top()]
+
+    if tareas:
+        # Por sitio, la mayor asignación observada en una tarea
+        sitios = {}
+        for tarea in tareas:
+            for sitio, tamano, bloques in tarea["top"]:
+                if tamano > sitios.get(sitio, (0, 0))[0]:
+                    sitios[sitio] = (tamano, bloques)
+        picos = sorted(t["pico"] for t in tareas)
+        lineas += [
+            "",
+            f"Tareas en procesos worker: {len(tareas)} de {num_tareas} "
+            f"(pico máximo {picos[-1] / 2**20:.1f} MB, mediana {picos[len(picos) // 2] / 2**20:.1f} MB)",
+            "Sitios con más memoria asignada en una tarea:",
+        ]
+        top = sorted(sitios.items(), key=lambda s: s[1][0], reverse=True)[:TOP_ASIGNACIONES]
+        lineas += [f"  {tamano / 2**20:10.2f} MB {bloques:9d} bloques  {sitio}" for sitio, (tamano, bloques) in top]
+
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write("\n".join(lineas) + "\n")
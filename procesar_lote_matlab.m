@@ -0,0 +1,39 @@
+function procesar_lote_matlab(manifestPath, resultsPath, excelFolder, graficos, escritura, fs, n_channels)
+% procesar_lote_matlab  Procesa en una sola sesión todos los .MAT listados en un manifiesto.
+%
+%   procesar_lote_matlab(manifestPath, resultsPath, excelFolder, graficos, escritura, fs, n_channels)
+%
+%   - manifestPath: archivo de texto con una ruta .mat por línea.
+%   - resultsPath:  archivo donde se agrega una línea por .mat procesado:
+%                   "OK<TAB>ruta" o "ERROR<TAB>ruta<TAB>mensaje".
+%   - El resto de los parámetros se pasan a procesar_matlab.
+%
+%   Antes de cada archivo se imprime "[LOTE] ruta", que Python usa para etiquetar la
+%   salida. Un error en un archivo no detiene el lote; el resultado se escribe al
+%   terminar cada archivo, de modo que un corte de MATLAB conserva lo ya procesado.
+
+    assert(isfile(manifestPath), "No existe el manifiesto: %s", manifestPath);
+    archivos = strtrim(splitlines(string(fileread(manifestPath))));
+    archivos = archivos(archivos ~= "");
+
+    for k = 1:numel(archivos)
+        matFile = archivos(k);
+        fprintf("[LOTE] %s\n", matFile);
+        try
+            procesar_matlab(char(matFile), excelFolder, graficos, escritura, fs, n_channels);
+            estado = sprintf("OK\t%s", matFile);
+        catch e
+            mensaje = regexprep(getReport(e, 'basic', 'hyperlinks', 'off'), '[\r\n\t]+', ' ');
+            fprintf(2, "%s → ERROR: %s\n", matFile, mensaje);
+            estado = sprintf("ERROR\t%s\t%s", matFile, mensaje);
+        end
+
+        fid = fopen(resultsPath, 'a', 'n', 'UTF-8');
+        fprintf(fid, "%s\n", estado);
+        fclose(fid);
+
+        if graficos
+            close all;
+        end
+    end
+end
@@ -0,0 +1,543 @@
+import os
+from datetime import datetime
+from concurrent.futures import as_completed
+
+import numpy as np
+import pandas as pd
+from scipy.io import loadmat
+
+from workers_utils import calcular_num_workers, crear_executor
+
+# Parámetros geométricos del servomotor (ver procesar_matlab.m)
+DIAMETRO_APERTURA, DIAMETRO_VASTAGO_APERTURA = 2 * 762 / 1000, 2 * 350 / 1000
+DIAMETRO_CIERRE, DIAMETRO_VASTAGO_CIERRE = DIAMETRO_APERTURA, 2 * 101.6 / 1000
+AREA_APERTURA = np.pi * (DIAMETRO_APERTURA ** 2 - DIAMETRO_VASTAGO_APERTURA ** 2) / 4
+AREA_CIERRE = np.pi * (DIAMETRO_CIERRE ** 2 - DIAMETRO_VASTAGO_CIERRE ** 2) / 4
+
+# Umbrales de rango para las hojas 'deltaK_*'
+UMBRALES_DELTA_K = (14, 10.5, 7)
+
+COLUMNAS_RAINFLOW = ["Ciclos", "Rango", "Media", "ti", "ts"]
+
+# Sufijo del estado del conteo continuo guardado junto a cada Excel
+SUFIJO_RESIDUO = ".residuo.npz"
+
+# Bordes por defecto de la matriz rango x media (kN): 100 x 100 clases
+BORDES_RANGO = np.linspace(0, 2000, 101)
+BORDES_MEDIA = np.linspace(-2000, 2000, 101)
+
+# Sufijo de la matriz diaria y prefijo de la matriz acumulada por unidad
+SUFIJO_MATRIZ = ".matriz.npz"
+PREFIJO_ACUMULADA = "matriz_acumulada"
+
+SALIDAS_RAINFLOW = ("ciclos", "matriz", "ambos")
+
+
+def fuerza_hidraulica(data):
+    """
+    Fuerza hidráulica del servomotor a partir de las presiones de cierre y apertura.
+
+    Equivale a 'Fza_Hid = (u(:,7)*A_c - u(:,6)*A_a)*(100/5)' en procesar_matlab.m
+    (columnas 7 y 6 de MATLAB, índices 6 y 5 en NumPy).
+    """
+    return (data[:, 6] * AREA_CIERRE - data[:, 5] * AREA_APERTURA) * (100 / 5)
+
+
+def encontrar_inversiones(x):
+    """
+    Índices de los picos y valles de la señal, incluidos el primer y el último punto.
+
+    Las mesetas (valores repetidos consecutivos) se reducen a su primer punto, también
+    al final de la señal.
+    """
+    x = np.asarray(x, dtype=float)
+    if len(x) < 2:
+        return np.arange(len(x))
+    pasos = np.flatnonzero(np.diff(x) != 0)
+    if len(pasos) == 0:
+        return np.array([0])
+    signos = np.sign(x[pasos + 1] - x[pasos])
+    giros = pasos[:-1][signos[1:] != signos[:-1]] + 1
+    return np.concatenate(([0], giros, [pasos[-1] + 1]))
+
+
+def _apilar(valores, tiempos, pila_v, pila_t, ciclos):
+    """
+    Agrega inversiones a la pila de ASTM E1049-85 (5.4.4) y extrae los ciclos que se cierran.
+
+    Modifica 'pila_v', 'pila_t' y 'ciclos' en el lugar.
+    """
+    for valor, tiempo in zip(valores, tiempos):
+        pila_v.append(valor)
+        pila_t.append(tiempo)
+        while len(pila_v) >= 3:
+            rango_x = abs(pila_v[-1] - pila_v[-2])
+            rango_y = abs(pila_v[-2] - pila_v[-3])
+            if rango_x < rango_y:
+                break
+            if len(pila_v) == 3:
+                # El rango Y contiene el punto inicial: medio ciclo
+                ciclos.append((0.5, rango_y, (pila_v[0] + pila_v[1]) / 2, pila_t[0], pila_t[1]))
+                del pila_v[0], pila_t[0]
+            else:
+                ciclos.append((1.0, rango_y, (pila_v[-3] + pila_v[-2]) / 2, pila_t[-3], pila_t[-2]))
+                del pila_v[-3:-1], pila_t[-3:-1]
+
+
+def _matriz_ciclos(ciclos):
+    return np.array(ciclos, dtype=float).reshape(-1, 5)
+
+
+def estado_inicial_rainflow():
+    """
+    Estado vacío del conteo continuo.
+
+    El estado contiene la pila de inversiones sin cerrar ('pila_v', 'pila_t') y la última
+    muestra procesada ('ultimo_v', 'ultimo_t'), que todavía no se sabe si es una inversión.
+    """
+    return {"pila_v": [], "pila_t": [], "ultimo_v": None, "ultimo_t": None}
+
+
+def contar_ciclos_continuo(x, tiempos, estado=None):
+    """
+    Conteo rainflow por tramos: continúa desde 'estado' y devuelve solo los ciclos cerrados.
+
+    Procesar una señal en tramos consecutivos da los mismos ciclos que procesarla completa:
+    la última muestra de cada tramo no se apila hasta saber, con el tramo siguiente, si es
+    una inversión. El costo depende solo de los datos nuevos y del tamaño del residuo.
+
+    Parámetros:
+        x (numpy.ndarray): Muestras nuevas de la señal.
+        tiempos (numpy.ndarray): Tiempo de cada muestra (en la misma escala en todos los tramos).
+        estado (dict): Estado devuelto por la llamada anterior (None: inicio de la serie).
+
+    Retorna:
+        tuple: (matriz de ciclos cerrados como en contar_ciclos, nuevo estado)
+    """
+    estado = estado_inicial_rainflow() if estado is None else estado
+    pila_v, pila_t = list(estado["pila_v"]), list(estado["pila_t"])
+    x = np.asarray(x, dtype=float).ravel()
+    tiempos = np.asarray(tiempos, dtype=float).ravel()
+    if len(x) == 0:
+        return _matriz_ciclos([]), estado
+
+    # Se retoma desde la última inversión apilada y la última muestra pendiente
+    previos_v = pila_v[-1:] + ([estado["ultimo_v"]] if estado["ultimo_v"] is not None else [])
+    previos_t = pila_t[-1:] + ([estado["ultimo_t"]] if estado["ultimo_t"] is not None else [])
+    serie_v = np.concatenate((previos_v, x))
+    serie_t = np.concatenate((previos_t, tiempos))
+
+    inversiones = encontrar_inversiones(serie_v)
+    inversiones = inversiones[inversiones >= len(pila_v[-1:])]
+
+    ciclos = []
+    _apilar(serie_v[inversiones[:-1]].tolist(), serie_t[inversiones[:-1]].tolist(), pila_v, pila_t, ciclos)
+    nuevo = {"pila_v": pila_v, "pila_t": pila_t,
+             "ultimo_v": float(serie_v[inversiones[-1]]), "ultimo_t": float(serie_t[inversiones[-1]])}
+    return _matriz_ciclos(ciclos), nuevo
+
+
+def cerrar_conteo(estado):
+    """
+    Termina el conteo continuo: apila la última muestra y cuenta el residuo como medios ciclos.
+
+    Retorna:
+        numpy.ndarray: Ciclos que se cierran con la última muestra seguidos del residuo.
+    """
+    pila_v, pila_t = list(estado["pila_v"]), list(estado["pila_t"])
+    ciclos = []
+    if estado["ultimo_v"] is not None:
+        _apilar([estado["ultimo_v"]], [estado["ultimo_t"]], pila_v, pila_t, ciclos)
+
+    # Residuo: cada rango restante cuenta como medio ciclo
+    pila_v, pila_t = np.array(pila_v), np.array(pila_t)
+    residuo = np.column_stack((
+        np.full(len(pila_v) - 1, 0.5),
+        np.abs(np.diff(pila_v)),
+        (pila_v[:-1] + pila_v[1:]) / 2,
+        pila_t[:-1],
+        pila_t[1:],
+    )) if len(pila_v) > 1 else np.empty((0, 5))
+    return np.vstack((_matriz_ciclos(ciclos), residuo))
+
+
+def contar_ciclos(x, fs=None):
+    """
+    Conteo rainflow según ASTM E1049-85 (5.4.4), como 'rainflow' de MATLAB.
+
+    Parámetros:
+        x (numpy.ndarray): Señal de carga.
+        fs (float): Frecuencia de muestreo en Hz. Si es None, 'ti' y 'ts' son índices
+            de muestra (desde 1, como en MATLAB) en lugar de tiempos.
+
+    Retorna:
+        numpy.ndarray: Matriz (ciclos x 5) con columnas Ciclos (0.5 o 1), Rango, Media,
+            ti y ts (inicio y fin del ciclo), en el orden en que se extraen.
+    """
+    x = np.asarray(x, dtype=float).ravel()
+    tiempos = np.arange(len(x)) / fs if fs else np.arange(1, len(x) + 1, dtype=float)
+    cerrados, estado = contar_ciclos_continuo(x, tiempos)
+    return np.vstack((cerrados, cerrar_conteo(estado)))
+
+
+def filtrar_delta_k(ciclos, umbral):
+    """
+    Ciclos con rango >= umbral, con la columna 'deltaK' agregada (como en procesar_matlab.m).
+
+    Si ningún ciclo supera el umbral se devuelve una fila de ceros.
+    """
+    # Misma expresión que MATLAB, para que los ciclos en el umbral se redondeen igual
+    delta_k = (ciclos[:, 2] + ciclos[:, 1] / 2) - (ciclos[:, 2] - ciclos[:, 1] / 2)
+    seleccion = np.column_stack((ciclos[delta_k >= umbral], delta_k[delta_k >= umbral]))
+    if len(seleccion) == 0:
+        seleccion = np.zeros((1, ciclos.shape[1] + 1))
+    return seleccion
+
+
+def escribir_excel_rainflow(ciclos, excel_path, matriz=None):
+    """
+    Escribe las hojas 'Conteo Rainflow' y 'deltaK_*' de procesar_matlab.m.
+
+    Si se indica 'matriz' (tupla de matriz_rainflow), se agrega la hoja 'Matriz Rainflow';
+    con 'ciclos' None solo se escribe esa hoja. El archivo se escribe de forma atómica:
+    la presencia del Excel indica que el día ya fue procesado.
+    """
+    temporal = excel_path + ".part.xlsx"
+    with pd.ExcelWriter(temporal) as writer:
+        if ciclos is not None:
+            pd.DataFrame(ciclos, columns=COLUMNAS_RAINFLOW).to_excel(
+                writer, sheet_name="Conteo Rainflow", index=False)
+            for umbral in UMBRALES_DELTA_K:
+                pd.DataFrame(filtrar_delta_k(ciclos, umbral), columns=COLUMNAS_RAINFLOW + ["deltaK"]).to_excel(
+                    writer, sheet_name=f"deltaK_{umbral:g}", index=False)
+        if matriz is not None:
+            matriz_a_dataframe(*matriz).to_excel(writer, sheet_name="Matriz Rainflow")
+    os.replace(temporal, excel_path)
+
+
+def matriz_rainflow(ciclos, bordes_rango=None, bordes_media=None):
+    """
+    Acumula los ciclos en una matriz rango x media de tamaño fijo.
+
+    Cada ciclo suma su valor de 'Ciclos' (0.5 o 1) en su clase; los valores fuera de los
+    bordes se asignan a la primera o última clase, por lo que el total se conserva. Las
+    matrices con los mismos bordes se combinan sumándolas.
+
+    Retorna:
+        tuple: (matriz [clases de rango x clases de media], bordes_rango, bordes_media)
+    """
+    bordes_rango = np.asarray(BORDES_RANGO if bordes_rango is None else bordes_rango, dtype=float)
+    bordes_media = np.asarray(BORDES_MEDIA if bordes_media is None else bordes_media, dtype=float)
+    matriz, _, _ = np.histogram2d(
+        np.clip(ciclos[:, 1], bordes_rango[0], bordes_rango[-1]),
+        np.clip(ciclos[:, 2], bordes_media[0], bordes_media[-1]),
+        bins=(bordes_rango, bordes_media),
+        weights=ciclos[:, 0],
+    )
+    return matriz, bordes_rango, bordes_media
+
+
+def matriz_a_dataframe(matriz, bordes_rango, bordes_media):
+    """Matriz con las clases como etiquetas: filas 'Rango [a, b)' y columnas 'Media [a, b)'."""
+    def etiquetas(bordes):
+        return [f"[{a:g}, {b:g})" for a, b in zip(bordes[:-1], bordes[1:])]
+    return pd.DataFrame(
+        matriz,
+        index=pd.Index(etiquetas(bordes_rango), name="Rango / Media"),
+        columns=etiquetas(bordes_media),
+    )
+
+
+def guardar_matriz(ruta, matriz, bordes_rango, bordes_media):
+    """Guarda una matriz rango x media con sus bordes, de forma atómica."""
+    temporal = ruta + ".tmp"
+    with open(temporal, "wb") as f:
+        np.savez(f, matriz=matriz, bordes_rango=bordes_rango, bordes_media=bordes_media)
+    os.replace(temporal, ruta)
+
+
+def cargar_matriz(ruta):
+    """Lee una matriz guardada con guardar_matriz: (matriz, bordes_rango, bordes_media)."""
+    with np.load(ruta) as datos:
+        return datos["matriz"], datos["bordes_rango"], datos["bordes_media"]
+
+
+def acumular_matrices(excel_folder, unidad, log_callback=None):
+    """
+    Suma las matrices diarias de una unidad y guarda 'matriz_acumulada-u<unidad>.npz' y '.xlsx'.
+
+    La suma se rehace a partir de los archivos diarios, por lo que reprocesar un día no
+    lo cuenta dos veces. Las matrices con bordes distintos a los de la más reciente se omiten.
+
+    Retorna:
+        tuple: (matriz, bordes_rango, bordes_media) o None si no hay matrices diarias.
+    """
+    sufijo = f"-u{unidad}{SUFIJO_MATRIZ}"
+    rutas = sorted(os.path.join(excel_folder, f) for f in os.listdir(excel_folder) if f.endswith(sufijo))
+    if not rutas:
+        return None
+
+    acumulada, bordes_rango, bordes_media = cargar_matriz(rutas[-1])
+    acumulada = acumulada.copy()
+    for ruta in rutas[:-1]:
+        matriz, rango, media = cargar_matriz(ruta)
+        if not (np.array_equal(rango, bordes_rango) and np.array_equal(media, bordes_media)):
+            if log_callback:
+                log_callback(f"[RAINFLOW] {os.path.basename(ruta)} omitida: bordes distintos.")
+            continue
+        acumulada += matriz
+
+    base = os.path.join(excel_folder, f"{PREFIJO_ACUMULADA}-u{unidad}")
+    guardar_matriz(base + ".npz", acumulada, bordes_rango, bordes_media)
+    escribir_excel_rainflow(None, base + ".xlsx", (acumulada, bordes_rango, bordes_media))
+    return acumulada, bordes_rango, bordes_media
+
+
+def ruta_residuo(excel_folder, nombre):
+    """Archivo con el estado del conteo continuo al final del día 'nombre' (YYYY.MM.DD-uXX)."""
+    return os.path.join(excel_folder, nombre + SUFIJO_RESIDUO)
+
+
+def guardar_residuo(ruta, estado):
+    """Guarda el estado de contar_ciclos_continuo de forma atómica."""
+    temporal = ruta + ".tmp"
+    with open(temporal, "wb") as f:
+        np.savez(
+            f,
+            pila_v=np.asarray(estado["pila_v"], dtype=float),
+            pila_t=np.asarray(estado["pila_t"], dtype=float),
+            ultimo=np.array([np.nan if estado["ultimo_v"] is None else estado["ultimo_v"],
+                             np.nan if estado["ultimo_t"] is None else estado["ultimo_t"]]),
+        )
+    os.replace(temporal, ruta)
+
+
+def cargar_residuo(ruta):
+    """Lee un estado guardado con guardar_residuo."""
+    with np.load(ruta) as datos:
+        ultimo_v, ultimo_t = datos["ultimo"].tolist()
+        return {
+            "pila_v": datos["pila_v"].tolist(),
+            "pila_t": datos["pila_t"].tolist(),
+            "ultimo_v": None if np.isnan(ultimo_v) else ultimo_v,
+            "ultimo_t": None if np.isnan(ultimo_t) else ultimo_t,
+        }
+
+
+def residuo_anterior(excel_folder, nombre):
+    """
+    Ruta del residuo del último día anterior a 'nombre' de la misma unidad (None si no hay).
+
+    Los nombres 'YYYY.MM.DD-uXX' se ordenan cronológicamente como texto.
+    """
+    if not os.path.isdir(excel_folder) or "-u" not in nombre:
+        return None
+    unidad = nombre.rsplit("-u", 1)[1]
+    anteriores = sorted(
+        f[:-len(SUFIJO_RESIDUO)] for f in os.listdir(excel_folder)
+        if f.endswith(f"-u{unidad}{SUFIJO_RESIDUO}") and f[:-len(SUFIJO_RESIDUO)] < nombre
+    )
+    return ruta_residuo(excel_folder, anteriores[-1]) if anteriores else None
+
+
+def encolar_dias_posteriores(mat_files, excel_folder, log_callback=None):
+    """
+    Agrega a 'mat_files' los días posteriores ya procesados en modo incremental.
+
+    Cada día continúa el conteo desde el residuo del anterior de la misma unidad, por lo
+    que al (re)procesar un día dejan de valer los resultados de todos los días siguientes
+    que tienen residuo. Su residuo, su Excel y su matriz diaria se eliminan, y sus MAT
+    (en la carpeta del primer MAT de la unidad) se agregan para reprocesarlos en orden.
+    Si falta alguno de esos MAT se lanza FileNotFoundError antes de eliminar nada.
+
+    Retorna:
+        list: Rutas de los MAT a procesar, ordenadas por nombre.
+    """
+    def log(msg):
+        if log_callback:
+            log_callback(msg)
+
+    mat_files = sorted(mat_files, key=os.path.basename)
+    nombres = {os.path.splitext(os.path.basename(f))[0] for f in mat_files}
+    primeros = {}
+    for mat_file in mat_files:
+        nombre = os.path.splitext(os.path.basename(mat_file))[0]
+        if "-u" in nombre:
+            primeros.setdefault(nombre.rsplit("-u", 1)[1], mat_file)
+    if not primeros or not os.path.isdir(excel_folder):
+        return mat_files
+
+    invalidados = []
+    for unidad, primero in primeros.items():
+        nombre_primero = os.path.splitext(os.path.basename(primero))[0]
+        for archivo in sorted(os.listdir(excel_folder)):
+            nombre = archivo[:-len(SUFIJO_RESIDUO)]
+            if (archivo.endswith(f"-u{unidad}{SUFIJO_RESIDUO}") and nombre > nombre_primero
+                    and nombre not in nombres):
+                mat_file = os.path.join(os.path.dirname(primero), f"{nombre}.mat")
+                if not os.path.exists(mat_file):
+                    raise FileNotFoundError(
+                        f"'{nombre}' continúa el conteo de '{nombre_primero}' y debe reprocesarse, "
+                        f"pero no se encontró su MAT: {mat_file}")
+                invalidados.append((nombre_primero, nombre, mat_file))
+
+    for anterior, nombre, mat_file in invalidados:
+        for sufijo in (SUFIJO_RESIDUO, ".xlsx", SUFIJO_MATRIZ):
+            ruta = os.path.join(excel_folder, nombre + sufijo)
+            if os.path.exists(ruta):
+                os.remove(ruta)
+        log(f"[RAINFLOW] {nombre} continúa el conteo de {anterior}: se reprocesa.")
+        mat_files.append(mat_file)
+    return sorted(mat_files, key=os.path.basename)
+
+
+def tiempos_absolutos(datos, nombre, fs):
+    """
+    Segundos desde 1970-01-01 de cada muestra: 'time_epoch' si está en el MAT o, si no,
+    la medianoche de la fecha del nombre más el índice de muestra dividido por fs.
+    """
+    n = datos["data"].shape[0]
+    tiempo = datos.get("time_epoch")
+    if tiempo is not None and np.size(tiempo) == n:
+        return np.asarray(tiempo, dtype=float).ravel()
+    inicio = pd.Timestamp(datetime.strptime(nombre.split("-")[0], "%Y.%m.%d")).timestamp()
+    return inicio + np.arange(n) / fs
+
+
+def procesar_rainflow(mat_file, excel_folder, fs=10, escritura=True, incremental=False, salida="ciclos",
+                      bordes_rango=None, bordes_media=None):
+    """
+    Equivalente en Python de procesar_matlab.m (sin gráficos) para un archivo MAT.
+
+    'salida' elige el contenido del Excel: "ciclos" (lista de ciclos y hojas deltaK_*,
+    como MATLAB), "matriz" (solo la matriz rango x media, de tamaño fijo) o "ambos".
+    Con "matriz" o "ambos" la matriz del día se guarda también como '<nombre>.matriz.npz'.
+
+    Con 'incremental', el conteo continúa desde el residuo del día anterior de la misma
+    unidad y el residuo de este día se guarda junto al Excel ('<nombre>.residuo.npz').
+    El Excel contiene entonces solo los ciclos que se cierran en el día (los medios ciclos
+    del residuo pasan al día siguiente), de modo que la suma de los días coincide con el
+    conteo de toda la historia. 'ti' y 'ts' se expresan en segundos desde la primera
+    muestra del día (negativos para inversiones de días anteriores).
+
+    Retorna:
+        numpy.ndarray: Matriz de ciclos (ver contar_ciclos).
+    """
+    nombre = os.path.splitext(os.path.basename(mat_file))[0]
+    datos = loadmat(mat_file, variable_names=["data", "time_epoch"])
+    if "data" not in datos:
+        raise ValueError(f"El .MAT debe contener la variable 'data': {mat_file}")
+
+    fuerza = fuerza_hidraulica(datos["data"])
+    if incremental:
+        tiempos = tiempos_absolutos(datos, nombre, fs)
+        anterior = residuo_anterior(excel_folder, nombre)
+        estado = cargar_residuo(anterior) if anterior else None
+        ciclos, estado = contar_ciclos_continuo(fuerza, tiempos, estado)
+        if len(tiempos):
+            ciclos[:, 3:] -= tiempos[0]
+        os.makedirs(excel_folder, exist_ok=True)
+        guardar_residuo(ruta_residuo(excel_folder, nombre), estado)
+    else:
+        ciclos = contar_ciclos(fuerza, fs)
+
+    if salida not in SALIDAS_RAINFLOW:
+        raise ValueError(f"Salida rainflow desconocida: '{salida}'. Use una de {list(SALIDAS_RAINFLOW)}.")
+    matriz = None
+    if salida != "ciclos":
+        matriz = matriz_rainflow(ciclos, bordes_rango, bordes_media)
+        os.makedirs(excel_folder, exist_ok=True)
+        guardar_matriz(os.path.join(excel_folder, nombre + SUFIJO_MATRIZ), *matriz)
+
+    if escritura:
+        os.makedirs(excel_folder, exist_ok=True)
+        escribir_excel_rainflow(None if salida == "matriz" else ciclos,
+                                os.path.join(excel_folder, f"{nombre}.xlsx"), matriz)
+    return ciclos
+
+
+def _procesar_rainflow_aislado(mat_file, excel_folder, fs, escritura, **opciones):
+    """Ejecuta procesar_rainflow en un worker y devuelve el error como texto (None si no hubo)."""
+    try:
+        procesar_rainflow(mat_file, excel_folder, fs, escritura, **opciones)
+        return None
+    except Exception as e:
+        return str(e)
+
+
+def procesar_rainflow_archivos(mat_files, excel_folder, fs=10, escritura=True, num_workers=None,
+                               backend="procesos", log_callback=None, incremental=False, salida="ciclos",
+                               bordes_rango=None, bordes_media=None, matriz_acumulada=True):
+    """
+    Procesa varios MAT con el motor rainflow de NumPy, en paralelo y sin MATLAB.
+
+    Parámetros:
+        mat_files (list): Rutas de los archivos MAT.
+        excel_folder (str): Carpeta de salida de los Excel.
+        fs (int): Frecuencia de muestreo en Hz.
+        escritura (bool): Si es False no se escriben los Excel.
+        num_workers (int): Número de workers (None: cálculo automático).
+        backend (str): "procesos" o "hilos".
+        log_callback (function): Función de callback para registrar mensajes.
+        incremental (bool): Conteo continuo entre días (ver procesar_rainflow). Cada día
+            depende del anterior, por lo que los archivos se procesan en orden y en serie;
+            los días posteriores ya procesados se reprocesan (ver encolar_dias_posteriores)
+            y, si un día falla, los siguientes de su unidad no se procesan.
+        salida (str): "ciclos", "matriz" o "ambos" (ver procesar_rainflow).
+        bordes_rango, bordes_media (list): Bordes de las clases de la matriz (None: por defecto).
+        matriz_acumulada (bool): Con salida "matriz" o "ambos", actualiza la matriz acumulada
+            de cada unidad procesada.
+
+    Retorna:
+        dict: {nombre: None si se procesó correctamente, o el mensaje de error}
+    """
+    def log(msg):
+        if log_callback:
+            log_callback(msg)
+
+    resultados = {}
+    if not mat_files:
+        return resultados
+
+    opciones = dict(incremental=incremental, salida=salida, bordes_rango=bordes_rango, bordes_media=bordes_media)
+
+    if incremental:
+        mat_files = encolar_dias_posteriores(mat_files, excel_folder, log_callback)
+        log(f"[RAINFLOW] Procesando {len(mat_files)} archivo(s) en orden (conteo continuo)...")
+        fallidas = {}
+        for mat_file in mat_files:
+            nombre = os.path.splitext(os.path.basename(mat_file))[0]
+            unidad = nombre.rsplit("-u", 1)[1] if "-u" in nombre else None
+            if unidad in fallidas:
+                # Sin el residuo del día fallido, el conteo de los siguientes no sería continuo
+                resultados[nombre] = f"no se procesó: falló el día anterior '{fallidas[unidad]}'"
+                continue
+            resultados[nombre] = _procesar_rainflow_aislado(mat_file, excel_folder, fs, escritura, **opciones)
+            if resultados[nombre] is None:
+                log(f"[RAINFLOW] {nombre} → FINALIZADO")
+            elif unidad is not None:
+                fallidas[unidad] = nombre
+    else:
+        num_workers = calcular_num_workers(mat_files, num_workers)
+        log(f"[RAINFLOW] Procesando {len(mat_files)} archivo(s) con {num_workers} worker(s) ({backend})...")
+
+        with crear_executor(backend, num_workers) as executor:
+            futuros = {
+                executor.submit(_procesar_rainflow_aislado, mat_file, excel_folder, fs, escritura, **opciones): mat_file
+                for mat_file in mat_files
+            }
+            for futuro in as_completed(futuros):
+                nombre = os.path.splitext(os.path.basename(futuros[futuro]))[0]
+                try:
+                    resultados[nombre] = futuro.result()
+                except Exception as e:
+                    resultados[nombre] = str(e)
+                if resultados[nombre] is None:
+                    log(f"[RAINFLOW] {nombre} → FINALIZADO")
+
+    if salida != "ciclos" and matriz_acumulada:
+        unidades = sorted({n.rsplit("-u", 1)[1] for n, error in resultados.items() if error is None and "-u" in n})
+        for unidad in unidades:
+            acumular_matrices(excel_folder, unidad, log_callback)
+            log(f"[RAINFLOW] Matriz acumulada actualizada: {PREFIJO_ACUMULADA}-u{unidad}")
+    return resultados
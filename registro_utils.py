@@ -0,0 +1,170 @@
+import os
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+
+# Columnas de la hoja principal del Excel de arranques y paradas (formato histórico)
+COLUMNAS_EXCEL = ["Fecha", "Arranques", "Paradas", "Total", "Estado Inicial", "Estado Final", "Archivo"]
+
+# Filas de datos por hoja de Excel (1.048.576 filas, menos el encabezado)
+FILAS_MAX_HOJA = 1_048_575
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS ciclos (
+    archivo        TEXT PRIMARY KEY,
+    unidad         TEXT,
+    fecha          TEXT,
+    arranques      INTEGER,
+    paradas        INTEGER,
+    total          INTEGER,
+    estado_inicial TEXT,
+    estado_final   TEXT,
+    procesado      TEXT
+);
+CREATE INDEX IF NOT EXISTS ciclos_unidad_fecha ON ciclos (unidad, fecha);
+CREATE TABLE IF NOT EXISTS eventos (
+    archivo  TEXT NOT NULL REFERENCES ciclos (archivo),
+    tipo     TEXT,
+    indice   INTEGER,
+    tiempo   TEXT,
+    duracion REAL
+);
+CREATE INDEX IF NOT EXISTS eventos_archivo ON eventos (archivo);
+"""
+
+
+def ruta_registro(excel_path):
+    """Ruta de la base SQLite asociada a un Excel de conteo: 'arranque_paradas.xlsx' -> '.sqlite'."""
+    return os.path.splitext(excel_path)[0] + ".sqlite"
+
+
+def unidad_de_archivo(nombre_mat):
+    """Extrae la unidad de un nombre 'YYYY.MM.DD-uXX.mat' (None si no sigue el formato)."""
+    base = os.path.splitext(nombre_mat)[0]
+    if "-u" not in base:
+        return None
+    return base.rsplit("-u", 1)[1]
+
+
+class RegistroArranques:
+    """
+    Registro persistente (SQLite) de arranques y paradas por archivo MAT.
+
+    Cada archivo procesado es una fila de 'ciclos' (clave: nombre del archivo, con índice
+    por unidad y fecha) y sus transiciones se guardan en 'eventos'. Las filas solo se
+    agregan: no se reescribe el registro en cada ejecución. El Excel histórico se genera
+    bajo demanda con 'exportar_excel'.
+    """
+
+    def __init__(self, ruta):
+        carpeta = os.path.dirname(os.path.abspath(ruta))
+        os.makedirs(carpeta, exist_ok=True)
+        self.ruta = ruta
+        self.conexion = sqlite3.connect(ruta)
+        self.conexion.executescript(_ESQUEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def procesado(self, archivo):
+        """Indica si el archivo ya está registrado (búsqueda por clave primaria)."""
+        fila = self.conexion.execute("SELECT 1 FROM ciclos WHERE archivo = ?", (archivo,)).fetchone()
+        return fila is not None
+
+    def archivos_procesados(self):
+        """Conjunto de nombres de archivo ya registrados."""
+        return {fila[0] for fila in self.conexion.execute("SELECT archivo FROM ciclos")}
+
+    def vacio(self):
+        return self.conexion.execute("SELECT COUNT(*) FROM ciclos").fetchone()[0] == 0
+
+    def agregar(self, filas, eventos=None):
+        """
+        Inserta en una sola transacción varios resultados de conteo.
+
+        Parámetros:
+            filas (list): Diccionarios con las claves de COLUMNAS_EXCEL.
+            eventos (dict): {archivo: DataFrame con 'Tipo', 'Indice', 'Tiempo', 'Duracion'}.
+        """
+        procesado = datetime.now().isoformat(timespec="seconds")
+        with self.conexion:
+            self.conexion.executemany(
+                "INSERT OR REPLACE INTO ciclos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (f["Archivo"], unidad_de_archivo(f["Archivo"]), str(f["Fecha"]), int(f["Arranques"]),
+                     int(f["Paradas"]), int(f["Total"]), f["Estado Inicial"], f["Estado Final"], procesado)
+                    for f in filas
+                ],
+            )
+            for archivo, tabla in (eventos or {}).items():
+                self.conexion.execute("DELETE FROM eventos WHERE archivo = ?", (archivo,))
+                self.conexion.executemany(
+                    "INSERT INTO eventos VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (archivo, e.Tipo, int(e.Indice), str(e.Tiempo), float(e.Duracion))
+                        for e in tabla.itertuples(index=False)
+                    ],
+                )
+
+    def importar_excel(self, excel_path):
+        """
+        Importa un 'arranque_paradas.xlsx' existente (migración desde el formato anterior).
+
+        Retorna:
+            int: Número de filas importadas.
+        """
+        df = pd.read_excel(excel_path)
+        if df.empty:
+            return 0
+        df["Fecha"] = pd.to_datetime(df["Fecha"]).dt.date
+        self.agregar(df[COLUMNAS_EXCEL].to_dict("records"))
+        return len(df)
+
+    def tabla(self, unidad=None):
+        """Devuelve los ciclos registrados como DataFrame con las columnas de COLUMNAS_EXCEL."""
+        consulta = ("SELECT fecha, arranques, paradas, total, estado_inicial, estado_final, archivo "
+                    "FROM ciclos")
+        parametros = ()
+        if unidad is not None:
+            consulta += " WHERE unidad = ?"
+            parametros = (unidad,)
+        df = pd.read_sql_query(consulta + " ORDER BY fecha, archivo", self.conexion, params=parametros)
+        df.columns = COLUMNAS_EXCEL
+        df["Fecha"] = pd.to_datetime(df["Fecha"]).dt.date
+        return df
+
+    def eventos(self, unidad=None):
+        """Devuelve los eventos registrados como DataFrame."""
+        consulta = ("SELECT e.archivo AS Archivo, e.tipo AS Tipo, e.tiempo AS Tiempo, e.duracion AS Duracion "
+                    "FROM eventos e JOIN ciclos c ON c.archivo = e.archivo")
+        parametros = ()
+        if unidad is not None:
+            consulta += " WHERE c.unidad = ?"
+            parametros = (unidad,)
+        df = pd.read_sql_query(consulta + " ORDER BY e.tiempo", self.conexion, params=parametros)
+        df["Tiempo"] = pd.to_datetime(df["Tiempo"])
+        return df
+
+    def exportar_excel(self, excel_path, unidad=None):
+        """
+        Genera el Excel de arranques y paradas a partir del registro.
+
+        La hoja principal conserva las columnas del formato histórico; las transiciones
+        se escriben en la hoja 'Eventos' y, si superan el límite de filas de Excel, continúan
+        en 'Eventos_2', 'Eventos_3', etc. El archivo se escribe de forma atómica.
+        """
+        temporal = excel_path + ".part.xlsx"
+        eventos = self.eventos(unidad)
+        with pd.ExcelWriter(temporal) as writer:
+            self.tabla(unidad).to_excel(writer, index=False)
+            for numero, inicio in enumerate(range(0, max(len(eventos), 1), FILAS_MAX_HOJA), start=1):
+                hoja = "Eventos" if numero == 1 else f"Eventos_{numero}"
+                eventos.iloc[inicio:inicio + FILAS_MAX_HOJA].to_excel(writer, sheet_name=hoja, index=False)
+        os.replace(temporal, excel_path)
+
+    def cerrar(self):
+        self.conexion.close()
@@ -0,0 +1,159 @@
+import os
+import zipfile
+import numpy as np
+from datetime import datetime, timedelta
+
+from csv_utils import COLUMN_ORDER
+
+# Frecuencia de muestreo de los registros de campo (Hz)
+FRECUENCIA = 10
+
+# Filas escritas por segmento TDMS (una hora a 10 Hz): acota la memoria del generador
+FILAS_POR_SEGMENTO = 36_000
+
+# Nombre del grupo de canales de los TDMS generados
+GRUPO_TDMS = "Datos"
+
+
+def _senales(n, inicio_s, rng, frecuencia=FRECUENCIA):
+    """
+    Señales de una turbina con ciclos de marcha y parada para 'n' muestras.
+
+    Parámetros:
+        n (int): Número de muestras.
+        inicio_s (float): Segundos desde el inicio del registro de la primera muestra; define
+            la fase de los ciclos de marcha para que los archivos consecutivos empalmen.
+        rng (numpy.random.Generator): Generador de ruido.
+
+    Retorna:
+        dict: {canal: numpy.ndarray float64} con los canales de COLUMN_ORDER salvo 'Time'.
+    """
+    t = inicio_s + np.arange(n) / frecuencia
+    # Marcha de 5 h y parada de 1 h, con rampas de 10 min
+    fase = np.mod(t, 6 * 3600)
+    carga = np.clip(np.minimum(fase, 5 * 3600 - fase) / 600, 0, 1)
+    consigna = 30 + 5 * np.sin(2 * np.pi * t / (4 * 3600))
+
+    potencia = carga * consigna + rng.normal(0, 0.3, n) * (carga > 0)
+    apertura = 15 + 70 * carga + rng.normal(0, 0.5, n)
+    velocidad = 187.5 * carga + rng.normal(0, 0.2, n) * (carga > 0)
+    senales = {
+        "Potencia": potencia,
+        "Paletas": apertura,
+        "Alabes": 0.8 * apertura + rng.normal(0, 0.5, n),
+        "Pres_Abr_Pal": 40 + 5 * carga + rng.normal(0, 0.4, n),
+        "Pres_Cerr_Pal": 38 + rng.normal(0, 0.4, n),
+        "Pres_Abr_Alab": 42 + 4 * carga + rng.normal(0, 0.4, n),
+        "Pres_Cerr_Alab": 39 + rng.normal(0, 0.4, n),
+        "Cont_Potencia": np.cumsum(np.maximum(potencia, 0)) / (3600 * frecuencia),
+        "Consigna_Pal": 15 + 70 * carga,
+        "Consigna_Pot": consigna * (carga > 0),
+        "Consigna_Alab": 0.8 * (15 + 70 * carga),
+        "Salto_Reg": 22 + 0.5 * np.sin(2 * np.pi * t / 86400) + rng.normal(0, 0.05, n),
+        "Velocidad": velocidad,
+        "Frecuencia": 50 * (carga > 0.99) + rng.normal(0, 0.02, n) * (carga > 0.99),
+        "ModoPotCon": (carga > 0.99).astype(float),
+        "FaseDiv2": np.mod(np.floor(t / 60), 2),
+    }
+    return {canal: senales[canal] for canal in COLUMN_ORDER if canal != "Time"}
+
+
+def generar_tdms(ruta, inicio, horas, frecuencia=FRECUENCIA, semilla=0, origen=None):
+    """
+    Escribe un TDMS sintético con la estructura de los registros de campo.
+
+    El archivo tiene un grupo con los 17 canales de COLUMN_ORDER: 'Time' (marcas de tiempo
+    UTC) y 16 canales float64. Se escribe con TdmsWriter en segmentos de una hora, de modo
+    que la memoria no depende de la duración.
+
+    Parámetros:
+        ruta (str): Archivo TDMS a escribir.
+        inicio (datetime): Primera muestra (UTC).
+        horas (float): Duración del registro.
+        frecuencia (int): Muestras por segundo.
+        semilla (int): Semilla del ruido (el mismo valor produce el mismo archivo).
+        origen (datetime): Referencia de los ciclos de marcha (por defecto 'inicio').
+
+    Retorna:
+        int: Número de filas escritas.
+    """
+    from nptdms import TdmsWriter, ChannelObject
+
+    origen = origen or inicio
+    total = int(round(horas * 3600 * frecuencia))
+    paso_us = 1_000_000 // frecuencia
+    inicio_us = np.datetime64(inicio, "us")
+    rng = np.random.default_rng(semilla)
+
+    with TdmsWriter(ruta) as escritor:
+        for desde in range(0, total, FILAS_POR_SEGMENTO):
+            n = min(FILAS_POR_SEGMENTO, total - desde)
+            indices = np.arange(desde, desde + n)
+            tiempo = inicio_us + (indices * paso_us).astype("timedelta64[us]")
+            inicio_s = (inicio - origen).total_seconds() + desde / frecuencia
+            canales = [ChannelObject(GRUPO_TDMS, "Time", tiempo)]
+            canales += [
+                ChannelObject(GRUPO_TDMS, canal, valores)
+                for canal, valores in _senales(n, inicio_s, rng, frecuencia).items()
+            ]
+            escritor.write_segment(canales)
+    return total
+
+
+def generar_entregas(carpeta, entregas=1, horas=24, horas_por_archivo=6, inicio=None, unidad="05",
+                     frecuencia=FRECUENCIA, semilla=0, log_callback=None):
+    """
+    Genera ZIP sintéticos como las entregas de campo.
+
+    Cada entrega es un ZIP 'U<unidad>_<AAAAMMDD_HHMM>.zip' con registros TDMS consecutivos
+    de 'horas_por_archivo' horas que cubren 'horas' horas; las entregas son consecutivas.
+    Con el inicio por defecto (23:00 UTC, 20:00 en hora local UTC-3) cada entrega cruza la
+    medianoche local, de modo que los días se arman con datos de más de un ZIP.
+
+    Parámetros:
+        carpeta (str): Carpeta donde se escriben los ZIP.
+        entregas (int): Número de ZIP.
+        horas (float): Horas cubiertas por cada ZIP.
+        horas_por_archivo (float): Duración de cada TDMS.
+        inicio (datetime): Primera muestra (UTC).
+        semilla (int): Semilla base del ruido.
+        log_callback (function): Función de callback para registrar mensajes.
+
+    Retorna:
+        dict: {'zips': nombres de los ZIP, 'filas': filas totales, 'bytes_tdms': tamaño de los TDMS}
+    """
+    def log(msg):
+        if log_callback:
+            log_callback(msg)
+
+    inicio = inicio or datetime(2024, 1, 4, 23, 0)
+    os.makedirs(carpeta, exist_ok=True)
+    resumen = {"zips": [], "filas": 0, "bytes_tdms": 0}
+
+    for e in range(entregas):
+        inicio_entrega = inicio + timedelta(hours=e * horas)
+        nombre_zip = f"U{unidad}_{inicio_entrega:%Y%m%d_%H%M}.zip"
+        ruta_zip = os.path.join(carpeta, nombre_zip)
+        parcial = ruta_zip + ".part"
+
+        with zipfile.ZipFile(parcial, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+            desplazamiento = 0.0
+            while desplazamiento < horas:
+                duracion = min(horas_por_archivo, horas - desplazamiento)
+                inicio_archivo = inicio_entrega + timedelta(hours=desplazamiento)
+                nombre_tdms = f"U{unidad}_{inicio_archivo:%Y%m%d_%H%M%S}.tdms"
+                ruta_tdms = os.path.join(carpeta, nombre_tdms)
+                resumen["filas"] += generar_tdms(
+                    ruta_tdms, inicio_archivo, duracion, frecuencia,
+                    semilla=semilla + int((inicio_archivo - inicio).total_seconds()), origen=inicio
+                )
+                resumen["bytes_tdms"] += os.path.getsize(ruta_tdms)
+                zf.write(ruta_tdms, nombre_tdms)
+                os.remove(ruta_tdms)
+                desplazamiento += duracion
+
+        os.replace(parcial, ruta_zip)
+        resumen["zips"].append(nombre_zip)
+        log(f"[SINTETICOS] Generado {nombre_zip}")
+
+    return resumen
@@ -1,51 +1,203 @@
 import os
+import numpy as np
 import pandas as pd
 from scipy.io import loadmat
 from datetime import datetime
 
-def count_startups_shutdowns(mat_data):
+from registro_utils import RegistroArranques, ruta_registro
+
+# Columna de velocidad de la turbina en 'data' de los MAT diarios
+CANAL_VELOCIDAD = 13
+
+# Frecuencia de muestreo usada cuando el MAT no tiene 'time_epoch'
+FRECUENCIA_MUESTREO = 10.0
+
+# Eventos de cada archivo que se muestran en el log (el resto queda solo en el registro)
+MAX_EVENTOS_LOG = 10
+
+
+def _estado_con_histeresis(valores, umbral_encendido, umbral_apagado):
+    """
+    Estado encendido (True) / apagado (False) de cada muestra con histéresis.
+
+    Una muestra enciende si supera 'umbral_encendido' y apaga si es menor o igual a
+    'umbral_apagado'; entre ambos umbrales (o si es NaN) conserva el estado anterior.
+    Las muestras iniciales sin estado definido toman el de la primera muestra definida.
+    """
+    definido = (valores > umbral_encendido) | (valores <= umbral_apagado)
+    if not definido.any():
+        return np.zeros(len(valores), dtype=bool)
+    # Índice de la última muestra definida hasta cada posición (relleno hacia adelante)
+    indices = np.where(definido, np.arange(len(valores)), 0)
+    np.maximum.accumulate(indices, out=indices)
+    indices[:np.argmax(definido)] = np.argmax(definido)
+    return valores[indices] > umbral_encendido
+
+
+def _filtrar_permanencia(estado, tiempo, permanencia_minima):
+    """
+    Descarta los tramos interiores de duración menor a 'permanencia_minima' segundos,
+    asignándoles el estado del tramo estable anterior. El primer y el último tramo
+    (cortados por los límites del archivo) se conservan.
+    """
+    inicios = np.concatenate(([0], np.flatnonzero(np.diff(estado)) + 1))
+    if len(inicios) < 3:
+        return estado
+    fines = np.concatenate((inicios[1:], [len(estado)]))
+    duraciones = np.append(tiempo[inicios[1:]], tiempo[-1]) - tiempo[inicios]
+
+    valores = estado[inicios].astype(float)
+    cortos = duraciones < permanencia_minima
+    cortos[[0, -1]] = False
+    valores[cortos] = np.nan
+    valores = pd.Series(valores).ffill().to_numpy().astype(bool)
+    return np.repeat(valores, fines - inicios)
+
+
+def detectar_transiciones(velocidad, tiempo=None, umbral_encendido=0.0, umbral_apagado=None,
+                          permanencia_minima=0.0, frecuencia=FRECUENCIA_MUESTREO):
+    """
+    Detecta arranques y paradas en una señal de velocidad sin recorrerla muestra a muestra.
+
+    Sin 'umbral_apagado' ni 'permanencia_minima' se aplica el criterio del conteo
+    original entre muestras consecutivas: un arranque es el paso de una muestra detenida
+    (entre 0 y 'umbral_encendido', ambos incluidos) a una mayor que 'umbral_encendido', y
+    una parada el paso inverso. Con el umbral por defecto (0) solo cuenta una velocidad
+    exactamente 0; los valores negativos y NaN no son ninguno de los dos estados, por lo
+    que los pasos hacia o desde ellos no se cuentan.
+
+    Con 'umbral_apagado' o 'permanencia_minima' el estado se sigue con histéresis (ver
+    _estado_con_histeresis): todo valor menor o igual a 'umbral_apagado', incluso
+    negativo, es apagado, y el ruido alrededor de una velocidad nula deja de contarse.
+
+    Parámetros:
+        velocidad (numpy.ndarray): Señal de velocidad de la turbina.
+        tiempo (numpy.ndarray): Segundos desde 1970-01-01 de cada muestra ('time_epoch').
+            Si es None se usa el índice de muestra dividido por 'frecuencia'.
+        umbral_encendido (float): Valor por encima del cual la turbina se considera encendida.
+        umbral_apagado (float): Valor por debajo (o igual) del cual se considera apagada
+            con histéresis (por defecto, sin histéresis).
+        permanencia_minima (float): Segundos que debe durar un estado para contarse; los
+            cambios más breves (ruido alrededor del umbral) se ignoran.
+        frecuencia (float): Frecuencia de muestreo en Hz, si no se indica 'tiempo'.
+
+    Retorna:
+        dict: 'arranques', 'paradas', 'estado_inicial', 'estado_final' y 'eventos'
+            (DataFrame con 'Tipo', 'Indice', 'Tiempo' y 'Duracion' en segundos del
+            estado que comienza con el evento).
+    """
+    velocidad = np.asarray(velocidad, dtype=float).ravel()
+    histeresis = umbral_apagado is not None or permanencia_minima > 0
+    if umbral_apagado is None:
+        umbral_apagado = umbral_encendido
+    if umbral_apagado > umbral_encendido:
+        raise ValueError("El umbral de apagado no puede ser mayor que el de encendido.")
+    if tiempo is None:
+        tiempo = np.arange(len(velocidad)) / frecuencia
+    tiempo = np.asarray(tiempo, dtype=float).ravel()
+
+    eventos = pd.DataFrame({"Tipo": pd.Series(dtype=str), "Indice": pd.Series(dtype=int),
+                            "Tiempo": pd.Series(dtype="datetime64[ns]"), "Duracion": pd.Series(dtype=float)})
+    if len(velocidad) == 0:
+        return {"arranques": 0, "paradas": 0, "estado_inicial": "Desconocido",
+                "estado_final": "Desconocido", "eventos": eventos}
+
+    if histeresis:
+        estado = _estado_con_histeresis(velocidad, umbral_encendido, umbral_apagado)
+        if permanencia_minima > 0:
+            estado = _filtrar_permanencia(estado, tiempo, permanencia_minima)
+        cambios = np.diff(estado.astype(np.int8))
+        indices = np.flatnonzero(cambios) + 1
+        arranque = cambios[indices - 1] > 0
+    else:
+        encendida = velocidad > umbral_encendido
+        detenida = (velocidad >= 0) & (velocidad <= umbral_encendido)
+        arranques = detenida[:-1] & encendida[1:]
+        indices = np.flatnonzero(arranques | (encendida[:-1] & detenida[1:])) + 1
+        arranque = arranques[indices - 1]
+        estado = encendida
+    siguiente = np.concatenate((indices[1:], [len(velocidad) - 1]))
+
+    eventos = pd.DataFrame({
+        "Tipo": np.where(arranque, "Arranque", "Parada"),
+        "Indice": indices,
+        "Tiempo": pd.to_datetime(tiempo[indices], unit="s").round("ms"),
+        "Duracion": tiempo[siguiente] - tiempo[indices],
+    })
+
+    return {
+        "arranques": int(arranque.sum()),
+        "paradas": int((~arranque).sum()),
+        "estado_inicial": "Encendida" if estado[0] else "Apagada",
+        "estado_final": "Encendida" if estado[-1] else "Apagada",
+        "eventos": eventos,
+    }
+
+
+def count_startups_shutdowns(mat_data, umbral_encendido=0.0, umbral_apagado=None, permanencia_minima=0.0):
     """
     Cuenta los ciclos de arranque y parada en los datos del canal 13.
     
     Parámetros:
     - mat_data (dict): Datos cargados desde el archivo .mat.
+    - umbral_encendido, umbral_apagado, permanencia_minima: Ver detectar_transiciones.
+      Con los valores por defecto se cuenta con el mismo criterio que el conteo original.
     
     Retorna:
     - tuple: (número de arranques, número de paradas, estado inicial, estado final)
     """
+    resultado = detectar_ciclos(mat_data, umbral_encendido, umbral_apagado, permanencia_minima)
+    return (resultado["arranques"], resultado["paradas"],
+            resultado["estado_inicial"], resultado["estado_final"])
+
+
+def detectar_ciclos(mat_data, umbral_encendido=0.0, umbral_apagado=None, permanencia_minima=0.0):
+    """
+    Aplica detectar_transiciones al canal de velocidad de un MAT diario.
+
+    Retorna:
+        dict: Resultado de detectar_transiciones (sin eventos si falta el canal 13).
+    """
     # Extraer los datos del canal 13 (velocidad de la turbina)
     try:
-        speed_data = mat_data['data'][:, 13]  # Asumimos que el canal 13 es el índice 13
+        speed_data = mat_data['data'][:, CANAL_VELOCIDAD]
     except IndexError:
         print("El archivo .mat no tiene datos en el canal 13.")
-        return 0, 0, "Desconocido", "Desconocido"
+        return detectar_transiciones([])
 
-    # Contadores para arranques y paradas
-    startups = 0
-    shutdowns = 0
+    tiempo = mat_data.get('time_epoch')
+    if tiempo is not None and np.size(tiempo) != len(speed_data):
+        tiempo = None
 
-    # Detectar transiciones
-    for i in range(1, len(speed_data)):
-        if speed_data[i - 1] == 0 and speed_data[i] > 0:
-            startups += 1
-        elif speed_data[i - 1] > 0 and speed_data[i] == 0:
-            shutdowns += 1
+    return detectar_transiciones(speed_data, tiempo, umbral_encendido, umbral_apagado, permanencia_minima)
 
-    # Determinar el estado inicial y final
-    estado_inicial = "Encendida" if speed_data[0] > 0 else "Apagada"
-    estado_final = "Encendida" if speed_data[-1] > 0 else "Apagada"
+def _agregar_lote(registro, filas, eventos, mat_folder, manifiesto=None):
+    """Inserta un lote en el registro y, si hay manifiesto, registra sus archivos como contabilizados."""
+    registro.agregar(filas, eventos)
+    if manifiesto is not None:
+        for fila in filas:
+            manifiesto.registrar(os.path.join(mat_folder, fila["Archivo"]), "conteo")
 
-    return startups, shutdowns, estado_inicial, estado_final
 
-def process_mat_folder(mat_folder, excel_path, log_callback=None):
+def process_mat_folder(mat_folder, excel_path, log_callback=None, umbral_encendido=0.0, umbral_apagado=None,
+                       permanencia_minima=0.0, exportar_excel=False, lote=100, manifiesto=None):
     """
-    Procesa todos los archivos .mat en la carpeta especificada y actualiza el archivo Excel.
+    Procesa todos los archivos .mat en la carpeta especificada y actualiza el registro de conteo.
     Solo procesa archivos que no han sido contabilizados previamente.
+
+    Los resultados se agregan a un registro SQLite junto al Excel ('arranque_paradas.sqlite'),
+    en lotes de 'lote' archivos. Si el registro no existe y hay un Excel previo, este se
+    importa una vez. El Excel solo se regenera si 'exportar_excel' es True.
     
     Parámetros:
     - mat_folder (str): Ruta de la carpeta que contiene los archivos .mat.
     - excel_path (str): Ruta del archivo Excel donde se guardarán los resultados.
     - log_callback (function): Función de callback para registrar mensajes en el log.
+    - umbral_encendido, umbral_apagado, permanencia_minima: Ver detectar_transiciones.
+    - exportar_excel (bool): Regenera el Excel a partir del registro al terminar.
+    - lote (int): Archivos por transacción de inserción.
+    - manifiesto (Manifiesto): Si se indica, también se recuentan los archivos cuyo contenido
+      cambió desde que se contabilizaron (ver manifiesto_utils).
     """
     # Función de registro
     def log(message):
@@ -54,63 +206,92 @@ def process_mat_folder(mat_folder, excel_path, log_callback=None):
         else:
             print(message)
 
-    # Verificar si el archivo Excel ya existe
-    if os.path.exists(excel_path):
-        df_excel = pd.read_excel(excel_path)
-        processed_files = set(df_excel["Archivo"])  # Conjunto de archivos ya procesados
-    else:
-        # Crear un DataFrame vacío si el archivo no existe
-        df_excel = pd.DataFrame(columns=["Fecha", "Arranques", "Paradas", "Total", "Estado Inicial", "Estado Final", "Archivo"])
-        processed_files = set()
-
-    # Procesar cada archivo .mat en la carpeta
-    for mat_file in os.listdir(mat_folder):
-        if not mat_file.endswith('.mat'):
-            continue
-
-        mat_path = os.path.join(mat_folder, mat_file)
-
-        # Verificar si el archivo ya fue procesado
-        if mat_file in processed_files:
-            log(f"El archivo {mat_file} ya fue procesado. Saltando...")
-            continue
-
-        try:
-            # Cargar los datos del archivo .mat
-            mat_data = loadmat(mat_path)
-
-            # Extraer la fecha del nombre del archivo (asumiendo formato YYYY.MM.DD-uXX.mat)
-            date_str = mat_file.split('-')[0]
-            date = datetime.strptime(date_str, "%Y.%m.%d").date()
-
-            # Contar arranques, paradas y obtener estados inicial y final
-            startups, shutdowns, estado_inicial, estado_final = count_startups_shutdowns(mat_data)
-            total = startups + shutdowns
-
-            # Mostrar una previsualización en el log
-            log(f"Procesado: {mat_file}")
-            log(f"  Fecha: {date}")
-            log(f"  Arranques: {startups}, Paradas: {shutdowns}, Total: {total}")
-            log(f"  Estado Inicial: {estado_inicial}, Estado Final: {estado_final}")
-
-            # Agregar nueva fila al DataFrame
-            new_row = {
-                "Fecha": date,
-                "Arranques": startups,
-                "Paradas": shutdowns,
-                "Total": total,
-                "Estado Inicial": estado_inicial,
-                "Estado Final": estado_final,
-                "Archivo": mat_file  # Registrar el nombre del archivo procesado
-            }
-            df_excel = pd.concat([df_excel, pd.DataFrame([new_row])], ignore_index=True)
-
-            # Agregar el archivo al conjunto de archivos procesados
-            processed_files.add(mat_file)
-
-        except Exception as e:
-            log(f"Error procesando {mat_file}: {e}")
-
-    # Guardar el archivo Excel actualizado
-    df_excel.to_excel(excel_path, index=False)
-    log(f"Resultados guardados en {excel_path}")
\ No newline at end of file
+    with RegistroArranques(ruta_registro(excel_path)) as registro:
+        # Migración: el Excel anterior pasa al registro la primera vez
+        if registro.vacio() and os.path.exists(excel_path):
+            importadas = registro.importar_excel(excel_path)
+            log(f"Importadas {importadas} fila(s) desde {excel_path}")
+
+        filas, eventos = [], {}
+
+        # Procesar cada archivo .mat en la carpeta
+        for mat_file in sorted(os.listdir(mat_folder)):
+            if not mat_file.endswith('.mat'):
+                continue
+
+            mat_path = os.path.join(mat_folder, mat_file)
+
+            # Verificar si el archivo ya fue procesado
+            if manifiesto is None:
+                procesar = not registro.procesado(mat_file)
+            else:
+                procesar = manifiesto.pendiente(mat_path, "conteo", registro.procesado(mat_file))
+                if procesar and registro.procesado(mat_file):
+                    log(f"El archivo {mat_file} cambió desde que se contabilizó. Recontando...")
+            if not procesar:
+                log(f"El archivo {mat_file} ya fue procesado. Saltando...")
+                continue
+
+            try:
+                # Cargar los datos del archivo .mat
+                mat_data = loadmat(mat_path)
+
+                # Extraer la fecha del nombre del archivo (asumiendo formato YYYY.MM.DD-uXX.mat)
+                date_str = mat_file.split('-')[0]
+                date = datetime.strptime(date_str, "%Y.%m.%d").date()
+
+                # Contar arranques, paradas y obtener estados inicial y final
+                resultado = detectar_ciclos(mat_data, umbral_encendido, umbral_apagado, permanencia_minima)
+                startups, shutdowns = resultado["arranques"], resultado["paradas"]
+                estado_inicial, estado_final = resultado["estado_inicial"], resultado["estado_final"]
+                total = startups + shutdowns
+
+                # Mostrar una previsualización en el log
+                log(f"Procesado: {mat_file}")
+                log(f"  Fecha: {date}")
+                log(f"  Arranques: {startups}, Paradas: {shutdowns}, Total: {total}")
+                log(f"  Estado Inicial: {estado_inicial}, Estado Final: {estado_final}")
+                eventos_archivo = resultado["eventos"]
+                for evento in eventos_archivo.head(MAX_EVENTOS_LOG).itertuples(index=False):
+                    log(f"  {evento.Tipo}: {evento.Tiempo} (duración {evento.Duracion:.1f} s)")
+                if len(eventos_archivo) > MAX_EVENTOS_LOG:
+                    log(f"  … y {len(eventos_archivo) - MAX_EVENTOS_LOG} evento(s) más")
+
+                filas.append({
+                    "Fecha": date,
+                    "Arranques": startups,
+                    "Paradas": shutdowns,
+                    "Total": total,
+                    "Estado Inicial": estado_inicial,
+                    "Estado Final": estado_final,
+                    "Archivo": mat_file  # Registrar el nombre del archivo procesado
+                })
+                eventos[mat_file] = resultado["eventos"]
+
+            except Exception as e:
+                log(f"Error procesando {mat_file}: {e}")
+
+            if len(filas) >= lote:
+                _agregar_lote(registro, filas, eventos, mat_folder, manifiesto)
+                filas, eventos = [], {}
+
+        if filas:
+            _agregar_lote(registro, filas, eventos, mat_folder, manifiesto)
+        log(f"Resultados guardados en {registro.ruta}")
+
+        if exportar_excel:
+            registro.exportar_excel(excel_path)
+            log(f"Resultados exportados a {excel_path}")
+
+
+def exportar_conteo_excel(excel_path, unidad=None, log_callback=None):
+    """
+    Genera 'excel_path' a partir del registro de conteo asociado, sin volver a procesar los MAT.
+    """
+    ruta = ruta_registro(excel_path)
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(f"No existe el registro de conteo: {ruta}")
+    with RegistroArranques(ruta) as registro:
+        registro.exportar_excel(excel_path, unidad)
+    if log_callback:
+        log_callback(f"Resultados exportados a {excel_path}")
@@ -0,0 +1,273 @@
+import os
+import json
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from time_utils import parsear_tiempo_texto
+
+# Filas por bloque al leer tablas intermedias
+FILAS_LECTURA = 100_000
+
+
+class Almacen:
+    """
+    Almacenamiento de tablas intermedias (columna 'Time' + canales) en la carpeta temp.
+
+    Cada tabla se identifica por una ruta sin extensión; 'ruta(carpeta, nombre)' agrega
+    la extensión del formato. Todas las implementaciones devuelven DataFrames con 'Time'
+    como datetime64 y los canales con su tipo original.
+    """
+
+    formato = ""
+    extension = ""
+
+    def ruta(self, carpeta, nombre):
+        return os.path.join(carpeta, nombre + self.extension)
+
+    def nombre(self, ruta):
+        return os.path.basename(ruta)[:-len(self.extension)]
+
+    def listar(self, carpeta):
+        """Rutas de las tablas de la carpeta, en orden alfabético."""
+        if not os.path.isdir(carpeta):
+            return []
+        return sorted(
+            os.path.join(carpeta, f) for f in os.listdir(carpeta)
+            if f.endswith(self.extension) and not f.startswith(".")
+        )
+
+    def existe(self, ruta):
+        return os.path.exists(ruta)
+
+    def escribir(self, ruta, bloques):
+        """
+        Escribe una tabla completa (DataFrame o iterable de DataFrames) de forma atómica:
+        se escribe en '<ruta>.part' y se renombra al terminar.
+        """
+        if isinstance(bloques, pd.DataFrame):
+            bloques = [bloques]
+        parcial = ruta + ".part"
+        self.eliminar(parcial)
+        for bloque in bloques:
+            self.anexar(parcial, bloque)
+        if not self.existe(parcial):
+            return
+        self.renombrar(parcial, ruta)
+
+    def anexar(self, ruta, df):
+        """Agrega filas al final de la tabla (la crea si no existe)."""
+        raise NotImplementedError
+
+    def iterar(self, ruta, filas=FILAS_LECTURA):
+        """Genera la tabla en bloques de como máximo 'filas' filas."""
+        raise NotImplementedError
+
+    def leer(self, ruta):
+        bloques = list(self.iterar(ruta))
+        if not bloques:
+            return pd.DataFrame()
+        return pd.concat(bloques, ignore_index=True)
+
+    def columnas_y_ultimo_tiempo(self, ruta):
+        """
+        Devuelve las columnas y el último 'Time' de la tabla sin leerla completa.
+
+        Retorna:
+            tuple: (lista de columnas, pandas.Timestamp o NaT)
+        """
+        raise NotImplementedError
+
+    def tamano(self, ruta):
+        """Tamaño en bytes de la tabla (suma de sus segmentos si es una carpeta)."""
+        if os.path.isdir(ruta):
+            return sum(
+                os.path.getsize(os.path.join(raiz, f))
+                for raiz, _, archivos in os.walk(ruta) for f in archivos
+            )
+        return os.path.getsize(ruta) if os.path.exists(ruta) else 0
+
+    def restaurar(self, ruta, tamano):
+        """
+        Devuelve la tabla al 'tamano' (bytes) que tenía antes de una serie de 'anexar'
+        interrumpida; con None la tabla se elimina (no existía).
+        """
+        raise NotImplementedError
+
+    def eliminar(self, ruta):
+        if os.path.isdir(ruta):
+            shutil.rmtree(ruta)
+        elif os.path.exists(ruta):
+            os.remove(ruta)
+
+    def renombrar(self, origen, destino):
+        if os.path.isdir(destino):
+            shutil.rmtree(destino)
+        os.replace(origen, destino)
+
+
+class AlmacenCSV(Almacen):
+    """CSV con separador ';' y decimal '.', un archivo por tabla."""
+
+    formato = "csv"
+    extension = ".csv"
+
+    def anexar(self, ruta, df):
+        nuevo = not os.path.exists(ruta)
+        df.to_csv(ruta, sep=";", decimal=".", index=False, mode="w" if nuevo else "a", header=nuevo)
+
+    def restaurar(self, ruta, tamano):
+        if tamano is None:
+            self.eliminar(ruta)
+        elif os.path.exists(ruta) and os.path.getsize(ruta) > tamano:
+            with open(ruta, "r+b") as f:
+                f.truncate(tamano)
+
+    def iterar(self, ruta, filas=FILAS_LECTURA):
+        for chunk in pd.read_csv(ruta, delimiter=";", decimal=".", chunksize=filas):
+            if "Time" in chunk.columns:
+                chunk["Time"] = parsear_tiempo_texto(chunk["Time"])
+            yield chunk
+
+    def columnas_y_ultimo_tiempo(self, ruta, tamano_cola=64 * 1024):
+        with open(ruta, "rb") as f:
+            columnas = f.readline().decode("utf-8").strip().split(";")
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - tamano_cola))
+            lineas = [linea for linea in f.read().decode("utf-8", errors="ignore").splitlines() if linea.strip()]
+
+        if not lineas or lineas[-1].split(";") == columnas or "Time" not in columnas:
+            return columnas, pd.NaT
+        ultimo = lineas[-1].split(";")[columnas.index("Time")]
+        return columnas, parsear_tiempo_texto(pd.Series([ultimo])).iloc[0]
+
+
+class AlmacenSegmentado(Almacen):
+    """
+    Tabla binaria guardada como carpeta de segmentos: cada 'anexar' agrega un segmento
+    sin reescribir los anteriores. Los segmentos se leen con mapeo en memoria.
+    """
+
+    def _segmentos(self, ruta):
+        if not os.path.isdir(ruta):
+            return []
+        return sorted(
+            os.path.join(ruta, s) for s in os.listdir(ruta)
+            if not s.startswith(".") and not s.endswith(".tmp")
+        )
+
+    def anexar(self, ruta, df):
+        os.makedirs(ruta, exist_ok=True)
+        segmento = os.path.join(ruta, f"{len(self._segmentos(ruta)):05d}")
+        self._escribir_segmento(segmento + ".tmp", df)
+        os.replace(segmento + ".tmp", segmento + self.extension_segmento)
+
+    def restaurar(self, ruta, tamano):
+        if tamano is None:
+            self.eliminar(ruta)
+            return
+        if os.path.isdir(ruta):
+            for resto in os.listdir(ruta):
+                if resto.endswith(".tmp"):
+                    self.eliminar(os.path.join(ruta, resto))
+        segmentos = self._segmentos(ruta)
+        total = sum(self.tamano(segmento) for segmento in segmentos)
+        # Los segmentos se agregan enteros: se quitan desde el final hasta el tamaño previo
+        while segmentos and total > tamano:
+            segmento = segmentos.pop()
+            total -= self.tamano(segmento)
+            self.eliminar(segmento)
+
+    def iterar(self, ruta, filas=FILAS_LECTURA):
+        for segmento in self._segmentos(ruta):
+            df = self._leer_segmento(segmento)
+            for inicio in range(0, len(df), filas):
+                yield df.iloc[inicio:inicio + filas]
+
+    def columnas_y_ultimo_tiempo(self, ruta):
+        segmentos = self._segmentos(ruta)
+        if not segmentos:
+            return [], pd.NaT
+        df = self._leer_segmento(segmentos[-1])
+        if df.empty or "Time" not in df.columns:
+            return list(df.columns), pd.NaT
+        return list(df.columns), df["Time"].iloc[-1]
+
+    def _escribir_segmento(self, ruta, df):
+        raise NotImplementedError
+
+    def _leer_segmento(self, ruta):
+        raise NotImplementedError
+
+
+class AlmacenNpy(AlmacenSegmentado):
+    """Un archivo '.npy' por columna en cada segmento, sin dependencias adicionales."""
+
+    formato = "npy"
+    extension = ".npyd"
+    extension_segmento = ""
+
+    def _escribir_segmento(self, ruta, df):
+        os.makedirs(ruta)
+        for i, columna in enumerate(df.columns):
+            valores = df[columna].to_numpy()
+            np.save(os.path.join(ruta, f"c{i:03d}.npy"), valores, allow_pickle=valores.dtype == object)
+        with open(os.path.join(ruta, "columnas.json"), "w", encoding="utf-8") as f:
+            json.dump([str(c) for c in df.columns], f, ensure_ascii=False)
+
+    def _leer_segmento(self, ruta):
+        with open(os.path.join(ruta, "columnas.json"), encoding="utf-8") as f:
+            columnas = json.load(f)
+        datos = {}
+        for i, columna in enumerate(columnas):
+            archivo = os.path.join(ruta, f"c{i:03d}.npy")
+            try:
+                datos[columna] = np.load(archivo, mmap_mode="r")
+            except ValueError:
+                # Columnas de texto (object) no admiten mapeo en memoria
+                datos[columna] = np.load(archivo, allow_pickle=True)
+        return pd.DataFrame(datos, copy=False)
+
+
+class AlmacenFeather(AlmacenSegmentado):
+    """Un archivo Feather (Arrow IPC) por segmento. Requiere 'pyarrow'."""
+
+    formato = "feather"
+    extension = ".featherd"
+    extension_segmento = ".feather"
+
+    def __init__(self):
+        try:
+            import pyarrow.feather  # noqa: F401
+        except ImportError as e:
+            raise ImportError(
+                "El formato intermedio 'feather' requiere 'pyarrow' (pip install pyarrow)."
+            ) from e
+
+    def _escribir_segmento(self, ruta, df):
+        import pyarrow.feather as feather
+        feather.write_feather(df.reset_index(drop=True), ruta, compression="uncompressed")
+
+    def _leer_segmento(self, ruta):
+        import pyarrow.feather as feather
+        return feather.read_table(ruta, memory_map=True).to_pandas()
+
+
+FORMATOS = {
+    "csv": AlmacenCSV,
+    "npy": AlmacenNpy,
+    "feather": AlmacenFeather,
+}
+
+
+def obtener_almacen(formato="csv"):
+    """
+    Devuelve el almacenamiento intermedio para el formato indicado ("csv", "npy" o "feather").
+    """
+    if isinstance(formato, Almacen):
+        return formato
+    try:
+        return FORMATOS[formato]()
+    except KeyError:
+        raise ValueError(f"Formato intermedio desconocido: '{formato}'. Use uno de {list(FORMATOS)}.")
@@ -1,60 +1,230 @@
 import os
+import numpy as np
 from nptdms import TdmsFile
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed
 from tqdm import tqdm
 
+from time_utils import convertir_tiempo, ZONA_HORARIA
+from storage_utils import obtener_almacen
+from metricas_utils import medir_archivo, registrar_archivo
+from workers_utils import calcular_num_workers, crear_executor
 
+# Filas por bloque en la lectura en streaming (17 canales x 8 bytes x 500k filas ~ 68 MB)
+TAMANO_BLOQUE = 500_000
 
-def convertir_tdms_a_csv(archivo_tdms, carpeta_salida, log_callback=None):
+
+def es_canal_tiempo(nombre_canal):
+    """Indica si el canal corresponde a la marca de tiempo ("Time" o "Date*")."""
+    return nombre_canal.lower() == "time" or nombre_canal.lower().startswith("date")
+
+
+def convertir_canal_tiempo(datos, zona_horaria=ZONA_HORARIA):
+    """Convierte los datos del canal de tiempo a datetime64[ns] en hora local (ver time_utils)."""
+    return convertir_tiempo(datos, zona_horaria)
+
+
+def eliminar_tdms(archivo_tdms):
+    """Elimina el archivo TDMS y su archivo '_index' asociado, si existe."""
+    os.remove(archivo_tdms)
+    archivo_tdms_index = archivo_tdms + '_index'
+    if os.path.exists(archivo_tdms_index):
+        os.remove(archivo_tdms_index)
+
+
+def _leer_canales(canales, inicio=0, longitud=None, nombre_tiempo=None, zona_horaria=ZONA_HORARIA):
+    """
+    Lee un rango de filas de los canales de un grupo TDMS.
+
+    El canal de tiempo se convierte con convertir_canal_tiempo y, si se indica
+    'nombre_tiempo', se renombra.
+    """
+    columnas = {}
+    for canal in canales:
+        if inicio == 0 and longitud is None:
+            datos = canal.data
+        else:
+            datos = canal.read_data(inicio, longitud)
+        if es_canal_tiempo(canal.name):
+            columnas[nombre_tiempo or canal.name] = convertir_canal_tiempo(datos, zona_horaria)
+        else:
+            columnas[canal.name] = datos
+    return columnas
+
+
+def iterar_bloques_tdms(archivo_tdms, tamano_bloque=TAMANO_BLOQUE, nombre_tiempo=None,
+                        zona_horaria=ZONA_HORARIA):
+    """
+    Lee el primer grupo de un archivo TDMS en bloques de filas de tamaño fijo.
+
+    Usa TdmsFile.open, por lo que solo se mantiene en memoria un bloque por vez:
+    el consumo máximo depende de 'tamano_bloque' y no de la duración del archivo.
+
+    Parámetros:
+        archivo_tdms (str | file): Ruta o archivo binario TDMS.
+        tamano_bloque (int): Número máximo de filas por bloque.
+        nombre_tiempo (str): Nombre con el que devolver el canal de tiempo (opcional).
+        zona_horaria (int | str): Desplazamiento en horas o zona IANA del canal de tiempo.
+
+    Genera:
+        dict: {nombre_canal: numpy.ndarray} con como máximo 'tamano_bloque' filas.
+    """
+    with TdmsFile.open(archivo_tdms) as tdms_file:
+        canales = tdms_file.groups()[0].channels()
+        total_filas = max((len(canal) for canal in canales), default=0)
+        for inicio in range(0, total_filas, tamano_bloque):
+            yield _leer_canales(canales, inicio, tamano_bloque, nombre_tiempo, zona_horaria)
+
+
+def leer_tdms_columnas(archivo_tdms, zona_horaria=ZONA_HORARIA):
+    """
+    Lee el primer grupo de un archivo TDMS como columnas NumPy, sin pasar por texto.
+
+    El canal de tiempo se devuelve bajo el nombre "Time" como datetime64[ns]; el resto
+    de los canales conserva su nombre y su tipo nativo.
+
+    Retorna:
+        dict: {nombre_canal: numpy.ndarray}
+    """
+    tdms_file = TdmsFile.read(archivo_tdms)
+    return _leer_canales(tdms_file.groups()[0].channels(), nombre_tiempo="Time", zona_horaria=zona_horaria)
+
+
+def primer_tiempo_tdms(archivo_tdms, zona_horaria=ZONA_HORARIA):
+    """
+    Devuelve la primera marca de tiempo (datetime64[ns], hora local) de un archivo TDMS.
+
+    Solo se leen los metadatos y la primera muestra del canal de tiempo. Retorna None si
+    el archivo no tiene canal de tiempo o si su primera muestra no es una fecha válida.
+    """
+    with TdmsFile.open(archivo_tdms) as tdms_file:
+        for canal in tdms_file.groups()[0].channels():
+            if es_canal_tiempo(canal.name) and len(canal):
+                primero = convertir_canal_tiempo(canal.read_data(0, 1), zona_horaria)[0]
+                return None if np.isnat(primero) else primero
+    return None
+
+
+def convertir_tdms_a_csv(archivo_tdms, carpeta_salida, log_callback=None, tamano_bloque=None,
+                         zona_horaria=ZONA_HORARIA, formato="csv", dias=None):
+    """
+    Convierte un archivo TDMS a una tabla intermedia (CSV por defecto) y elimina el TDMS si
+    la conversión fue exitosa. El canal de tiempo se guarda como columna 'Time'.
+
+    Parámetros:
+        archivo_tdms (str): Ruta del archivo TDMS.
+        carpeta_salida (str): Carpeta donde se escribe el CSV.
+        log_callback (function): Función de callback para registrar mensajes.
+        tamano_bloque (int): Si se indica, el archivo se lee y escribe en bloques de ese
+            número de filas (modo streaming); si es None se lee completo en memoria.
+        zona_horaria (int | str): Desplazamiento en horas o zona IANA del canal de tiempo.
+        formato (str): Formato intermedio de storage_utils ("csv", "npy" o "feather").
+        dias (list): Si se indica, solo se conservan las filas de esas fechas ('YYYY-MM-DD').
+
+    Retorna:
+        tuple: (métricas del archivo (metricas_utils.medir_archivo), fechas con datos
+        escritas en la tabla, o None si la conversión falló).
+    """
     def log(msg):
         if log_callback:
             log_callback(msg)
 
-    try:
-        tdms_file = TdmsFile.read(archivo_tdms)
-        grupo = tdms_file.groups()[0]
-        data_dict = {}
-
-        for canal in grupo.channels():
-            nombre_canal = canal.name
-            if canal.name.lower() == "time" or canal.name.lower().startswith("date"):
-                datos_tiempo = pd.to_datetime(canal.data, format='%Y-%m-%d %H:%M:%S.%f', errors='coerce')
-                datos_tiempo_corregidos = datos_tiempo - pd.Timedelta(hours=3)
-                data_dict[nombre_canal] = datos_tiempo_corregidos
+    fechas = None
+    with medir_archivo("tdms2csv", archivo_tdms) as metrica:
+        try:
+            almacen = obtener_almacen(formato)
+            ruta_archivo_csv = almacen.ruta(carpeta_salida, os.path.splitext(os.path.basename(archivo_tdms))[0])
+            metrica["bytes_entrada"] = os.path.getsize(archivo_tdms)
+
+            if tamano_bloque:
+                bloques = iterar_bloques_tdms(archivo_tdms, tamano_bloque, nombre_tiempo="Time",
+                                              zona_horaria=zona_horaria)
             else:
-                data_dict[nombre_canal] = canal.data
-
-        df = pd.DataFrame(data_dict)
-        nombre_archivo_csv = os.path.splitext(os.path.basename(archivo_tdms))[0] + ".csv"
-        ruta_archivo_csv = os.path.join(carpeta_salida, nombre_archivo_csv)
-        df.to_csv(ruta_archivo_csv, index=False, sep=';')
-
-        if os.path.exists(ruta_archivo_csv):
-            os.remove(archivo_tdms)
-            archivo_tdms_index = archivo_tdms + '_index'
-            if os.path.exists(archivo_tdms_index):
-                os.remove(archivo_tdms_index)
-            log(f"[TDMS2CSV] Convertido y eliminado: {os.path.basename(archivo_tdms)}")
-        else:
-            log(f"[TDMS2CSV] Error: No se creó el archivo CSV {ruta_archivo_csv}. TDMS no eliminado.")
+                tdms_file = TdmsFile.read(archivo_tdms)
+                bloques = [_leer_canales(tdms_file.groups()[0].channels(), nombre_tiempo="Time",
+                                         zona_horaria=zona_horaria)]
+
+            permitidos = np.array(sorted(dias), dtype="datetime64[D]") if dias is not None else None
+            fechas_tabla = set()
 
-    except Exception as e:
-        log(f"[TDMS2CSV] Error al convertir '{archivo_tdms}': {e}")
+            def tablas():
+                metrica["filas_entrada"] = metrica["filas_salida"] = 0
+                for data_dict in bloques:
+                    tabla = pd.DataFrame(data_dict)
+                    metrica["filas_entrada"] += len(tabla)
+                    dias_tabla = tabla["Time"].values.astype("datetime64[D]")
+                    if permitidos is not None:
+                        tabla = tabla[np.isin(dias_tabla, permitidos)]
+                        dias_tabla = tabla["Time"].values.astype("datetime64[D]")
+                    fechas_tabla.update(str(d) for d in np.unique(dias_tabla[~np.isnat(dias_tabla)]))
+                    metrica["filas_salida"] += len(tabla)
+                    yield tabla
 
+            # La escritura es atómica: no quedan tablas truncadas ante un error
+            almacen.escribir(ruta_archivo_csv, tablas())
 
-def procesar_archivos_tdms_paralelo(carpeta_tdms, num_workers=14, log_callback=None, stop_event=None):
+            if permitidos is not None and not fechas_tabla:
+                # Ninguna fila de los días pedidos: no queda tabla que agrupar
+                if almacen.existe(ruta_archivo_csv):
+                    almacen.eliminar(ruta_archivo_csv)
+                eliminar_tdms(archivo_tdms)
+                fechas = []
+                log(f"[TDMS2CSV] Sin datos de los días a reconstruir, eliminado: {os.path.basename(archivo_tdms)}")
+            elif almacen.existe(ruta_archivo_csv):
+                metrica["bytes_salida"] = almacen.tamano(ruta_archivo_csv)
+                eliminar_tdms(archivo_tdms)
+                fechas = sorted(fechas_tabla)
+                log(f"[TDMS2CSV] Convertido y eliminado: {os.path.basename(archivo_tdms)}")
+            else:
+                log(f"[TDMS2CSV] Error: No se creó el archivo CSV {ruta_archivo_csv}. TDMS no eliminado.")
+
+        except Exception as e:
+            log(f"[TDMS2CSV] Error al convertir '{archivo_tdms}': {e}")
+    return metrica, fechas
+
+
+def _convertir_tdms_registrando(archivo_tdms, carpeta_salida, tamano_bloque=None, zona_horaria=ZONA_HORARIA,
+                                formato="csv", dias=None):
+    """Ejecuta convertir_tdms_a_csv en un worker y devuelve los mensajes generados, las métricas y las fechas."""
+    mensajes = []
+    metrica, fechas = convertir_tdms_a_csv(archivo_tdms, carpeta_salida, mensajes.append, tamano_bloque,
+                                           zona_horaria, formato, dias)
+    return mensajes, metrica, fechas
+
+
+def procesar_archivos_tdms_paralelo(carpeta_tdms, num_workers=None, log_callback=None, stop_event=None,
+                                    backend="procesos", tamano_bloque=None, zona_horaria=ZONA_HORARIA,
+                                    formato="csv", dias_por_archivo=None):
+    """
+    Convierte en paralelo todos los archivos TDMS de una carpeta a tablas intermedias (CSV por defecto).
+
+    Parámetros:
+        carpeta_tdms (str): Carpeta con los archivos TDMS; los CSV se escriben en la misma carpeta.
+        num_workers (int): Número de workers. Si es None se calcula con calcular_num_workers.
+        log_callback (function): Función de callback para registrar mensajes.
+        stop_event (threading.Event): Evento para detener el proceso.
+        backend (str): "procesos" para esquivar el GIL en el parseo y formateo de pandas,
+            o "hilos" para el comportamiento anterior.
+        tamano_bloque (int): Filas por bloque para la lectura en streaming (None: lectura completa).
+        zona_horaria (int | str): Desplazamiento en horas o zona IANA del canal de tiempo.
+        formato (str): Formato intermedio de storage_utils ("csv", "npy" o "feather").
+        dias_por_archivo (dict): {ruta TDMS: fechas} para convertir solo esos días de
+            algunos archivos (ZIP relacionados, ver Manifiesto.zips_pendientes).
+
+    Retorna:
+        dict: {ruta TDMS: fechas con datos} de los archivos convertidos correctamente.
+    """
     def log(msg):
         if log_callback:
             log_callback(msg)
 
     if stop_event and stop_event.is_set():
         log("[TDMS2CSV] Proceso detenido por el usuario.")
-        return
+        return {}
     
     if not os.path.exists(carpeta_tdms):
         log(f"[TDMS2CSV] La carpeta '{carpeta_tdms}' no existe.")
-        return
+        return {}
 
     archivos_tdms = [
         os.path.join(carpeta_tdms, archivo)
@@ -64,22 +234,40 @@ def procesar_archivos_tdms_paralelo(carpeta_tdms, num_workers=14, log_callback=N
 
     if not archivos_tdms:
         log(f"[TDMS2CSV] No se encontraron archivos TDMS en '{carpeta_tdms}'.")
-        return
+        return {}
 
-    log(f"[TDMS2CSV] Procesando {len(archivos_tdms)} archivo(s) TDMS...")
+    # Los archivos grandes primero para equilibrar la carga entre workers
+    archivos_tdms.sort(key=os.path.getsize, reverse=True)
+    num_workers = calcular_num_workers(archivos_tdms, num_workers)
+    log(f"[TDMS2CSV] Procesando {len(archivos_tdms)} archivo(s) TDMS con {num_workers} worker(s) ({backend})...")
 
+    convertidos = {}
     with tqdm(total=len(archivos_tdms), desc="Procesando archivos TDMS", unit="archivo") as barra:
-        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        with crear_executor(backend, num_workers) as executor:
             futuros = {
-                executor.submit(convertir_tdms_a_csv, archivo, carpeta_tdms, log_callback): archivo
+                executor.submit(
+                    _convertir_tdms_registrando, archivo, carpeta_tdms, tamano_bloque, zona_horaria, formato,
+                    (dias_por_archivo or {}).get(archivo)
+                ): archivo
                 for archivo in archivos_tdms
             }
 
             for futuro in as_completed(futuros):
                 archivo = futuros[futuro]
                 try:
-                    futuro.result()
+                    mensajes, metrica, fechas = futuro.result()
+                    for mensaje in mensajes:
+                        log(mensaje)
+                    registrar_archivo(metrica)
+                    if fechas is not None:
+                        convertidos[archivo] = fechas
                 except Exception as e:
                     log(f"[TDMS2CSV] Error procesando {archivo}: {e}")
                 finally:
                     barra.update(1)
+
+                if stop_event and stop_event.is_set():
+                    log("[TDMS2CSV] Proceso detenido por el usuario.")
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    break
+    return convertidos
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Sustituto de MATLAB para probar run_matlab_pool sin MATLAB instalado.
+
+Se usa como 'matlab_path': recibe las mismas opciones que MATLAB e interpreta la llamada a
+procesar_lote_matlab o procesar_matlab del argumento '-batch'. Por cada .mat crea
+'<excel>/<nombre>.xlsx' (vacío), salvo según el nombre del archivo:
+
+    *error*      procesar_matlab falla: línea ERROR en el lote, código 1 si es individual.
+    *cuelga*     la sesión no termina (para probar el tiempo límite).
+    *inestable*  la primera vez MATLAB se cierra sin informar resultado; luego funciona.
+"""
+import os
+import re
+import sys
+import time
+
+TEXTO = r"'((?:[^']|'')*)'"
+
+
+def _texto(literal):
+    return literal.replace("''", "'")
+
+
+def procesar(mat_file, excel_folder):
+    """Simula procesar_matlab; retorna el mensaje de error o None."""
+    nombre = os.path.splitext(os.path.basename(mat_file))[0]
+    print(f"Procesando {nombre}", flush=True)
+    if "cuelga" in nombre:
+        time.sleep(600)
+    if "inestable" in nombre:
+        marca = os.path.join(excel_folder, nombre + ".intentos")
+        intentos = int(open(marca).read()) + 1 if os.path.exists(marca) else 1
+        with open(marca, "w") as f:
+            f.write(str(intentos))
+        if intentos == 1:
+            print("MATLAB se cerró inesperadamente", file=sys.stderr)
+            sys.exit(3)
+    if "error" in nombre:
+        return f"Error simulado en {nombre}"
+    open(os.path.join(excel_folder, nombre + ".xlsx"), "w").close()
+    return None
+
+
+def main(argv):
+    comando = argv[argv.index("-batch") + 1]
+
+    lote = re.search(rf"procesar_lote_matlab\({TEXTO},{TEXTO},{TEXTO}", comando)
+    if lote:
+        manifiesto, resultados, excel_folder = (_texto(g) for g in lote.groups())
+        with open(manifiesto, encoding="utf-8") as f:
+            archivos = [linea.strip() for linea in f if linea.strip()]
+        for mat_file in archivos:
+            print(f"[LOTE] {mat_file}", flush=True)
+            error = procesar(mat_file, excel_folder)
+            estado = f"OK\t{mat_file}" if error is None else f"ERROR\t{mat_file}\t{error}"
+            with open(resultados, "a", encoding="utf-8") as f:
+                f.write(estado + "\n")
+        return 0
+
+    individual = re.search(rf"procesar_matlab\({TEXTO},{TEXTO}", comando)
+    if individual:
+        mat_file, excel_folder = (_texto(g) for g in individual.groups())
+        error = procesar(mat_file, excel_folder)
+        if error is not None:
+            print(error)
+            return 1
+        return 0
+
+    print(f"Comando no reconocido: {comando}", file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
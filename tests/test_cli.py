@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from mat_utils import guardar_mat
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Ejecuta la línea de comandos e informa qué dependencias de la conversión quedaron cargadas
+CODIGO = ("import sys, cli; codigo = cli.main_cli(sys.argv[1:]); "
+          "print(codigo, 'nptdms' in sys.modules, 'columnar_utils' in sys.modules, 'csv_utils' in sys.modules)")
+
+
+@pytest.mark.parametrize("subcomando, opciones", [
+    ("conteo", []),
+    ("rainflow", ["--opcion", "motor_rainflow=\"numpy\""]),
+])
+def test_conteo_y_rainflow_no_cargan_la_conversion(tmp_path, subcomando, opciones):
+    salida = tmp_path / "salida"
+    os.makedirs(salida)
+    rng = np.random.default_rng(0)
+    tiempo = 1704337200 + np.arange(2000) / 10
+    datos = rng.normal(50, 10, size=(2000, 16))
+    datos[:, 12] = np.where(np.arange(2000) % 500 < 250, 0.0, 300.0)
+    guardar_mat(str(salida / "2024.01.04-u05.mat"), tiempo, datos)
+
+    argv = ["--config", str(tmp_path / "sin_config.json"), "--salida", str(salida),
+            "--excel", str(tmp_path / "excel"), "--sin-metricas", *opciones, subcomando]
+    resultado = subprocess.run([sys.executable, "-c", CODIGO, *argv], cwd=RAIZ, capture_output=True, text=True)
+
+    assert resultado.stdout.splitlines()[-1] == "0 False False False", resultado.stdout + resultado.stderr
@@ -0,0 +1,116 @@
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+import scipy.io as sio
+
+import columnar_utils
+from columnar_utils import leer_tdms_por_dia, cargar_bloques, unir_bloques
+from sinteticos_utils import generar_tdms, generar_entregas
+
+
+def _tdms(carpeta):
+    ruta = os.path.join(str(carpeta), "registro.tdms")
+    generar_tdms(ruta, datetime(2024, 1, 4, 20), horas=8, frecuencia=1)
+    return ruta
+
+
+def _dias(por_dia):
+    return {fecha: unir_bloques(list(cargar_bloques(bloques))) for fecha, bloques in por_dia.items()}
+
+
+def test_lectura_por_bloques_vuelca_a_disco(tmp_path):
+    ruta = _tdms(tmp_path)
+    carpeta = tmp_path / "trabajo"
+
+    completo = _dias(leer_tdms_por_dia(ruta, zona_horaria=0))
+    por_dia = leer_tdms_por_dia(ruta, tamano_bloque=1000, zona_horaria=0, carpeta_temp=str(carpeta))
+
+    # El worker devuelve rutas, no datos
+    assert all(isinstance(b, str) for bloques in por_dia.values() for b in bloques)
+    assert sum(len(b) for b in por_dia.values()) > 2
+
+    volcado = _dias(por_dia)
+    assert sorted(volcado) == sorted(completo) == ["2024-01-04", "2024-01-05"]
+    for fecha, (tiempo, datos, nombres) in completo.items():
+        assert np.array_equal(volcado[fecha][0], tiempo)
+        assert np.array_equal(volcado[fecha][1], datos)
+        assert volcado[fecha][2] == nombres
+
+    # Los bloques cargados se eliminan junto con la carpeta del worker
+    assert os.listdir(carpeta) == []
+
+
+def test_unir_bloques_reemplazar_conserva_el_dato_mas_nuevo():
+    tiempo = np.array(["2024-01-05T00:00:00", "2024-01-05T00:00:01", "2024-01-05T00:00:02"], dtype="datetime64[ns]")
+    previo = (tiempo, {"Potencia": np.array([1.0, 2.0, 3.0])})
+    nuevo = (tiempo[1:], {"Potencia": np.array([20.0, 30.0])})
+
+    t, datos, nombres = unir_bloques([previo, nuevo], reemplazar=True)
+    assert np.array_equal(t, tiempo)
+    assert datos[:, nombres.index("Potencia")].tolist() == [1.0, 20.0, 30.0]
+
+    # Sin 'reemplazar' se conservan todas las filas
+    assert len(unir_bloques([previo, nuevo])[0]) == 5
+
+
+def test_flujo_envia_un_zip_nuevo_solo_al_terminar_otro(tmp_path, monkeypatch):
+    eventos = []
+    monkeypatch.setattr(columnar_utils, "listar_miembros_tdms", lambda zip_path: [("registro.tdms", 1)])
+    monkeypatch.setattr(columnar_utils, "leer_miembro_zip_por_dia",
+                        lambda zip_path, *args: eventos.append(("leer", os.path.basename(zip_path))) or {})
+    monkeypatch.setattr(columnar_utils, "escribir_dias_mat",
+                        lambda *args, etapa_control, **kwargs: eventos.append(("escribir", etapa_control[9:])) or [])
+
+    zips = [f"U05_2024010{i}_2300.zip" for i in range(1, 6)]
+    columnar_utils.procesar_zip_a_mat_en_flujo(str(tmp_path), zips, str(tmp_path / "temp"), str(tmp_path / "salida"),
+                                               backend="hilos", archivos_en_vuelo=2)
+
+    escritos = [z for evento, z in eventos if evento == "escribir"]
+    assert escritos == zips
+    for i, zip_file in enumerate(zips[2:]):
+        # El ZIP i + 2 se lee recién después de escribir el ZIP i
+        assert eventos.index(("leer", zip_file)) > eventos.index(("escribir", zips[i]))
+
+
+def _mats(carpeta):
+    return {
+        nombre: {k: v for k, v in sio.loadmat(os.path.join(carpeta, nombre)).items() if not k.startswith("__")}
+        for nombre in sorted(os.listdir(carpeta)) if nombre.endswith(".mat")
+    }
+
+
+def test_flujo_ordena_los_zip_por_su_primera_marca_de_tiempo(tmp_path):
+    entrada = tmp_path / "entrada"
+    zips = generar_entregas(str(entrada), entregas=2, frecuencia=1)["zips"]
+    # El ZIP con el final del 05/01 queda primero por nombre
+    shutil.move(str(entrada / zips[1]), str(entrada / "A_posterior.zip"))
+    zips = ["A_posterior.zip", zips[0]]
+
+    columnar_utils.procesar_zip_a_mat(str(entrada), zips, str(tmp_path / "temp_directo"),
+                                      str(tmp_path / "directo"), backend="hilos")
+    columnar_utils.procesar_zip_a_mat_en_flujo(str(entrada), zips, str(tmp_path / "temp_flujo"),
+                                               str(tmp_path / "flujo"), backend="hilos")
+
+    esperados, mats = _mats(tmp_path / "directo"), _mats(tmp_path / "flujo")
+    assert sorted(mats) == sorted(esperados) == ["2024.01.04-u05.mat", "2024.01.05-u05.mat"]
+    for nombre, variables in esperados.items():
+        for clave, valor in variables.items():
+            assert np.array_equal(mats[nombre][clave], valor, equal_nan=True), (nombre, clave)
+    assert sorted(os.listdir(tmp_path / "temp_flujo")) == ["2024-01-06_temp"]
+
+
+def test_flujo_une_filas_posteriores_a_un_dia_completo(tmp_path):
+    entrada = tmp_path / "entrada"
+    # Del 04/01 20:00 al 06/01 02:00 locales, y un ZIP que empieza el 05/01 a las 22:00
+    primero = generar_entregas(str(entrada), horas=30, frecuencia=1)["zips"]
+    segundo = generar_entregas(str(entrada), horas=6, frecuencia=1, inicio=datetime(2024, 1, 6, 1), semilla=7)["zips"]
+
+    columnar_utils.procesar_zip_a_mat_en_flujo(str(entrada), primero + segundo, str(tmp_path / "temp"),
+                                               str(tmp_path / "salida"), backend="hilos", archivos_en_vuelo=1)
+
+    tiempo = _mats(tmp_path / "salida")["2024.01.05-u05.mat"]["time_epoch"].ravel()
+    # El día conserva las filas del primer ZIP y el segundo reemplaza sus últimas dos horas
+    assert len(tiempo) == 86400 and np.all(np.diff(tiempo) == 1)
+    assert sorted(os.listdir(tmp_path / "temp")) == ["2024-01-06_temp"]
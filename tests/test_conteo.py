@@ -0,0 +1,101 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import registro_utils
+from mat_utils import guardar_mat
+from startup_shutdown_counter import detectar_transiciones, process_mat_folder, CANAL_VELOCIDAD, MAX_EVENTOS_LOG
+
+
+def conteo_original(speed_data):
+    """Bucle de count_startups_shutdowns antes de la detección vectorizada."""
+    startups = 0
+    shutdowns = 0
+    for i in range(1, len(speed_data)):
+        if speed_data[i - 1] == 0 and speed_data[i] > 0:
+            startups += 1
+        elif speed_data[i - 1] > 0 and speed_data[i] == 0:
+            shutdowns += 1
+    estado_inicial = "Encendida" if speed_data[0] > 0 else "Apagada"
+    estado_final = "Encendida" if speed_data[-1] > 0 else "Apagada"
+    return startups, shutdowns, estado_inicial, estado_final
+
+
+def _conteo(velocidad, **kwargs):
+    r = detectar_transiciones(velocidad, **kwargs)
+    return r["arranques"], r["paradas"], r["estado_inicial"], r["estado_final"]
+
+
+@pytest.mark.parametrize("velocidad", [
+    [0, -1, 5, 0],
+    [5, -0.01, 5],
+    [0, 0.2, -0.1, 0.3, 0, 5, 5, 0],
+    [0, 5, np.nan, 0, 3],
+    [-2, -1, 0, 0, 4, 4, 0, -1],
+    [7],
+])
+def test_por_defecto_igual_al_conteo_original(velocidad):
+    assert _conteo(velocidad) == conteo_original(velocidad)
+
+
+def test_por_defecto_igual_al_conteo_original_aleatorio():
+    rng = np.random.default_rng(11)
+    for _ in range(200):
+        n = int(rng.integers(2, 300))
+        # Velocidades con ceros exactos, ruido negativo y NaN
+        velocidad = rng.choice([0.0, 0.0, 0.0, -0.05, 0.3, 50.0, 187.5, np.nan], size=n)
+        velocidad = np.where(rng.random(n) < 0.1, rng.normal(0, 1, n), velocidad)
+        assert _conteo(velocidad) == conteo_original(velocidad)
+
+
+def test_eventos_con_tiempo_y_duracion():
+    r = detectar_transiciones([0, 0, 5, 5, 5, 0], tiempo=np.arange(6) * 2.0)
+    assert list(r["eventos"]["Tipo"]) == ["Arranque", "Parada"]
+    assert list(r["eventos"]["Indice"]) == [2, 5]
+    assert list(r["eventos"]["Duracion"]) == [6.0, 0.0]
+
+
+def test_histeresis_trata_los_negativos_como_apagado():
+    # Con umbral de apagado, el ruido alrededor de cero no genera eventos
+    velocidad = [0, -0.1, 0.2, -0.1, 0.3, 0, 50, 50, 0.2, 0]
+    assert _conteo(velocidad, umbral_encendido=1.0, umbral_apagado=0.5)[:2] == (1, 1)
+
+
+def test_permanencia_minima_descarta_cambios_breves():
+    velocidad = [0] * 10 + [5] + [0] * 10 + [5] * 10 + [0] * 10
+    assert _conteo(velocidad, permanencia_minima=0.5)[:2] == (1, 1)
+
+
+def test_log_muestra_solo_los_primeros_eventos(tmp_path):
+    salida = tmp_path / "salida"
+    os.makedirs(salida)
+    n = MAX_EVENTOS_LOG + 15
+    datos = np.zeros((2 * n + 1, 16))
+    datos[1::2, CANAL_VELOCIDAD] = 300.0   # cada muestra impar enciende y la siguiente apaga
+    guardar_mat(str(salida / "2024.01.04-u05.mat"), 1704337200 + np.arange(len(datos)) * 60.0, datos)
+    mensajes = []
+
+    process_mat_folder(str(salida), str(tmp_path / "arranque_paradas.xlsx"), mensajes.append)
+
+    eventos = [m for m in mensajes if m.startswith("  Arranque:") or m.startswith("  Parada:")]
+    assert len(eventos) == MAX_EVENTOS_LOG
+    assert f"  … y {2 * n - MAX_EVENTOS_LOG} evento(s) más" in mensajes
+
+
+def test_eventos_se_reparten_en_hojas_al_superar_el_limite(tmp_path, monkeypatch):
+    monkeypatch.setattr(registro_utils, "FILAS_MAX_HOJA", 4)
+    salida = tmp_path / "salida"
+    os.makedirs(salida)
+    datos = np.zeros((21, 16))
+    datos[1::2, CANAL_VELOCIDAD] = 300.0   # 20 eventos
+    guardar_mat(str(salida / "2024.01.04-u05.mat"), 1704337200 + np.arange(len(datos)) * 60.0, datos)
+    excel = str(tmp_path / "arranque_paradas.xlsx")
+
+    process_mat_folder(str(salida), excel, lambda mensaje: None, exportar_excel=True)
+
+    hojas = pd.read_excel(excel, sheet_name=None)
+    assert list(hojas)[1:] == ["Eventos", "Eventos_2", "Eventos_3", "Eventos_4", "Eventos_5"]
+    eventos = pd.concat([hojas[h] for h in list(hojas)[1:]], ignore_index=True)
+    assert len(eventos) == 20 and eventos["Tiempo"].is_monotonic_increasing
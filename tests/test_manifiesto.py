@@ -0,0 +1,89 @@
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+import pytest
+import scipy.io as sio
+
+import main
+from columnar_utils import cargar_dia_parcial
+from sinteticos_utils import generar_entregas
+from storage_utils import obtener_almacen
+
+
+def _convertir(carpeta, zips, modo):
+    config = {
+        "input_folder": str(carpeta / "entrada"), "output_folder": str(carpeta / "salida"),
+        "excel_output_folder": str(carpeta / "excel"), "selected_files": list(zips), "descomprimir": True,
+        "pipeline_directo": modo != "lotes", "ejecucion_en_flujo": modo == "flujo", "metricas": False,
+    }
+    os.makedirs(config["output_folder"], exist_ok=True)
+    assert main.main(config, lambda mensaje: None)
+
+
+def _mats(carpeta):
+    salida = carpeta / "salida"
+    return {
+        nombre: {clave: valor for clave, valor in sio.loadmat(str(salida / nombre)).items() if not clave.startswith("__")}
+        for nombre in sorted(os.listdir(salida)) if nombre.endswith(".mat")
+    }
+
+
+def _parciales(temp, modo):
+    nombres = sorted(n for n in os.listdir(temp) if "_temp" in n)
+    if modo == "lotes":
+        almacen = obtener_almacen("csv")
+        return {n: almacen.leer(os.path.join(temp, n)).to_numpy() for n in nombres}
+    parciales = {}
+    for nombre in nombres:
+        tiempo, columnas = cargar_dia_parcial(str(temp), nombre[:-len("_temp")])
+        parciales[nombre] = (tiempo, columnas)
+    return parciales
+
+
+def _corregir(entrada, zip_file, semilla):
+    """Reemplaza un ZIP por otro con el mismo nombre y período pero datos distintos."""
+    generar_entregas(str(entrada / "correccion"), entregas=1, frecuencia=1,
+                     inicio=datetime.strptime(zip_file[4:17], "%Y%m%d_%H%M"), semilla=semilla)
+    shutil.move(str(entrada / "correccion" / zip_file), str(entrada / zip_file))
+    shutil.rmtree(str(entrada / "correccion"))
+
+
+@pytest.mark.parametrize("modo", ["directo", "flujo", "lotes"])
+def test_reentrega_corregida_equivale_a_conversion_nueva(tmp_path, monkeypatch, modo):
+    temp = tmp_path / "temp"
+    monkeypatch.setattr(main, "carpeta_temp", lambda: str(temp))
+
+    reprocesado = tmp_path / "reprocesado"
+    zips = generar_entregas(str(reprocesado / "entrada"), entregas=3, frecuencia=1)["zips"]
+    _convertir(reprocesado, zips, modo)
+
+    # El ZIP del medio comparte días con los otros dos; el último alimenta el parcial del día en curso
+    _corregir(reprocesado / "entrada", zips[1], semilla=101)
+    _convertir(reprocesado, zips, modo)
+    _corregir(reprocesado / "entrada", zips[2], semilla=102)
+    _convertir(reprocesado, zips, modo)
+    mats, parciales = _mats(reprocesado), _parciales(temp, modo)
+
+    # Conversión desde cero de los ZIP finales
+    shutil.rmtree(str(temp))
+    nuevo = tmp_path / "nuevo"
+    shutil.copytree(str(reprocesado / "entrada"), str(nuevo / "entrada"))
+    _convertir(nuevo, zips, modo)
+
+    esperados = _mats(nuevo)
+    assert sorted(mats) == sorted(esperados) == ["2024.01.04-u05.mat", "2024.01.05-u05.mat", "2024.01.06-u05.mat"]
+    for nombre, variables in esperados.items():
+        for clave, valor in variables.items():
+            assert np.array_equal(mats[nombre][clave], valor, equal_nan=True), (nombre, clave)
+
+    esperados = _parciales(temp, modo)
+    assert sorted(parciales) == sorted(esperados) and parciales
+    for nombre, esperado in esperados.items():
+        if modo == "lotes":
+            assert np.array_equal(parciales[nombre], esperado)
+        else:
+            assert np.array_equal(parciales[nombre][0], esperado[0])
+            for canal, datos in esperado[1].items():
+                assert np.array_equal(parciales[nombre][1][canal], datos, equal_nan=True), (nombre, canal)
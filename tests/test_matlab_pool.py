@@ -0,0 +1,106 @@
+import os
+import sys
+
+import pytest
+
+from matlab_utils import run_matlab_pool
+
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_matlab.py")
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="el stub se ejecuta con su shebang")
+
+
+@pytest.fixture
+def config(tmp_path):
+    mat_folder = tmp_path / "mat"
+    mat_folder.mkdir()
+    return {
+        "matlab_path": STUB,
+        "output_folder": str(mat_folder),
+        "excel_output_folder": str(tmp_path / "excel"),
+        "num_workers_matlab": 2,
+        "reintentos_matlab": 1,
+    }
+
+
+def _mats(config, *nombres):
+    for nombre in nombres:
+        open(os.path.join(config["output_folder"], nombre + ".mat"), "w").close()
+    return list(nombres)
+
+
+def _excel(config, nombre):
+    return os.path.exists(os.path.join(config["excel_output_folder"], nombre + ".xlsx"))
+
+
+@pytest.mark.parametrize("modo", ["lote", "individual"])
+def test_todos_correctos(config, modo):
+    config["modo_matlab"] = modo
+    nombres = _mats(config, "2024.01.01-u05", "2024.01.02-u05", "2024.01.03-u05")
+
+    assert run_matlab_pool(nombres, config) == {nombre: None for nombre in nombres}
+    assert all(_excel(config, nombre) for nombre in nombres)
+
+
+@pytest.mark.parametrize("modo", ["lote", "individual"])
+def test_reintento_de_fallo_transitorio(config, modo):
+    config["modo_matlab"] = modo
+    nombres = _mats(config, "2024.01.01-u05", "2024.01.02-inestable")
+    mensajes = []
+
+    resultados = run_matlab_pool(nombres, config, log_callback=mensajes.append)
+
+    assert resultados == {nombre: None for nombre in nombres}
+    assert any("Reintentando '2024.01.02-inestable' (1/1)" in m for m in mensajes)
+    with open(os.path.join(config["excel_output_folder"], "2024.01.02-inestable.intentos")) as f:
+        assert f.read() == "2"
+
+
+def test_sin_reintentos_el_fallo_transitorio_se_informa(config):
+    config.update(modo_matlab="individual", reintentos_matlab=0)
+    nombres = _mats(config, "2024.01.02-inestable")
+
+    resultados = run_matlab_pool(nombres, config)
+
+    assert "código 3" in resultados["2024.01.02-inestable"]
+
+
+def test_tiempo_limite_por_lote(config):
+    # El tiempo límite se aplica a cada sesión MATLAB: en modo lote, al lote completo del worker
+    config.update(modo_matlab="lote", num_workers_matlab=2, reintentos_matlab=0, timeout_matlab_s=3)
+    nombres = _mats(config, "2024.01.01-u05", "2024.01.02-u05", "2024.01.03-cuelga", "2024.01.04-u05")
+
+    resultados = run_matlab_pool(nombres, config)
+
+    # Lotes: [01, 03-cuelga] y [02, 04]. El 01 informó su resultado antes del corte.
+    assert resultados["2024.01.01-u05"] is None
+    assert resultados["2024.01.02-u05"] is None
+    assert resultados["2024.01.04-u05"] is None
+    assert "tiempo límite de 3 s" in resultados["2024.01.03-cuelga"]
+
+
+def test_tiempo_limite_agotado_se_reintenta(config):
+    config.update(modo_matlab="individual", num_workers_matlab=1, reintentos_matlab=1, timeout_matlab_s=1)
+    nombres = _mats(config, "2024.01.03-cuelga")
+    mensajes = []
+
+    resultados = run_matlab_pool(nombres, config, log_callback=mensajes.append)
+
+    assert "tiempo límite" in resultados["2024.01.03-cuelga"]
+    assert sum("Reintentando" in m for m in mensajes) == 1
+
+
+def test_error_por_archivo_en_lote_no_se_reintenta(config):
+    config.update(modo_matlab="lote", num_workers_matlab=1)
+    nombres = _mats(config, "2024.01.01-u05", "2024.01.02-error", "2024.01.03-u05")
+    mensajes = []
+
+    resultados = run_matlab_pool(nombres, config, show_output=True, log_callback=mensajes.append)
+
+    assert resultados["2024.01.01-u05"] is None
+    assert resultados["2024.01.03-u05"] is None
+    assert resultados["2024.01.02-error"] == "Error simulado en 2024.01.02-error"
+    assert not _excel(config, "2024.01.02-error")
+    assert not any("Reintentando" in m for m in mensajes)
+    # La salida del lote se etiqueta con el archivo en curso
+    assert "[INFO] [MATLAB:2024.01.02-error] Procesando 2024.01.02-error" in mensajes
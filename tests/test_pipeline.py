@@ -0,0 +1,95 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.io as sio
+
+import main
+from columnar_utils import cargar_dia_parcial
+from sinteticos_utils import generar_entregas
+from storage_utils import obtener_almacen
+
+# Configuración de cada modo de conversión sobre la misma entrega
+MODOS = {
+    "lotes": {"pipeline_directo": False},
+    "npy": {"pipeline_directo": False, "formato_intermedio": "npy"},
+    "directo": {"pipeline_directo": True},
+    "directo_bloques": {"pipeline_directo": True, "tamano_bloque_tdms": 5000},
+    "flujo": {"pipeline_directo": True, "ejecucion_en_flujo": True, "tamano_bloque_tdms": 5000},
+}
+
+
+@pytest.fixture(scope="module")
+def entrega(tmp_path_factory):
+    carpeta = tmp_path_factory.mktemp("entrega")
+    zips = generar_entregas(str(carpeta), entregas=2, frecuencia=1)["zips"]
+    return str(carpeta), zips
+
+
+def _convertir(entrega, carpeta, opciones):
+    """Ejecuta main.main con una carpeta temp propia y devuelve los MAT y los días parciales."""
+    input_folder, zips = entrega
+    temp = carpeta / "temp"
+    config = dict({
+        "input_folder": input_folder, "output_folder": str(carpeta / "salida"),
+        "excel_output_folder": str(carpeta / "excel"), "selected_files": zips, "descomprimir": True,
+        "usar_manifiesto": False, "metricas": False,
+    }, **opciones)
+    os.makedirs(config["output_folder"])
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(main, "carpeta_temp", lambda: str(temp))
+        assert main.main(config, lambda mensaje: None)
+
+    salida = carpeta / "salida"
+    mats = {
+        nombre: {k: v for k, v in sio.loadmat(str(salida / nombre)).items() if not k.startswith("__")}
+        for nombre in sorted(os.listdir(salida)) if nombre.endswith(".mat")
+    }
+    parciales = {}
+    for nombre in sorted(os.listdir(temp)):
+        fecha = nombre.split("_temp")[0]
+        if opciones.get("pipeline_directo"):
+            tiempo, columnas = cargar_dia_parcial(str(temp), fecha)
+        else:
+            almacen = obtener_almacen(opciones.get("formato_intermedio", "csv"))
+            tabla = almacen.leer(str(temp / nombre))
+            tiempo = pd.to_datetime(tabla.pop("Time")).values.astype("datetime64[ns]")
+            columnas = {canal: tabla[canal].to_numpy(dtype=float) for canal in tabla.columns}
+        parciales[fecha] = (tiempo, columnas)
+    return mats, parciales
+
+
+def _iguales(valor, esperado, modo):
+    # El CSV guarda los flotantes como texto: difieren en el último dígito representable
+    if modo == "lotes":
+        return np.allclose(valor, esperado, rtol=1e-12, atol=0, equal_nan=True)
+    return np.array_equal(valor, esperado, equal_nan=True)
+
+
+@pytest.fixture(scope="module")
+def referencia(entrega, tmp_path_factory):
+    return _convertir(entrega, tmp_path_factory.mktemp("npy"), MODOS["npy"])
+
+
+@pytest.mark.parametrize("modo", [m for m in MODOS if m != "npy"])
+def test_modos_de_conversion_equivalentes(entrega, referencia, tmp_path, modo):
+    mats, parciales = _convertir(entrega, tmp_path, MODOS[modo])
+    mats_ref, parciales_ref = referencia
+
+    # Dos entregas de 24 h desde las 20:00 locales: dos días completos y el parcial del tercero
+    assert sorted(mats_ref) == ["2024.01.04-u05.mat", "2024.01.05-u05.mat"]
+    assert sorted(parciales_ref) == ["2024-01-06"]
+
+    assert sorted(mats) == sorted(mats_ref)
+    for nombre, variables in mats_ref.items():
+        assert sorted(mats[nombre]) == sorted(variables)
+        for clave, valor in variables.items():
+            assert _iguales(mats[nombre][clave], valor, modo), (nombre, clave)
+
+    assert sorted(parciales) == sorted(parciales_ref)
+    for fecha, (tiempo, columnas) in parciales_ref.items():
+        assert np.array_equal(parciales[fecha][0], tiempo)
+        assert sorted(parciales[fecha][1]) == sorted(columnas)
+        for canal, datos in columnas.items():
+            assert _iguales(np.asarray(parciales[fecha][1][canal], dtype=float), datos, modo), (fecha, canal)
@@ -0,0 +1,165 @@
+import os
+
+import numpy as np
+import pytest
+
+from mat_utils import guardar_mat
+from rainflow_utils import (cargar_residuo, procesar_rainflow_archivos, contar_ciclos, contar_ciclos_continuo,
+                            cerrar_conteo, filtrar_delta_k, matriz_rainflow, acumular_matrices, guardar_matriz,
+                            cargar_matriz, UMBRALES_DELTA_K)
+
+DIAS = ["2024.01.04-u05", "2024.01.05-u05", "2024.01.06-u05"]
+
+# Ejemplo de la documentación de 'rainflow' de MATLAB (ASTM E1049): Ciclos, Rango, Media, ti, ts
+EJEMPLO_ASTM = [-2, 1, -3, 5, -1, 3, -4, 4, -2]
+CICLOS_ASTM = [
+    [0.5, 3, -0.5, 1, 2],
+    [0.5, 4, -1.0, 2, 3],
+    [1.0, 4, 1.0, 5, 6],
+    [0.5, 8, 1.0, 3, 4],
+    [0.5, 9, 0.5, 4, 7],
+    [0.5, 8, 0.0, 7, 8],
+    [0.5, 6, 1.0, 8, 9],
+]
+
+
+def _mat(carpeta, nombre, semilla):
+    rng = np.random.default_rng(semilla)
+    inicio = np.datetime64(f"{nombre[:10].replace('.', '-')}T00:00:00", "s").astype(np.int64)
+    ruta = os.path.join(str(carpeta), f"{nombre}.mat")
+    guardar_mat(ruta, inicio + np.arange(600) / 10, rng.normal(50, 10, size=(600, 16)))
+    return ruta
+
+
+def _incremental(mats, excel):
+    return procesar_rainflow_archivos(mats, str(excel), backend="hilos", incremental=True)
+
+
+@pytest.mark.parametrize("semilla", range(20))
+def test_conteo_por_tramos_equivale_al_conteo_completo(semilla):
+    rng = np.random.default_rng(semilla)
+    # Enteros en un rango chico: muchas mesetas y rangos repetidos
+    x = rng.integers(-5, 6, size=int(rng.integers(1, 400))).astype(float)
+    tiempos = np.arange(1, len(x) + 1, dtype=float)
+    cortes = np.sort(rng.integers(0, len(x) + 1, size=int(rng.integers(0, 8))))
+
+    estado, ciclos = None, []
+    for inicio, fin in zip(np.concatenate(([0], cortes)), np.concatenate((cortes, [len(x)]))):
+        cerrados, estado = contar_ciclos_continuo(x[inicio:fin], tiempos[inicio:fin], estado)
+        ciclos.append(cerrados)
+    ciclos.append(cerrar_conteo(estado))
+
+    assert np.array_equal(np.vstack(ciclos), contar_ciclos(x))
+
+
+def test_reprocesar_un_dia_reprocesa_los_siguientes(tmp_path):
+    salida = tmp_path / "salida"
+    os.makedirs(salida)
+    mats = [_mat(salida, nombre, semilla) for semilla, nombre in enumerate(DIAS)]
+    _incremental(mats, tmp_path / "excel")
+
+    # El primer día cambia: los siguientes continúan desde su residuo y deben rehacerse
+    _mat(salida, DIAS[0], semilla=10)
+    resultados = _incremental(mats[:1], tmp_path / "excel")
+    assert resultados == {nombre: None for nombre in DIAS}
+
+    _incremental(mats, tmp_path / "desde_cero")
+    for nombre in DIAS:
+        residuo = cargar_residuo(str(tmp_path / "excel" / f"{nombre}.residuo.npz"))
+        assert residuo == cargar_residuo(str(tmp_path / "desde_cero" / f"{nombre}.residuo.npz"))
+        assert (tmp_path / "excel" / f"{nombre}.xlsx").exists()
+
+
+def test_falta_el_mat_de_un_dia_posterior(tmp_path):
+    salida = tmp_path / "salida"
+    os.makedirs(salida)
+    mats = [_mat(salida, nombre, semilla) for semilla, nombre in enumerate(DIAS)]
+    _incremental(mats, tmp_path / "excel")
+    os.remove(mats[2])
+
+    with pytest.raises(FileNotFoundError):
+        _incremental(mats[:1], tmp_path / "excel")
+    assert (tmp_path / "excel" / f"{DIAS[1]}.residuo.npz").exists()
+
+
+def _filtro_matlab(c, umbral):
+    """Filtrado ΔK de procesar_matlab.m, línea por línea."""
+    diffs = (c[:, 2] + c[:, 1] / 2) - (c[:, 2] - c[:, 1] / 2)
+    sel = np.column_stack((c[diffs >= umbral], diffs[diffs >= umbral]))
+    return sel if len(sel) else np.zeros((1, c.shape[1] + 1))
+
+
+def test_ejemplo_astm_e1049():
+    assert np.array_equal(contar_ciclos(EJEMPLO_ASTM), CICLOS_ASTM)
+
+    # Con fs, ti y ts pasan a segundos desde la primera muestra
+    esperado = np.array(CICLOS_ASTM)
+    esperado[:, 3:] = (esperado[:, 3:] - 1) / 10
+    assert np.allclose(contar_ciclos(EJEMPLO_ASTM, fs=10), esperado, rtol=0, atol=1e-12)
+
+
+def test_mesetas_cuentan_desde_su_primer_punto():
+    ciclos = contar_ciclos([0, 0, 2, 2, 2, -1, -1, 3, 3])
+    assert np.array_equal(ciclos, [
+        [0.5, 2, 1.0, 1, 3],
+        [0.5, 3, 0.5, 3, 6],
+        [0.5, 4, 1.0, 6, 8],
+    ])
+
+
+def test_filtrar_delta_k_como_matlab():
+    rng = np.random.default_rng(0)
+    ciclos = contar_ciclos(rng.normal(0, 8, 2000))
+    # Rangos justo debajo de los umbrales, que la resta de MATLAB redondea al umbral
+    ciclos = np.vstack((ciclos, [[1.0, 13.99999999999999, -90.08850319340924, 1, 2],
+                                 [0.5, 7 - 1e-15, 300.0, 3, 4]]))
+    for umbral in UMBRALES_DELTA_K:
+        assert np.array_equal(filtrar_delta_k(ciclos, umbral), _filtro_matlab(ciclos, umbral))
+
+    # Sin ciclos sobre el umbral: una fila de ceros con la columna deltaK
+    pequenos = contar_ciclos([0, 1, 0, 2, 0])
+    assert np.array_equal(filtrar_delta_k(pequenos, 14), np.zeros((1, 6)))
+
+
+def test_matriz_conserva_el_total_con_ciclos_fuera_de_los_bordes():
+    ciclos = np.array([
+        [1.0, 5000, 0, 0, 1],      # rango sobre el último borde
+        [0.5, 10, -5000, 0, 1],    # media bajo el primer borde
+        [0.5, 2000, 2000, 0, 1],   # justo en los últimos bordes
+        [1.0, 0, -2000, 0, 1],     # justo en los primeros bordes
+        [0.5, 35, 12, 0, 1],
+    ])
+    matriz, bordes_rango, bordes_media = matriz_rainflow(ciclos)
+
+    assert matriz.shape == (len(bordes_rango) - 1, len(bordes_media) - 1)
+    assert matriz.sum() == ciclos[:, 0].sum()
+    assert matriz[-1, 50] == 1.0 and matriz[0, 0] == 1.5 and matriz[-1, -1] == 0.5 and matriz[1, 50] == 0.5
+
+
+def test_matriz_acumulada_no_cuenta_dos_veces_un_dia_reprocesado(tmp_path):
+    salida = tmp_path / "salida"
+    os.makedirs(salida)
+    mats = [_mat(salida, nombre, semilla) for semilla, nombre in enumerate(DIAS)]
+    excel = str(tmp_path / "excel")
+    procesar_rainflow_archivos(mats, excel, backend="hilos", salida="matriz")
+    primera = cargar_matriz(os.path.join(excel, "matriz_acumulada-u05.npz"))[0]
+
+    procesar_rainflow_archivos(mats[1:2], excel, backend="hilos", salida="matriz")
+    segunda = cargar_matriz(os.path.join(excel, "matriz_acumulada-u05.npz"))[0]
+
+    diarias = [cargar_matriz(os.path.join(excel, f"{nombre}.matriz.npz"))[0] for nombre in DIAS]
+    assert np.array_equal(segunda, primera) and np.array_equal(segunda, sum(diarias))
+
+
+def test_matriz_acumulada_omite_dias_con_otros_bordes(tmp_path):
+    ciclos = np.array([[1.0, 30, 5, 0, 1], [0.5, 120, -40, 0, 1]])
+    guardar_matriz(str(tmp_path / f"{DIAS[0]}.matriz.npz"), *matriz_rainflow(ciclos, [0, 50, 100, 150], [-50, 0, 50]))
+    guardar_matriz(str(tmp_path / f"{DIAS[1]}.matriz.npz"), *matriz_rainflow(ciclos))
+    guardar_matriz(str(tmp_path / f"{DIAS[2]}.matriz.npz"), *matriz_rainflow(ciclos))
+    mensajes = []
+
+    matriz, bordes_rango, _ = acumular_matrices(str(tmp_path), "05", mensajes.append)
+
+    assert np.array_equal(bordes_rango, matriz_rainflow(ciclos)[1])
+    assert matriz.sum() == 2 * ciclos[:, 0].sum()
+    assert mensajes == [f"[RAINFLOW] {DIAS[0]}.matriz.npz omitida: bordes distintos."]
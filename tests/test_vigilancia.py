@@ -0,0 +1,92 @@
+import os
+import threading
+import zipfile
+
+import cli
+import main
+from sinteticos_utils import generar_entregas
+from vigilancia_utils import VigilanteCarpeta, vigilar_carpeta
+
+
+def _zip(ruta, contenido=b"datos"):
+    with zipfile.ZipFile(ruta, "w") as zf:
+        zf.writestr("registro.tdms", contenido)
+
+
+def test_solo_se_entregan_los_zip_procesados(tmp_path):
+    for nombre in ("a.zip", "b.zip"):
+        _zip(tmp_path / nombre)
+    llamadas = []
+    parar = threading.Event()
+
+    def procesar(zips):
+        llamadas.append(list(zips))
+        if len(llamadas) == 3:
+            parar.set()
+        return ["a.zip"]
+
+    lotes = vigilar_carpeta(str(tmp_path), procesar, intervalo=0.01, estabilidad=0, stop_event=parar)
+
+    # 'b.zip' no se procesó: se reintenta sin repetir 'a.zip'
+    assert llamadas == [["a.zip", "b.zip"], ["b.zip"], ["b.zip"]]
+    assert lotes == 0
+
+
+def test_zip_que_siempre_falla_queda_en_cuarentena(tmp_path):
+    for nombre in ("a.zip", "b.zip"):
+        _zip(tmp_path / nombre)
+    llamadas = []
+    mensajes = []
+    parar = threading.Event()
+
+    def log(mensaje):
+        mensajes.append(mensaje)
+        if "ERROR" in mensaje or len(mensajes) > 20:
+            parar.set()
+
+    def procesar(zips):
+        llamadas.append(list(zips))
+        return ["a.zip"]
+
+    vigilar_carpeta(str(tmp_path), procesar, intervalo=0.01, estabilidad=0, stop_event=parar,
+                    log_callback=log, max_intentos=2)
+
+    assert llamadas == [["a.zip", "b.zip"], ["b.zip"]]
+    assert any("'b.zip' falló 2 veces" in mensaje for mensaje in mensajes)
+
+
+def test_zip_en_cuarentena_vuelve_a_entregarse_al_cambiar(tmp_path):
+    _zip(tmp_path / "a.zip")
+    vigilante = VigilanteCarpeta(str(tmp_path), estabilidad=0, max_intentos=2)
+
+    assert vigilante.estables() == ["a.zip"]
+    assert vigilante.fallido(["a.zip"]) == []
+    assert vigilante.estables() == ["a.zip"]
+    assert vigilante.fallido(["a.zip"]) == ["a.zip"]
+    assert vigilante.estables() == []
+
+    _zip(tmp_path / "a.zip", b"datos corregidos")
+    assert vigilante.estables() == ["a.zip"]
+
+
+def test_procesar_lote_excluye_zip_con_tdms_ilegible(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "carpeta_temp", lambda: str(tmp_path / "temp"))
+    entrada = tmp_path / "entrada"
+    zips = generar_entregas(str(entrada), entregas=2, frecuencia=1)["zips"]
+
+    # Un miembro del segundo ZIP se reemplaza por bytes que no son TDMS
+    ruta = entrada / zips[1]
+    with zipfile.ZipFile(ruta) as zf:
+        miembros = {info.filename: zf.read(info) for info in zf.infolist()}
+    primero = sorted(m for m in miembros if m.endswith(".tdms"))[0]
+    miembros[primero] = b"no es un TDMS"
+    with zipfile.ZipFile(ruta, "w") as zf:
+        for nombre, datos in miembros.items():
+            zf.writestr(nombre, datos)
+
+    config = {"input_folder": str(entrada), "output_folder": str(tmp_path / "salida"),
+              "excel_output_folder": str(tmp_path / "excel"), "descomprimir": True, "pipeline_directo": True,
+              "procesar_incompleto": True, "metricas": False}
+    os.makedirs(config["output_folder"])
+
+    assert cli.procesar_lote(config, zips) == [zips[0]]
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+# Desplazamiento horario aplicado históricamente a los TDMS (UTC-3)
+ZONA_HORARIA = -3
+
+FORMATO_TIEMPO = '%Y-%m-%d %H:%M:%S.%f'
+
+
+def aplicar_zona_horaria(tiempo_utc, zona_horaria=ZONA_HORARIA):
+    """
+    Convierte marcas de tiempo UTC a hora local sin zona (datetime64[ns]).
+
+    Parámetros:
+        tiempo_utc (numpy.ndarray): Marcas de tiempo UTC como datetime64.
+        zona_horaria (int | float | str | None): Desplazamiento fijo en horas (por ejemplo -3),
+            nombre de zona IANA con horario de verano (por ejemplo "America/Argentina/Buenos_Aires")
+            o None para conservar UTC.
+
+    Retorna:
+        numpy.ndarray: datetime64[ns] en hora local.
+    """
+    tiempo_utc = np.asarray(tiempo_utc).astype("datetime64[ns]")
+    if zona_horaria is None or zona_horaria == "":
+        return tiempo_utc
+    if isinstance(zona_horaria, str):
+        try:
+            zona_horaria = float(zona_horaria)
+        except ValueError:
+            pass
+    if isinstance(zona_horaria, (int, float)):
+        return tiempo_utc + np.timedelta64(int(round(zona_horaria * 3600)), "s")
+
+    indice = pd.DatetimeIndex(tiempo_utc).tz_localize("UTC").tz_convert(zona_horaria)
+    return indice.tz_localize(None).values
+
+
+def convertir_tiempo(datos, zona_horaria=ZONA_HORARIA):
+    """
+    Convierte los datos del canal de tiempo de un TDMS a hora local (datetime64[ns]).
+
+    Los valores datetime64 nativos de nptdms se usan directamente, sin pasar por texto;
+    solo los canales de tiempo almacenados como cadenas se parsean con FORMATO_TIEMPO.
+    Los valores no convertibles quedan como NaT.
+    """
+    datos = np.asarray(datos)
+    if datos.dtype.kind != "M":
+        datos = pd.to_datetime(datos, format=FORMATO_TIEMPO, errors='coerce').values
+    return aplicar_zona_horaria(datos, zona_horaria)
+
+
+def tiempo_a_epoch(tiempo):
+    """
+    Convierte datetime64 a segundos desde 1970-01-01 (float64), como 'time_epoch' en los MAT.
+
+    Los NaT se devuelven como NaN.
+    """
+    tiempo = np.asarray(tiempo).astype("datetime64[ns]")
+    epoch = tiempo.astype(np.int64) / 1e9
+    epoch[np.isnat(tiempo)] = np.nan
+    return epoch
+
+
+def parsear_tiempo_texto(serie):
+    """
+    Parsea marcas de tiempo escritas como texto en las tablas intermedias CSV.
+
+    Usa FORMATO_TIEMPO y, si ninguna fila coincide (por ejemplo, marcas sin fracción de
+    segundo), recurre al formato ISO 8601 general.
+    """
+    tiempo = pd.to_datetime(serie, format=FORMATO_TIEMPO, errors='coerce')
+    if tiempo.isnull().all():
+        tiempo = pd.to_datetime(serie, format="ISO8601", errors='coerce')
+    return tiempo
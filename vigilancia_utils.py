@@ -0,0 +1,169 @@
+import os
+import time
+import zipfile
+import threading
+
+# Segundos entre revisiones de la carpeta de entrada
+INTERVALO = 30
+
+# Segundos que un ZIP debe mantener tamaño y fecha de modificación para considerarse completo
+ESTABILIDAD = 60
+
+# Intentos fallidos con el mismo contenido antes de dejar de reintentar un ZIP
+MAX_INTENTOS = 3
+
+
+class VigilanteCarpeta:
+    """
+    Detecta los ZIP de una carpeta que terminaron de copiarse.
+
+    Un ZIP se considera estable cuando su tamaño y su fecha de modificación no cambian
+    durante 'estabilidad' segundos y el archivo puede abrirse como ZIP. Cada ZIP estable se
+    entrega una sola vez; si después cambia (se copia de nuevo), vuelve a entregarse. Un ZIP
+    que falla 'max_intentos' veces con la misma firma queda en cuarentena: no se entrega
+    hasta que cambie.
+    """
+
+    def __init__(self, carpeta, estabilidad=ESTABILIDAD, extension=".zip", max_intentos=MAX_INTENTOS):
+        self.carpeta = carpeta
+        self.estabilidad = estabilidad
+        self.extension = extension
+        self.max_intentos = max_intentos
+        self._observados = {}  # nombre -> (firma, momento desde el que no cambia)
+        self._entregados = {}  # nombre -> firma entregada
+        self._invalidos = {}   # nombre -> firma que no pudo abrirse como ZIP
+        self._fallos = {}      # nombre -> (firma, intentos fallidos con esa firma)
+        self._cuarentena = {}  # nombre -> firma que agotó sus intentos
+
+    def _firmas(self):
+        firmas = {}
+        for entrada in os.scandir(self.carpeta):
+            if entrada.is_file() and entrada.name.lower().endswith(self.extension):
+                try:
+                    estado = entrada.stat()
+                except OSError:
+                    continue
+                firmas[entrada.name] = (estado.st_size, estado.st_mtime_ns)
+        return firmas
+
+    def estables(self, ahora=None, log=print):
+        """
+        Revisa la carpeta y devuelve los ZIP nuevos o modificados que ya están estables,
+        en orden alfabético.
+        """
+        ahora = time.monotonic() if ahora is None else ahora
+        firmas = self._firmas()
+        for nombre in set(self._observados) - set(firmas):
+            del self._observados[nombre]
+
+        listos = []
+        for nombre, firma in sorted(firmas.items()):
+            previa, desde = self._observados.get(nombre, (None, ahora))
+            if firma != previa:
+                desde = ahora
+            self._observados[nombre] = (firma, desde)
+            if firma[0] == 0 or ahora - desde < self.estabilidad:
+                continue
+            if firma in (self._entregados.get(nombre), self._invalidos.get(nombre), self._cuarentena.get(nombre)):
+                continue
+            if not zipfile.is_zipfile(os.path.join(self.carpeta, nombre)):
+                log(f"[VIGILANCIA] '{nombre}' no es un ZIP válido: se espera a que cambie.")
+                self._invalidos[nombre] = firma
+                continue
+            listos.append(nombre)
+        return listos
+
+    def entregado(self, nombres):
+        """Marca los ZIP como procesados con la firma con la que se entregaron."""
+        for nombre in nombres:
+            if nombre in self._observados:
+                self._entregados[nombre] = self._observados[nombre][0]
+                self._fallos.pop(nombre, None)
+
+    def fallido(self, nombres):
+        """
+        Registra un intento fallido de cada ZIP con su firma actual.
+
+        Retorna:
+            list: ZIP que agotaron 'max_intentos' con la misma firma y pasan a cuarentena.
+        """
+        cuarentena = []
+        for nombre in nombres:
+            if nombre not in self._observados:
+                continue
+            firma = self._observados[nombre][0]
+            previa, intentos = self._fallos.get(nombre, (None, 0))
+            intentos = intentos + 1 if previa == firma else 1
+            self._fallos[nombre] = (firma, intentos)
+            if intentos >= self.max_intentos:
+                self._cuarentena[nombre] = firma
+                del self._fallos[nombre]
+                cuarentena.append(nombre)
+        return cuarentena
+
+
+def vigilar_carpeta(carpeta, procesar, intervalo=INTERVALO, estabilidad=ESTABILIDAD, stop_event=None,
+                    log_callback=None, max_intentos=MAX_INTENTOS):
+    """
+    Procesa continuamente los ZIP que llegan a 'carpeta' hasta que se active 'stop_event'.
+
+    En cada revisión, los ZIP nuevos o modificados que ya están estables se pasan juntos a
+    'procesar(lista)', que retorna los ZIP de la lista que se procesaron (True: todos). Los
+    demás se reintentan en la revisión siguiente, hasta 'max_intentos' veces mientras no
+    cambien su tamaño ni su fecha de modificación. Los ZIP presentes al iniciar también se
+    entregan: 'procesar' debe omitir los ya procesados (por ejemplo, con el manifiesto).
+
+    Parámetros:
+        carpeta (str): Carpeta de entrada con los ZIP.
+        procesar (callable): Función que recibe la lista de nombres de ZIP y retorna los
+            procesados.
+        intervalo (float): Segundos entre revisiones.
+        estabilidad (float): Segundos sin cambios para considerar completo un ZIP.
+        stop_event (threading.Event): Evento para detener la vigilancia.
+        max_intentos (int): Intentos fallidos con el mismo contenido antes de omitir un ZIP.
+
+    Retorna:
+        int: Número de lotes procesados sin errores.
+    """
+    def log(msg):
+        if log_callback:
+            log_callback(msg)
+
+    stop_event = stop_event or threading.Event()
+    vigilante = VigilanteCarpeta(carpeta, estabilidad, max_intentos=max_intentos)
+    lotes = 0
+    log(f"[VIGILANCIA] Vigilando '{carpeta}' (revisión cada {intervalo} s, estabilidad {estabilidad} s).")
+
+    while not stop_event.is_set():
+        try:
+            listos = vigilante.estables(log=log)
+        except OSError as e:
+            log(f"[VIGILANCIA] No se pudo revisar la carpeta de entrada: {e}")
+            listos = []
+
+        if listos:
+            log(f"[VIGILANCIA] {len(listos)} ZIP listo(s): {', '.join(listos)}")
+            try:
+                resultado = procesar(listos)
+            except Exception as e:
+                log(f"[VIGILANCIA] Error al procesar: {e}")
+                resultado = []
+            procesados = list(listos) if resultado is True else [z for z in listos if z in set(resultado or [])]
+            vigilante.entregado(procesados)
+            fallidos = [z for z in listos if z not in procesados]
+            if fallidos:
+                cuarentena = vigilante.fallido(fallidos)
+                for zip_file in cuarentena:
+                    log(f"[VIGILANCIA] ERROR: '{zip_file}' falló {max_intentos} veces: se omite hasta que "
+                        f"cambie su tamaño o su fecha de modificación.")
+                reintentos = [z for z in fallidos if z not in cuarentena]
+                if reintentos:
+                    log(f"[VIGILANCIA] {len(reintentos)} ZIP con errores ({', '.join(reintentos)}): "
+                        f"se reintentarán en la próxima revisión.")
+            else:
+                lotes += 1
+
+        stop_event.wait(intervalo)
+
+    log(f"[VIGILANCIA] Vigilancia detenida ({lotes} lote(s) procesados).")
+    return lotes
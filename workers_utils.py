@@ -0,0 +1,45 @@
+import os
+import math
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from perfil_utils import envolver_executor
+
+# Volumen mínimo de TDMS que justifica un worker adicional
+BYTES_POR_WORKER = 64 * 1024 * 1024
+
+
+def calcular_num_workers(archivos, max_workers=None, bytes_por_worker=BYTES_POR_WORKER, total_bytes=None):
+    """
+    Calcula el número de workers según los núcleos disponibles y el tamaño de los archivos.
+
+    Parámetros:
+        archivos (list): Rutas de los archivos a procesar.
+        max_workers (int): Límite explícito de workers (por defecto, el número de CPUs).
+        bytes_por_worker (int): Volumen mínimo de datos asignado a cada worker.
+        total_bytes (int): Volumen total, si los archivos no están en disco (p. ej. miembros de un ZIP).
+
+    Retorna:
+        int: Número de workers, entre 1 y min(CPUs, número de archivos).
+    """
+    limite = max_workers or os.cpu_count() or 1
+    if total_bytes is None:
+        total_bytes = sum(os.path.getsize(a) for a in archivos if os.path.exists(a))
+    por_volumen = max(1, math.ceil(total_bytes / bytes_por_worker))
+    return max(1, min(limite, len(archivos), por_volumen))
+
+
+def crear_executor(backend, num_workers):
+    """
+    Crea el pool de ejecución para las etapas por archivo.
+
+    Parámetros:
+        backend (str): "procesos" (ProcessPoolExecutor) o "hilos" (ThreadPoolExecutor).
+        num_workers (int): Número de workers del pool.
+
+    Si hay una etapa perfilándose (perfil_utils), cada tarea se perfila en su worker.
+    """
+    if backend == "procesos":
+        return envolver_executor(ProcessPoolExecutor(max_workers=num_workers))
+    if backend == "hilos":
+        return envolver_executor(ThreadPoolExecutor(max_workers=num_workers))
+    raise ValueError(f"Backend de ejecución desconocido: '{backend}'. Use 'procesos' o 'hilos'.")